@@ -2,57 +2,70 @@ from datetime import datetime, timedelta
 import random
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from sqlalchemy.orm import Session
+from app.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+    AUTH_CACHE_TTL_SECONDS,
+    AUTH_CACHE_MAX_ENTRIES,
+    LOG_OTP_CODES,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from app import models
 from uuid import uuid4
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.database import get_db
 from app import models, database
+from app.cache import TTLCache
+from app.logger import get_logger, update_log_context
+from app.revocation import revocations
+
+logger = get_logger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Column snapshots of recently authenticated users, keyed by user id
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+_USER_COLUMNS = [c.key for c in models.User.__table__.columns]
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def create_token(data: dict, expires_minutes: int, token_type: str, db: Session) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
+def _encode_token(claims: dict, user: models.User, token_type: str, expires_minutes: int) -> tuple[str, str]:
+    """Sign a token for user; returns (token, jti)."""
+    to_encode = claims.copy()
     jti = str(uuid4())
+    to_encode.update({
+        "exp": datetime.utcnow() + timedelta(minutes=expires_minutes),
+        "type": token_type,
+        "jti": jti,
+        "user_id": user.id
+    })
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM), jti
+
+
+def issue_token_pair(user: models.User, claims: dict, db: Session) -> tuple[str, str]:
+    """Mint access and refresh tokens for an already-loaded user.
+
+    Both outstanding-token rows are written in a single commit, which also
+    commits any pending changes the caller made to the user (e.g. at login).
+    """
+    access_token, access_jti = _encode_token(claims, user, "access", ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token, refresh_jti = _encode_token(claims, user, "refresh", REFRESH_TOKEN_EXPIRE_MINUTES)
+    db.add_all([
+        models.OutstandingToken(jti=access_jti, user_id=user.id, token_type="access"),
+        models.OutstandingToken(jti=refresh_jti, user_id=user.id, token_type="refresh"),
+    ])
+    db.commit()
+    return access_token, refresh_token
 
-    # Add user_id from database if needed
-    db_user = db.query(models.User).filter(models.User.username == data["sub"]).first()
-    if db_user:
-        to_encode.update({
-            "exp": expire,
-            "type": token_type,
-            "jti": jti,
-            "user_id": db_user.id
-        })
-        token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
-        db_token = models.OutstandingToken(
-            jti=jti,
-            user_id=db_user.id,
-            token_type=token_type
-        )
-        db.add(db_token)
-        db.commit()
-        return token
-    else:
-        raise HTTPException(status_code=401, detail="User not found")
-
-
-def create_access_token(data: dict, db: Session) -> str:
-    return create_token(data, ACCESS_TOKEN_EXPIRE_MINUTES, "access", db)
-
-def create_refresh_token(data: dict, db: Session) -> str:
-    return create_token(data, 60 * 24 * 7, "refresh", db)
 
 def decode_token(token: str) -> dict | None:
     try:
@@ -61,34 +74,66 @@ def decode_token(token: str) -> dict | None:
         return None
 
 def is_blacklisted(jti: str, db: Session) -> bool:
-    return db.query(models.BlacklistToken).filter(models.BlacklistToken.jti == jti).first() is not None
+    revocations.sync_if_stale(db)
+    return jti in revocations
 
 def blacklist_token(token: str, db: Session):
     payload = decode_token(token)
     if payload:
         jti = payload.get("jti")
-        if jti:
+        if jti and not is_blacklisted(jti, db):
             db.add(models.BlacklistToken(jti=jti))
             db.commit()
+            revocations.add(jti)
 
 def get_token_type(token: str) -> str | None:
     payload = decode_token(token)
     return payload.get("type") if payload else None
 
-def get_current_user(
+def invalidate_principal(user_id: int):
+    """Drop a cached principal after the user's row changes."""
+    _principal_cache.delete(user_id)
+
+def _principal_from_snapshot(snapshot: dict) -> models.User:
+    # A fresh detached instance per request: routes may modify and re-attach it
+    # (db.add) without touching other requests or issuing an INSERT.
+    user = models.User(**{k: (list(v) if isinstance(v, list) else v) for k, v in snapshot.items()})
+    make_transient_to_detached(user)
+    return user
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ) -> models.User:
-    token = credentials.credentials  # Extract token from header
+    def authenticate(session: Session) -> models.User:
+        user = authenticate_token(credentials.credentials, session)
+        # Detached like cached principals, so sync routes can re-attach it to their own session
+        if user in session:
+            session.expunge(user)
+        return user
+
+    return await db.run_sync(authenticate)
+
+
+def authenticate_token(token: str, db: Session) -> models.User:
+    """Resolve an access token to its user; also used where tokens arrive outside the header."""
     payload = decode_token(token)
     user_id = payload.get("user_id") if payload else None
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    
+    jti = payload.get("jti")
+    if jti and is_blacklisted(jti, db):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    update_log_context(user_id=user_id)
+
+    snapshot = _principal_cache.get(user_id)
+    if snapshot is not None:
+        return _principal_from_snapshot(snapshot)
+
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    
+    _principal_cache.set(user_id, {k: getattr(user, k) for k in _USER_COLUMNS})
     return user
 
 
@@ -98,11 +143,18 @@ def generate_otp() -> str:
 
 def send_otp_sms(phone_number: str, code: str):
     # Integrate with real SMS provider later (Twilio, etc.)
-    # For now, we just log the OTP
-    print(f"OTP for {phone_number}: {code}")
+    # For now, we just log that one was sent; the code itself only with LOG_OTP_CODES in development
+    logger.info(f"OTP sent to ***{phone_number[-4:]}")
+    if LOG_OTP_CODES:
+        logger.debug(f"OTP for {phone_number}: {code}")
 
 
 def create_or_get_user_by_phone(db: Session, phone_number: str) -> models.User:
+    """Return the user for a phone number, creating it if needed.
+
+    New users are only flushed (so they have an id); the caller commits,
+    typically through issue_token_pair.
+    """
     user = db.query(models.User).filter(models.User.phone_number == phone_number).first()
     if user:
         return user
@@ -119,8 +171,7 @@ def create_or_get_user_by_phone(db: Session, phone_number: str) -> models.User:
         roles=[models.UserRole.CUSTOMER.value]
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
 
@@ -147,11 +198,7 @@ def verify_otp_and_issue_tokens(db: Session, phone_number: str, code: str):
         raise HTTPException(status_code=400, detail="OTP expired")
 
     otp.consumed = True
-    db.commit()
-
     user = create_or_get_user_by_phone(db, phone_number)
-
-    subject = user.username
-    access_token = create_access_token({"sub": subject}, db)
-    refresh_token = create_refresh_token({"sub": subject}, db)
+    # Consuming the OTP, creating the user and recording both tokens share one commit
+    access_token, refresh_token = issue_token_pair(user, {"sub": user.username}, db)
     return user, access_token, refresh_token
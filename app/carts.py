@@ -0,0 +1,266 @@
+"""Server-side carts kept in a fast store and persisted write-behind.
+
+Cart edits only touch the store: an in-process LRU by default, or Redis when
+REDIS_URL is set (required when running several workers, since the
+in-process store is per worker). Every edit marks the user's cart dirty; a
+background job writes all dirty carts to ``carts``/``cart_items`` every
+CART_FLUSH_SECONDS in one transaction per batch, so a burst of edits to one
+cart costs a single write. Carts missing from the store are loaded from the
+tables through a short-lived session of their own, and the shutdown hook
+flushes whatever is still pending. Store calls block (Redis, locks), so
+async routes run them in the threadpool.
+
+Each edit is a read-modify-write of the whole cart. The in-process store is
+serialised by per-user locks; Redis runs it as a WATCH/MULTI transaction
+that is retried when another worker wrote the cart in between, so
+concurrent edits from several workers never overwrite each other.
+
+A cart is stored as a plain dict::
+
+    {"restaurant_id": 3, "items": [{"menu_item_id": 7, "quantity": 2, "special_instructions": None}]}
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app import models
+from app.config import CART_MAX_ENTRIES, CART_REDIS_TTL_SECONDS, REDIS_URL
+from app.database import SessionLocal
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+_FLUSH_BATCH_SIZE = 500
+_LOCK_STRIPES = 64
+
+
+def empty_cart() -> dict:
+    return {"restaurant_id": None, "items": []}
+
+
+class MemoryCartBackend:
+    """LRU of carts; dirty carts pushed out by the LRU are held until flushed."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._carts: "OrderedDict[int, dict]" = OrderedDict()
+        self._evicted: dict[int, dict] = {}
+        self._dirty: set[int] = set()
+        self._lock = threading.RLock()
+
+    def load(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                cart = self._evicted.get(user_id)
+            if cart is not None:
+                self._put(user_id, cart)
+            return cart
+
+    def _put(self, user_id: int, cart: dict):
+        self._carts[user_id] = cart
+        self._carts.move_to_end(user_id)
+        while len(self._carts) > self.maxsize:
+            old_id, old_cart = self._carts.popitem(last=False)
+            if old_id in self._dirty:
+                self._evicted[old_id] = old_cart
+
+    def cache(self, user_id: int, cart: dict):
+        with self._lock:
+            self._put(user_id, cart)
+
+    def save(self, user_id: int, cart: dict):
+        with self._lock:
+            self._put(user_id, cart)
+            self._dirty.add(user_id)
+
+    def update(self, user_id: int, apply: Callable[[dict], dict], missing: Callable[[], dict]) -> dict:
+        cart = self.load(user_id)
+        cart = apply(missing() if cart is None else cart)
+        self.save(user_id, cart)
+        return cart
+
+    def pop_dirty(self, limit: int) -> list[tuple[int, dict]]:
+        with self._lock:
+            batch = []
+            while self._dirty and len(batch) < limit:
+                user_id = self._dirty.pop()
+                cart = self._carts.get(user_id) or self._evicted.get(user_id)
+                self._evicted.pop(user_id, None)
+                if cart is not None:
+                    batch.append((user_id, json.loads(json.dumps(cart))))
+            return batch
+
+    def mark_dirty(self, carts: list[tuple[int, dict]]):
+        with self._lock:
+            for user_id, cart in carts:
+                if user_id not in self._dirty:
+                    self._dirty.add(user_id)
+                    if user_id not in self._carts:
+                        self._evicted[user_id] = cart
+
+
+class RedisCartBackend:
+    """Carts as JSON strings in Redis, with the dirty user ids in a set."""
+
+    def __init__(self, client, ttl: int, prefix: str = "cart:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.dirty_key = f"{prefix}dirty"
+
+    def load(self, user_id: int) -> Optional[dict]:
+        raw = self.client.get(f"{self.prefix}{user_id}")
+        return json.loads(raw) if raw else None
+
+    def cache(self, user_id: int, cart: dict):
+        self.client.set(f"{self.prefix}{user_id}", json.dumps(cart), ex=self.ttl)
+
+    def update(self, user_id: int, apply: Callable[[dict], dict], missing: Callable[[], dict]) -> dict:
+        key = f"{self.prefix}{user_id}"
+
+        def edit(pipe):
+            raw = pipe.get(key)
+            cart = apply(json.loads(raw) if raw else missing())
+            pipe.multi()
+            pipe.set(key, json.dumps(cart), ex=self.ttl)
+            pipe.sadd(self.dirty_key, user_id)
+            return cart
+
+        # Re-runs edit() if another worker changes the cart before EXEC
+        return self.client.transaction(edit, key, value_from_callable=True)
+
+    def pop_dirty(self, limit: int) -> list[tuple[int, dict]]:
+        user_ids = [int(u) for u in self.client.spop(self.dirty_key, limit) or []]
+        batch = []
+        for user_id in user_ids:
+            cart = self.load(user_id)
+            if cart is not None:
+                batch.append((user_id, cart))
+        return batch
+
+    def mark_dirty(self, carts: list[tuple[int, dict]]):
+        if carts:
+            self.client.sadd(self.dirty_key, *[user_id for user_id, _ in carts])
+
+
+def _make_backend():
+    if REDIS_URL:
+        try:
+            import redis
+
+            return RedisCartBackend(redis.Redis.from_url(REDIS_URL), CART_REDIS_TTL_SECONDS)
+        except ImportError:
+            logger.warning("REDIS_URL is set but redis is not installed; using in-process cart store")
+    return MemoryCartBackend(CART_MAX_ENTRIES)
+
+
+def _load_from_db(user_id: int) -> dict:
+    db = SessionLocal()
+    try:
+        cart = db.query(models.Cart).filter(models.Cart.user_id == user_id).order_by(models.Cart.id).first()
+        if cart is None:
+            return empty_cart()
+        items = db.query(models.CartItem).filter(models.CartItem.cart_id == cart.id).order_by(models.CartItem.id).all()
+        return {
+            "restaurant_id": cart.restaurant_id,
+            "items": [
+                {
+                    "menu_item_id": item.menu_item_id,
+                    "quantity": item.quantity,
+                    "special_instructions": item.special_instructions,
+                }
+                for item in items
+            ],
+        }
+    finally:
+        db.close()
+
+
+def _write_batch(db: Session, batch: list[tuple[int, dict]]):
+    user_ids = [user_id for user_id, _ in batch]
+    rows = db.query(models.Cart).filter(models.Cart.user_id.in_(user_ids)).order_by(models.Cart.id).all()
+    existing: dict[int, models.Cart] = {}
+    for row in rows:
+        existing.setdefault(row.user_id, row)
+    if rows:
+        db.query(models.CartItem).filter(models.CartItem.cart_id.in_([r.id for r in rows])).delete(
+            synchronize_session=False
+        )
+
+    for user_id, state in batch:
+        cart = existing.get(user_id)
+        if not state["items"]:
+            if cart is not None:
+                db.delete(cart)
+                del existing[user_id]
+            continue
+        if cart is None:
+            cart = existing[user_id] = models.Cart(user_id=user_id, restaurant_id=state["restaurant_id"])
+            db.add(cart)
+        else:
+            cart.restaurant_id = state["restaurant_id"]
+    db.flush()
+
+    item_rows = [
+        {"cart_id": existing[user_id].id, **item}
+        for user_id, state in batch
+        if user_id in existing
+        for item in state["items"]
+    ]
+    if item_rows:
+        db.execute(insert(models.CartItem), item_rows)
+
+
+class CartStore:
+    def __init__(self, backend):
+        self.backend = backend
+        # Serializes edits to one user's cart within this worker; the backend keeps workers apart
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def get(self, user_id: int) -> dict:
+        cart = self.backend.load(user_id)
+        if cart is None:
+            cart = _load_from_db(user_id)
+            self.backend.cache(user_id, cart)
+        return cart
+
+    def update(self, user_id: int, change: Callable[[dict], None]) -> dict:
+        """Apply ``change`` to a copy of the user's cart and store the result as dirty.
+
+        ``change`` may run more than once if another worker edits the cart concurrently.
+        """
+
+        def apply(current: dict) -> dict:
+            cart = json.loads(json.dumps(current))
+            change(cart)
+            if not cart["items"]:
+                cart["restaurant_id"] = None
+            return cart
+
+        with self._locks[user_id % _LOCK_STRIPES]:
+            return self.backend.update(user_id, apply, lambda: _load_from_db(user_id))
+
+    def flush(self) -> int:
+        """Persist every dirty cart; returns how many were written."""
+        written = 0
+        while True:
+            batch = self.backend.pop_dirty(_FLUSH_BATCH_SIZE)
+            if not batch:
+                return written
+            db = SessionLocal()
+            try:
+                _write_batch(db, batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.backend.mark_dirty(batch)
+                raise
+            finally:
+                db.close()
+            written += len(batch)
+
+
+cart_store = CartStore(_make_backend())
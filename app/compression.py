@@ -0,0 +1,278 @@
+"""Response compression and conditional GETs, as pure ASGI middlewares.
+
+CompressionMiddleware encodes responses with the best encoding the client
+accepts: brotli and zstd when their packages are installed, gzip always.
+Only 2xx responses of compressible content types are touched, and bodies
+smaller than COMPRESSION_MIN_BYTES are sent as they are. Streamed bodies
+(NDJSON exports) are compressed chunk by chunk; Server-Sent Events, file
+responses of binary media and bodies that already carry a Content-Encoding
+pass straight through.
+
+ConditionalGetMiddleware gives GET responses that have no ETag of their
+own a weak one computed from the body and answers a matching
+If-None-Match with 304. It runs inside the compressor, so the tag
+describes the uncompressed body and stays the same for every encoding.
+"""
+import hashlib
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import COMPRESSION_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# Never buffered or compressed: every event must reach the client immediately
+STREAMING_TYPES = ("text/event-stream",)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its quality."""
+    accepted = {}
+    for part in header.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[token] = quality
+    return accepted
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders() -> dict:
+    """Encoders in server preference order, used to break ties in client quality."""
+    encoders = {}
+    if brotli is not None:
+        encoders["br"] = _Brotli
+    if zstandard is not None:
+        encoders["zstd"] = _Zstd
+    encoders["gzip"] = _Gzip
+    return encoders
+
+
+def choose_encoding(header: str, encoders) -> Optional[str]:
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encoders:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    if not content_type or content_type.startswith(STREAMING_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers: MutableHeaders, value: str):
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = value
+    elif value.lower() not in vary.lower():
+        headers["vary"] = f"{vary}, {value}"
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = available_encoders()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                length = headers.get("content-length")
+                if (
+                    not 200 <= message["status"] < 300
+                    or message["status"] in (204, 206)
+                    or "content-encoding" in headers
+                    or not _compressible(headers)
+                    or (length is not None and int(length) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # held until the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend: nothing to compress
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = self.encoders[encoding]()
+                headers["content-encoding"] = encoding
+                _add_vary(headers, "Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # The encoded bytes differ from the representation the strong tag names
+                    headers["etag"] = f"W/{etag}"
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                else:
+                    data = compressor.compress(body) + compressor.finish()
+                    headers["content-length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def weak_etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison, as required for If-None-Match."""
+    if not header:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip() == "*" or tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_tagged(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    message["status"] != 200
+                    or "etag" in headers
+                    or "no-store" in headers.get("cache-control", "")
+                    or headers.get("content-type", "").startswith(STREAMING_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or message.get("more_body", False):
+                # Streamed bodies are not buffered just to hash them
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            etag = weak_etag(message.get("body", b""))
+            headers["etag"] = etag
+            if etag_matches(if_none_match, etag):
+                for name in ("content-length", "content-type", "content-encoding"):
+                    if name in headers:
+                        del headers[name]
+                await send({**start, "status": 304})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_tagged)
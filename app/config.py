@@ -6,13 +6,78 @@ if not os.getenv("DATABASE_URL"):
     load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Async driver URL; derived from DATABASE_URL (asyncpg / aiosqlite) when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# Comma separated read replica URLs used by public browse/search routes
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_HEALTH_CHECK_SECONDS = int(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "30"))
+# Schema DDL at startup: "migrate" upgrades to the latest Alembic revision, "none"
+# skips DDL entirely (run `alembic upgrade head` as a deploy step instead)
+DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "migrate").lower()
 SECRET_KEY = os.getenv("SECRET_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Debug print to verify DATABASE_URL
-print(f"DATABASE_URL being used: {DATABASE_URL}")
+# Logging: level, line format (json | text) and the share of DEBUG records kept
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+# Development only: log OTP codes at DEBUG, since no SMS provider is wired up
+LOG_OTP_CODES = os.getenv("LOG_OTP_CODES", "false").lower() in ("1", "true", "yes")
+
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 3000
+REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
+
+# Authenticated principals are cached in-process to skip the per-request user query
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# How often each worker re-syncs blacklisted tokens written by other workers
+REVOCATION_REFRESH_SECONDS = int(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+
+# Optional shared Redis for caches that must stay consistent across workers
+REDIS_URL = os.getenv("REDIS_URL")
+# Rendered responses of public listing routes, invalidated by owner/admin writes
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+
+# Popular ranking: score = (C * m + sum of ratings) / (C + review count), with C
+# POPULARITY_PRIOR_REVIEWS and m the mean rating over all reviews
+POPULARITY_PRIOR_REVIEWS = int(os.getenv("POPULARITY_PRIOR_REVIEWS", "10"))
+POPULARITY_DEFAULT_MEAN = float(os.getenv("POPULARITY_DEFAULT_MEAN", "3.5"))
+POPULARITY_REFRESH_SECONDS = int(os.getenv("POPULARITY_REFRESH_SECONDS", "30"))
+POPULARITY_FULL_REFRESH_SECONDS = int(os.getenv("POPULARITY_FULL_REFRESH_SECONDS", "3600"))
+
+# Image uploads: size cap, copy chunk size and thumbnail process pool size
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# nginx internal location serving the uploads directory; enables X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+# Live carts: in-process LRU size, Redis expiry, and write-behind interval
+CART_MAX_ENTRIES = int(os.getenv("CART_MAX_ENTRIES", "50000"))
+CART_REDIS_TTL_SECONDS = int(os.getenv("CART_REDIS_TTL_SECONDS", str(7 * 24 * 3600)))
+CART_FLUSH_SECONDS = int(os.getenv("CART_FLUSH_SECONDS", "5"))
+
+# How often stored rating aggregates are checked against the reviews table
+REVIEW_RECONCILE_SECONDS = int(os.getenv("REVIEW_RECONCILE_SECONDS", "3600"))
+
+# Tax applied to the order subtotal (0.05 = 5%)
+ORDER_TAX_RATE = float(os.getenv("ORDER_TAX_RATE", "0.05"))
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Query audit: record every statement per request and report repeated SELECTs (N+1)
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "false").lower() in ("1", "true", "yes")
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+# Statements slower than this are logged with their EXPLAIN plan (0 disables)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# Raise instead of logging when a route exceeds its @query_budget (tests / CI)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
 
 UPLOAD_DIR = "uploads"
 CHROMA_DIR = "chroma_db"
@@ -0,0 +1,80 @@
+"""Precomputed delivery coverage: which geohash cells each restaurant delivers to.
+
+Every restaurant stores the cells of COVERAGE_PRECISION that intersect its
+delivery circle. Answering "who can deliver here" is then a primary-key
+lookup on the customer's cell followed by an exact distance check on the
+few restaurants found there.
+"""
+from sqlalchemy import exists, inspect, insert
+from sqlalchemy.orm import Session
+from app import geo, models
+from app.database import SessionLocal
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ~4.9km x 4.9km cells: a 5km radius covers about a dozen, the 50km maximum a few hundred
+COVERAGE_PRECISION = 5
+COVERAGE_FIELDS = ("latitude", "longitude", "delivery_radius")
+
+
+def customer_cell(lat: float, lng: float) -> str:
+    return geo.encode(lat, lng, COVERAGE_PRECISION)
+
+
+def _write_cells(db: Session, restaurant: models.Restaurant):
+    db.query(models.RestaurantCoverageCell).filter(
+        models.RestaurantCoverageCell.restaurant_id == restaurant.id
+    ).delete(synchronize_session=False)
+    if restaurant.latitude is None or restaurant.longitude is None or not restaurant.delivery_radius:
+        return
+    cells = geo.cells_within(restaurant.latitude, restaurant.longitude, restaurant.delivery_radius, COVERAGE_PRECISION)
+    db.execute(
+        insert(models.RestaurantCoverageCell),
+        [{"cell": cell, "restaurant_id": restaurant.id} for cell in cells],
+    )
+
+
+def refresh_coverage(db: Session, restaurant: models.Restaurant):
+    """Rebuild a restaurant's coverage cells if it is new or its location/radius changed.
+
+    Call after applying changes and before commit so the cells are written in
+    the same transaction as the restaurant.
+    """
+    state = inspect(restaurant)
+    if state.persistent and not any(state.attrs[f].history.has_changes() for f in COVERAGE_FIELDS):
+        return
+    db.flush()
+    _write_cells(db, restaurant)
+
+
+def backfill_coverage(batch_size: int = 500):
+    """Compute coverage for located restaurants that have none yet (e.g. pre-existing rows)."""
+    db = SessionLocal()
+    try:
+        total = 0
+        last_id = 0
+        while True:
+            restaurants = (
+                db.query(models.Restaurant)
+                .filter(
+                    models.Restaurant.id > last_id,
+                    models.Restaurant.latitude.isnot(None),
+                    models.Restaurant.longitude.isnot(None),
+                    ~exists().where(models.RestaurantCoverageCell.restaurant_id == models.Restaurant.id),
+                )
+                .order_by(models.Restaurant.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not restaurants:
+                break
+            for restaurant in restaurants:
+                _write_cells(db, restaurant)
+            db.commit()
+            total += len(restaurants)
+            last_id = restaurants[-1].id
+        if total:
+            logger.info(f"Built delivery coverage for {total} restaurants")
+    finally:
+        db.close()
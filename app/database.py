@@ -1,57 +1,246 @@
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
-from typing import Generator
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import AsyncGenerator, Generator, Optional
+import itertools
 import logging
-from app.config import DATABASE_URL
+import os
+import threading
+import time
+# query_audit hooks its slow-query logging into metrics' statement listener on import
+from app import metrics, query_audit  # noqa: F401
+from app.config import DATABASE_URL, ASYNC_DATABASE_URL, READ_REPLICA_URLS, REPLICA_HEALTH_CHECK_SECONDS
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
-# Database engine configuration
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False,  # Set to True for SQL query logging
-)
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
 
-# Session configuration
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    expire_on_commit=False
-)
+def _async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver."""
+    for prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite+pysqlite://", "sqlite+aiosqlite://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 20
 
-# Base class for models
-Base = declarative_base()
 
-# Database event listeners for logging
-@event.listens_for(engine, "connect")
+class _TimedCheckout:
+    """Reports how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(self.logging_name or "default", time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _make_engine(url: str, name: str):
+    return create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_logging_name=name,
+        echo=False,  # Set to True for SQL query logging
+    )
+
+def _make_async_engine(url: str, name: str):
+    # Shares pool sizing with the sync engines
+    return create_async_engine(
+        url,
+        poolclass=TimedAsyncQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_logging_name=name,
+        echo=False,
+    )
+
+# Database event listeners
 def set_sqlite_pragma(dbapi_connection, connection_record):
     """Set SQLite pragmas for better performance and features."""
-    if "sqlite" in DATABASE_URL:
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        cursor.close()
-
-@event.listens_for(engine, "checkout")
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 def receive_checkout(dbapi_connection, connection_record, connection_proxy):
     """Log database connection checkout."""
     logger.debug("Database connection checked out")
 
-@event.listens_for(engine, "checkin")
 def receive_checkin(dbapi_connection, connection_record):
     """Log database connection checkin."""
     logger.debug("Database connection checked in")
 
+def _configure_engine(sync_engine):
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragma)
+    event.listen(sync_engine, "checkout", receive_checkout)
+    event.listen(sync_engine, "checkin", receive_checkin)
+    event.listen(sync_engine, "before_cursor_execute", metrics.before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", metrics.after_cursor_execute)
+    metrics.register_engine(sync_engine.pool.logging_name, sync_engine, POOL_SIZE + POOL_MAX_OVERFLOW)
+
+# Primary (writer) engines
+engine = _make_engine(DATABASE_URL, "primary")
+async_engine = _make_async_engine(ASYNC_DATABASE_URL or _async_url(DATABASE_URL), "primary-async")
+_configure_engine(engine)
+_configure_engine(async_engine.sync_engine)
+logger.info(f"Using database {engine.url!r}")
+
+
+class Replica:
+    """A read replica: sync and async engines plus a health flag."""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.engine = _make_engine(url, name)
+        self.async_engine = _make_async_engine(_async_url(url), f"{name}-async")
+        self.healthy = True
+        _configure_engine(self.engine)
+        _configure_engine(self.async_engine.sync_engine)
+        for sync_engine in (self.engine, self.async_engine.sync_engine):
+            event.listen(sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.healthy = False
+            logger.warning(f"Read replica {self.engine.url!r} disconnected; routing reads elsewhere")
+
+
+class ReplicaSet:
+    """Round-robin over healthy replicas; health is re-checked by a background thread."""
+
+    def __init__(self, urls: list[str], check_interval: float):
+        self.replicas = [Replica(url, f"replica{i}") for i, url in enumerate(urls, start=1)]
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pick(self) -> Optional[Replica]:
+        """Next healthy replica, or None to fall back to the primary."""
+        n = len(self.replicas)
+        for _ in range(n):
+            replica = self.replicas[next(self._counter) % n]
+            if replica.healthy:
+                return replica
+        return None
+
+    def check(self):
+        for replica in self.replicas:
+            healthy = test_connection(replica.engine)
+            if healthy != replica.healthy:
+                logger.info(f"Read replica {replica.engine.url!r} is now {'healthy' if healthy else 'unhealthy'}")
+            replica.healthy = healthy
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def start(self):
+        if not self.replicas or self._thread is not None:
+            return
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+replica_set = ReplicaSet(READ_REPLICA_URLS, REPLICA_HEALTH_CHECK_SECONDS)
+
+
+class RoutingSession(Session):
+    """Session that reads from a replica and writes to the primary.
+
+    A replica is picked on first use and kept for the session's lifetime, so
+    one request sees a single consistent snapshot. As soon as the session
+    flushes or executes DML it pins itself to the primary, so a request
+    reads its own writes.
+    """
+
+    use_async_engines = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = async_engine.sync_engine if self.use_async_engines else engine
+        if getattr(self, "_pinned_primary", False) or self._flushing or (
+            clause is not None and getattr(clause, "is_dml", False)
+        ):
+            self._pinned_primary = True
+            return primary
+        bind = getattr(self, "_replica_bind", None)
+        if bind is None:
+            replica = replica_set.pick()
+            if replica is None:
+                return primary
+            bind = replica.async_engine.sync_engine if self.use_async_engines else replica.engine
+            self._replica_bind = bind
+        return bind
+
+
+class AsyncRoutingSession(RoutingSession):
+    use_async_engines = True
+
+
+# Session configuration
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    expire_on_commit=False
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Read-mostly sessions for public browse/search traffic
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=AsyncRoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Base class for models
+Base = declarative_base()
+
 def get_db() -> Generator[Session, None, None]:
     """Dependency to get database session."""
     db = SessionLocal()
@@ -65,44 +254,73 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
         logger.debug("Database session closed")
 
-def create_tables():
-    """Create all database tables."""
+def get_read_db() -> Generator[Session, None, None]:
+    """Dependency to get a replica-routed session for read traffic."""
+    db = ReadSessionLocal()
     try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        yield db
     except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+        logger.error(f"Database session error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async database session."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await db.rollback()
+            raise
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async replica-routed session for read traffic."""
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await db.rollback()
+            raise
+
+def upgrade_schema():
+    """Migrate the primary database to the latest Alembic revision (see migrations/)."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    try:
+        with engine.connect() as connection:
+            config.attributes["connection"] = connection
+            command.upgrade(config, "head")
+            connection.commit()
+        logger.info("Database schema is up to date")
+    except Exception as e:
+        logger.error(f"Schema migration failed: {e}")
         raise
 
 def drop_tables():
     """Drop all database tables."""
     try:
         Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
         logger.info("Database tables dropped successfully")
     except Exception as e:
         logger.error(f"Error dropping database tables: {e}")
         raise
 
-def test_connection():
-    """Test database connection."""
+def test_connection(bind=None):
+    """Test database connection (the primary unless another engine is given)."""
+    bind = bind if bind is not None else engine
     try:
-        with engine.connect() as connection:
+        with bind.connect() as connection:
             connection.execute(text("SELECT 1"))
-        logger.info("Database connection test successful")
+        logger.debug("Database connection test successful")
         return True
     except Exception as e:
         logger.error(f"Database connection test failed: {e}")
         return False
-
-def migrate_schema():
-    """Run minimal migrations for incremental schema changes."""
-    try:
-        with engine.begin() as connection:
-            # Add image_url to restaurants if it does not exist (PostgreSQL syntax)
-            connection.execute(
-                text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS image_url VARCHAR(500);")
-            )
-        logger.info("Schema migration completed successfully")
-    except Exception as e:
-        logger.error(f"Schema migration failed: {e}")
-        raise
\ No newline at end of file
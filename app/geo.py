@@ -0,0 +1,135 @@
+"""Geohash cells and great-circle distance helpers for location search."""
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+EARTH_RADIUS_KM = 6371.0088
+# Conservative kilometres per degree: a degree of latitude is never shorter than
+# this, and a degree of longitude is this times cos(latitude).
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+# Precision stored on Restaurant.geohash (~4.8m x 4.8m cells)
+GEOHASH_PRECISION = 9
+
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a point as a base32 geohash of the given length."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    ch = 0
+    bits = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            ch = 0
+            bits = 0
+    return "".join(chars)
+
+
+def cell_size_deg(precision: int) -> tuple[float, float]:
+    """Return (lat_degrees, lng_degrees) spanned by a cell of the given precision."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def prefix_range(cell: str) -> tuple[str, str | None]:
+    """Half-open [low, high) string range holding every geohash that starts with cell.
+
+    The upper bound is the next cell in base32 order rather than a sentinel
+    character, so the range stays correct under any collation that orders
+    digits before lowercase letters. high is None past the last cell.
+    """
+    chars = list(cell)
+    while chars:
+        idx = _BASE32.index(chars[-1])
+        if idx + 1 < len(_BASE32):
+            chars[-1] = _BASE32[idx + 1]
+            return cell, "".join(chars)
+        chars.pop()
+    return cell, None
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def precision_for_radius(lat: float, radius_km: float) -> int:
+    """Finest precision whose cells are at least radius_km tall and wide at this latitude."""
+    cos_lat = math.cos(math.radians(lat))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size_deg(precision)
+        if lat_deg * KM_PER_DEG_LAT >= radius_km and lng_deg * KM_PER_DEG_LNG * cos_lat >= radius_km:
+            return precision
+    return 1
+
+
+def cells_within(lat: float, lng: float, radius_km: float, precision: int) -> list[str]:
+    """All geohash cells of the given precision that intersect the circle around (lat, lng)."""
+    lat_deg, lng_deg = cell_size_deg(precision)
+    d_lat = radius_km / KM_PER_DEG_LAT
+    edge_lat = min(89.9, abs(lat) + d_lat)
+    d_lng = min(180.0, radius_km / (KM_PER_DEG_LNG * math.cos(math.radians(edge_lat))))
+    n_lng = round(360.0 / lng_deg)
+    # Tolerance for measuring to the clamped corner rather than the true nearest edge point
+    slack_km = 0.1
+
+    cells = set()
+    for i in range(math.floor((lat - d_lat + 90.0) / lat_deg), math.floor((lat + d_lat + 90.0) / lat_deg) + 1):
+        cell_lat_lo = i * lat_deg - 90.0
+        if cell_lat_lo < -90.0 or cell_lat_lo >= 90.0:
+            continue
+        near_lat = min(max(lat, cell_lat_lo), cell_lat_lo + lat_deg)
+        for j in range(math.floor((lng - d_lng + 180.0) / lng_deg), math.floor((lng + d_lng + 180.0) / lng_deg) + 1):
+            cell_lng_lo = j * lng_deg - 180.0
+            near_lng = min(max(lng, cell_lng_lo), cell_lng_lo + lng_deg)
+            if haversine_km(lat, lng, near_lat, near_lng) > radius_km + slack_km:
+                continue
+            center_lng = ((j % n_lng) + 0.5) * lng_deg - 180.0
+            cells.add(encode(cell_lat_lo + lat_deg / 2, center_lng, precision))
+    return sorted(cells)
+
+
+def covering_ranges(lat: float, lng: float, radius_km: float) -> list[tuple[str, str | None]]:
+    """Merged prefix_range()s of cells about radius_km / 2 across that cover the circle.
+
+    At most about 25 cells hug the circle, and cells that are adjacent in
+    geohash order are merged into one range scan.
+    """
+    precision = precision_for_radius(lat, radius_km / 2)
+    ranges: list[tuple[str, str | None]] = []
+    for cell in cells_within(lat, lng, radius_km, precision):
+        low, high = prefix_range(cell)
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
@@ -0,0 +1,62 @@
+"""Periodic background jobs, each run on its own daemon thread."""
+import threading
+from typing import Callable
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval: float, fn: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            self.fn()
+        except Exception as e:
+            logger.error(f"Job {self.name} failed: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name=f"job-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs: dict[str, PeriodicJob] = {}
+
+    def add(self, name: str, interval: float, fn: Callable[[], object]) -> PeriodicJob:
+        """Register a job; registering the same name again replaces it."""
+        if name in self.jobs:
+            self.jobs[name].stop()
+        job = self.jobs[name] = PeriodicJob(name, interval, fn)
+        return job
+
+    def start(self):
+        for job in self.jobs.values():
+            job.start()
+        if self.jobs:
+            logger.info(f"Started background jobs: {', '.join(self.jobs)}")
+
+    def stop(self):
+        for job in self.jobs.values():
+            job.stop()
+
+
+scheduler = Scheduler()
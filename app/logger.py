@@ -1,37 +1,155 @@
+"""Non-blocking, structured application logging.
+
+Loggers under ``food_finder`` hand records to a QueueHandler; a single
+QueueListener thread formats them and does the console and rotating-file
+I/O, so a log call on a request path costs an enqueue. Records are written
+as JSON lines (LOG_FORMAT=text for the classic layout) and carry the
+request context bound by the request-id middleware: request_id, method,
+route and, once authenticated, user_id.
+
+DEBUG records are sampled at LOG_DEBUG_SAMPLE_RATE before they are queued,
+so verbose events such as per-checkout pool logs stay affordable with
+LOG_LEVEL=DEBUG. When the queue is full, records are dropped and counted
+rather than blocking the caller (see log_records_dropped_total in /metrics).
+"""
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import random
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+from app import metrics
+from app.config import LOG_DEBUG_SAMPLE_RATE, LOG_FORMAT, LOG_LEVEL
+
+LOG_QUEUE_SIZE = 10000
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+RECORDS_DROPPED = metrics.registry.register(
+    metrics.Counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+)
 
 _LOGGER = None
+_listener: Optional[QueueListener] = None
+_log_context: ContextVar[Optional[dict]] = ContextVar("log_context", default=None)
+
+
+def bind_log_context(**fields) -> Token:
+    """Start a context (one request) whose fields are added to every record logged in it.
+
+    A field may be a callable, evaluated when a record is logged, for values
+    that are only known later (such as the matched route).
+    """
+    return _log_context.set(dict(fields))
+
+
+def update_log_context(**fields):
+    context = _log_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def reset_log_context(token: Token):
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Samples DEBUG records and stamps the rest with the current log context."""
+
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:
+            return False
+        context = _log_context.get()
+        if context:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value() if callable(value) else value)
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback on the caller's side (arguments may
+        # change after the call) but keep them apart for the formatter
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            RECORDS_DROPPED.inc()
+
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == "text":
+        return logging.Formatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)
+    return JSONFormatter()
+
 
 def get_logger(name: str) -> logging.Logger:
-    global _LOGGER
+    global _LOGGER, _listener
     if _LOGGER is not None:
         return _LOGGER.getChild(name)
 
     logger = logging.getLogger("food_finder")
-    logger.setLevel(logging.INFO)
+    logger.setLevel(LOG_LEVEL)
 
     log_dir = os.path.join(os.getcwd(), "logs")
     os.makedirs(log_dir, exist_ok=True)
     log_path = os.path.join(log_dir, "app.log")
 
-    formatter = logging.Formatter(
-        fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    formatter = _formatter()
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(LOG_LEVEL)
 
     file_handler = RotatingFileHandler(log_path, maxBytes=1_000_000, backupCount=5)
     file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
+    file_handler.setLevel(LOG_LEVEL)
+
+    queue_handler = _NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter(LOG_DEBUG_SAMPLE_RATE))
+    logger.addHandler(queue_handler)
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    _listener = QueueListener(queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    # Drain the queue on interpreter exit
+    atexit.register(_listener.stop)
 
     _LOGGER = logger
     return logger.getChild(name)
-
@@ -1,17 +1,38 @@
 from fastapi import FastAPI, HTTPException
-from starlette.staticfiles import StaticFiles
+import asyncio
 import os
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.requests import Request
 from app.middleware import add_middlewares
-from app.database import create_tables, test_connection, migrate_schema
+from app.database import test_connection, upgrade_schema, replica_set
+from app.coverage import backfill_coverage
+from app.text_search import text_search
+from app.revocation import revocations
+from app import metrics, popularity, reviews, uploads
+from app.config import (
+    CART_FLUSH_SECONDS,
+    DB_SCHEMA_MODE,
+    MEDIA_ACCEL_REDIRECT_PREFIX,
+    METRICS_TOKEN,
+    POPULARITY_FULL_REFRESH_SECONDS,
+    POPULARITY_REFRESH_SECONDS,
+    REVIEW_RECONCILE_SECONDS,
+)
+from app.carts import cart_store
+from app.media import MediaFiles
+from app.jobs import scheduler
+from app.realtime import hub
 from app.logger import get_logger
+from app.responses import FastJSONResponse
 from app.routes.restaurants import router as restaurants_router
 from app.routes.search import router as search_router
 from app.routes.auth_routes import router as auth_router
 from app.routes.user import router as user_router
 from app.routes.owner import router as owner_router
+from app.routes.orders import router as orders_router
+from app.routes.cart import router as cart_router
+from app.routes.reviews import router as reviews_router
 
 logger = get_logger(__name__)
 
@@ -20,7 +41,8 @@ app = FastAPI(
     version="0.1.0",
     description="API for food delivery and restaurant management",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 add_middlewares(app)
@@ -28,20 +50,48 @@ add_middlewares(app)
 @app.on_event("startup")
 async def on_startup():
     logger.info("Starting up API")
+    hub.start(asyncio.get_running_loop())
+    uploads.start()
     test_connection()
-    create_tables()
-    migrate_schema()
+    if DB_SCHEMA_MODE == "migrate":
+        upgrade_schema()
+    backfill_coverage()
+    text_search.rebuild()
+    revocations.load()
+    popularity.refresh_all(only_if_empty=True)
+    scheduler.add("popularity", POPULARITY_REFRESH_SECONDS, popularity.refresh_dirty)
+    scheduler.add("popularity-full", POPULARITY_FULL_REFRESH_SECONDS, popularity.refresh_all)
+    scheduler.add("cart-flush", CART_FLUSH_SECONDS, cart_store.flush)
+    scheduler.add("review-reconcile", REVIEW_RECONCILE_SECONDS, reviews.reconcile)
+    scheduler.start()
+    replica_set.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    logger.info("Shutting down API")
+    scheduler.stop()
+    cart_store.flush()
+    replica_set.stop()
+    uploads.shutdown()
+    hub.stop()
 
 # Mount static uploads directory
-uploads_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
-os.makedirs(uploads_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+os.makedirs(uploads.UPLOADS_ROOT, exist_ok=True)
+app.mount(
+    uploads.UPLOADS_URL,
+    MediaFiles(directory=uploads.UPLOADS_ROOT, accel_redirect_prefix=MEDIA_ACCEL_REDIRECT_PREFIX),
+    name="uploads",
+)
 
 app.include_router(restaurants_router, prefix="/restaurants", tags=["restaurants"])
 app.include_router(search_router, prefix="/search", tags=["search"])
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(user_router, prefix="/user", tags=["user"])
 app.include_router(owner_router, prefix="/owner", tags=["owner"])
+app.include_router(orders_router, prefix="/orders", tags=["orders"])
+app.include_router(cart_router, prefix="/cart", tags=["cart"])
+app.include_router(reviews_router, prefix="/reviews", tags=["reviews"])
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -57,3 +107,9 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def root():
     return {"success": True, "data": {"service": "food-finder"}}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
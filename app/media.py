@@ -0,0 +1,66 @@
+"""Static serving for uploaded media.
+
+Uploads named by their content hash (see app.uploads) never change, so
+they are served with a year-long immutable Cache-Control and a strong ETag
+derived from the name. When the client accepts it, a precompressed
+``<file>.br`` / ``<file>.gz`` stored next to the original is sent instead.
+Range requests and zero-copy ``pathsend`` come from Starlette's FileResponse.
+
+With MEDIA_ACCEL_REDIRECT_PREFIX set (nginx ``internal`` location aliased
+to the uploads directory) the app only decides headers and hands the body
+to nginx through X-Accel-Redirect, so no worker time is spent on bytes.
+"""
+import mimetypes
+import os
+import re
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from app.compression import parse_accept_encoding
+
+# <sha256>.<ext> originals and <sha256>_<variant>.webp thumbnails
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+MUTABLE_CACHE = "public, max-age=3600"
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+class MediaFiles(StaticFiles):
+    def __init__(self, *, accel_redirect_prefix: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.accel_redirect_prefix = accel_redirect_prefix.rstrip("/") if accel_redirect_prefix else None
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        headers = {}
+        if HASHED_NAME.match(name):
+            headers["cache-control"] = IMMUTABLE_CACHE
+            headers["etag"] = f'"{os.path.splitext(name)[0]}"'
+        else:
+            headers["cache-control"] = MUTABLE_CACHE
+
+        path = str(full_path)
+        accepted = {e for e, q in parse_accept_encoding(request_headers.get("accept-encoding", "")).items() if q > 0}
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                path += suffix
+                stat_result = os.stat(path)
+                headers["content-encoding"] = encoding
+                if "etag" in headers:
+                    headers["etag"] = headers["etag"][:-1] + f'-{encoding}"'
+                break
+        headers["vary"] = "Accept-Encoding"
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+        if self.accel_redirect_prefix:
+            relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+            headers["x-accel-redirect"] = f"{self.accel_redirect_prefix}/{relative}"
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+        response = FileResponse(path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
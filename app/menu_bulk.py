@@ -0,0 +1,322 @@
+"""Bulk menu import and export for restaurant owners.
+
+Imports accept CSV (header row), NDJSON (one object per line) or a JSON
+array of objects. Rows are parsed and validated one at a time as the file
+is read, so a large menu is never held in memory; invalid rows are reported
+by number and skipped. Valid rows are upserted by dish name (case
+insensitive) within the restaurant, IMPORT_BATCH_SIZE at a time: new dishes
+go in as one multi-row INSERT ... RETURNING, existing ones as one
+executemany UPDATE keyed by id. The whole import is a single transaction.
+
+Exports stream the menu in the same formats with the same columns, so an
+exported file can be edited and imported again.
+"""
+import csv
+import io
+import json
+from typing import Iterator, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app import models, schemas
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.pagination import STREAM_BATCH_SIZE
+from app.response_cache import invalidate_restaurant
+from app.text_search import text_search
+
+logger = get_logger(__name__)
+
+FORMATS = ("csv", "json", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "json": "application/json", "ndjson": "application/x-ndjson"}
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 10000
+MAX_REPORTED_ERRORS = 100
+EXPORT_FIELDS = [
+    "name",
+    "description",
+    "price",
+    "category_id",
+    "image_url",
+    "is_vegetarian",
+    "is_available",
+    "preparation_time",
+    "calories",
+    "ingredients",
+    "allergens",
+]
+LIST_FIELDS = ("ingredients", "allergens")
+# Separator for list columns in CSV cells
+LIST_SEPARATOR = ";"
+# New dishes get every column, so each batch is a single multi-row INSERT
+INSERT_DEFAULTS = {
+    name: field.get_default() for name, field in schemas.MenuItemBase.model_fields.items() if not field.is_required()
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(fmt: Optional[str], filename: Optional[str], content_type: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in FORMATS:
+        return extension
+    if extension == "jsonl":
+        return "ndjson"
+    for name, media_type in MEDIA_TYPES.items():
+        if content_type and content_type.startswith(media_type):
+            return name
+    raise HTTPException(status_code=400, detail="Unknown file format; pass format=csv|json|ndjson")
+
+
+def _csv_rows(text) -> Iterator[dict]:
+    for row in csv.DictReader(text):
+        values = {}
+        for key, value in row.items():
+            if key is None or value is None or not value.strip():
+                continue  # extra or blank cells leave the field unset
+            key = key.strip()
+            value = value.strip()
+            if key in LIST_FIELDS:
+                value = [part.strip() for part in value.split(LIST_SEPARATOR) if part.strip()]
+            values[key] = value
+        yield values
+
+
+def _ndjson_rows(text) -> Iterator[dict]:
+    for line in text:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield RowError(f"invalid JSON: {e.msg}")
+
+
+def _json_rows(text, chunk_size: int = 65536) -> Iterator[dict]:
+    """Decode the elements of a top-level JSON array incrementally."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started, eof = "", 0, False, False
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise HTTPException(status_code=400, detail="JSON import must be an array of objects")
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise HTTPException(status_code=400, detail="Malformed JSON array")
+            else:
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield value
+                    pos = end
+                    continue
+        if eof:
+            raise HTTPException(status_code=400, detail="Malformed JSON array")
+        chunk = text.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def parse_rows(fileobj, fmt: str) -> Iterator[tuple[int, object]]:
+    """Yield (row number, dict or RowError) for every row of an uploaded file."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="" if fmt == "csv" else None)
+    rows = {"csv": _csv_rows, "ndjson": _ndjson_rows, "json": _json_rows}[fmt](text)
+    try:
+        for number, row in enumerate(rows, start=1):
+            if number > MAX_IMPORT_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {MAX_IMPORT_ROWS} rows per import")
+            yield number, row
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
+    finally:
+        text.detach()
+
+
+def _validate(row, categories: dict[str, int], category_ids: set[int]) -> dict:
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("row must be an object")
+    try:
+        item = schemas.MenuItemImport.model_validate(row)
+    except ValidationError as e:
+        raise RowError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    values = item.model_dump(exclude_unset=True, exclude={"category"})
+    if item.category is not None and item.category_id is None:
+        category_id = categories.get(item.category.strip().lower())
+        if category_id is None:
+            raise RowError(f"category: unknown category {item.category!r}")
+        values["category_id"] = category_id
+    elif item.category_id is not None and item.category_id not in category_ids:
+        raise RowError(f"category_id: unknown category {item.category_id}")
+    return values
+
+
+class MenuImport:
+    """Accumulates validated rows and writes them in batches."""
+
+    def __init__(self, db: Session, restaurant_id: int, dry_run: bool = False):
+        self.db = db
+        self.restaurant_id = restaurant_id
+        self.dry_run = dry_run
+        self.created = self.updated = self.failed = 0
+        self.errors: list[dict] = []
+        self.touched: list[int] = []
+        # Lowercased dish name -> (id, image_url) of the restaurant's existing dishes
+        self.existing = {
+            name.strip().lower(): (item_id, image_url)
+            for item_id, name, image_url in db.query(
+                models.MenuItem.id, models.MenuItem.name, models.MenuItem.image_url
+            ).filter(models.MenuItem.restaurant_id == restaurant_id)
+        }
+        self.categories = {
+            name.strip().lower(): category_id for category_id, name in db.query(models.Category.id, models.Category.name)
+        }
+        self.category_ids = set(self.categories.values())
+        self._pending: dict[str, dict] = {}
+
+    def add(self, number: int, row):
+        try:
+            values = _validate(row, self.categories, self.category_ids)
+        except RowError as e:
+            self.failed += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"row": number, "error": str(e)})
+            return
+        key = values["name"].strip().lower()
+        if key not in self.existing and key not in self._pending and "category_id" not in values:
+            self.failed += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"row": number, "error": "category_id: required for new dishes"})
+            return
+        # A later row for the same dish overrides the earlier one
+        self._pending.setdefault(key, {}).update(values)
+        if len(self._pending) >= IMPORT_BATCH_SIZE:
+            self._write()
+
+    def _write(self):
+        inserts, updates = [], []
+        for key, values in self._pending.items():
+            if key in self.existing:
+                item_id, image_url = self.existing[key]
+                if "image_url" in values and values["image_url"] != image_url:
+                    values["image_variants"] = None
+                updates.append({"id": item_id, **values})
+            else:
+                inserts.append({**INSERT_DEFAULTS, "restaurant_id": self.restaurant_id, **values})
+        self._pending.clear()
+        self.created += len(inserts)
+        self.updated += len(updates)
+        if self.dry_run:
+            for row in inserts:
+                self.existing[row["name"].strip().lower()] = (None, row["image_url"])
+            return
+        if inserts:
+            new = self.db.execute(
+                insert(models.MenuItem).returning(models.MenuItem.id, models.MenuItem.name, models.MenuItem.image_url),
+                inserts,
+            ).all()
+            for item_id, name, image_url in new:
+                self.existing[name.strip().lower()] = (item_id, image_url)
+                self.touched.append(item_id)
+        if updates:
+            self.db.execute(update(models.MenuItem), updates)
+            for row in updates:
+                key = row["name"].strip().lower()
+                self.existing[key] = (row["id"], row.get("image_url", self.existing[key][1]))
+                self.touched.append(row["id"])
+
+    def finish(self) -> dict:
+        self._write()
+        if not self.dry_run:
+            self.db.commit()
+            for offset in range(0, len(self.touched), IMPORT_BATCH_SIZE):
+                ids = self.touched[offset:offset + IMPORT_BATCH_SIZE]
+                for item in self.db.query(models.MenuItem).filter(models.MenuItem.id.in_(ids)):
+                    text_search.index_menu_item(item)
+            invalidate_restaurant(self.restaurant_id)
+            logger.info(
+                f"Menu import for restaurant {self.restaurant_id}: "
+                f"{self.created} created, {self.updated} updated, {self.failed} failed"
+            )
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "dry_run": self.dry_run,
+        }
+
+
+def import_menu(db: Session, restaurant_id: int, fileobj, fmt: str, dry_run: bool = False) -> dict:
+    menu_import = MenuImport(db, restaurant_id, dry_run)
+    for number, row in parse_rows(fileobj, fmt):
+        menu_import.add(number, row)
+    return menu_import.finish()
+
+
+def _export_row(item: models.MenuItem) -> dict:
+    return jsonable_encoder({name: getattr(item, name) for name in EXPORT_FIELDS})
+
+
+def _csv_line(values: list) -> str:
+    out = io.StringIO()
+    csv.writer(out).writerow(values)
+    return out.getvalue()
+
+
+def _csv_cell(name: str, value):
+    if value is None:
+        return ""
+    if name in LIST_FIELDS:
+        return LIST_SEPARATOR.join(value)
+    return value
+
+
+def export_menu(restaurant_id: int, fmt: str) -> StreamingResponse:
+    """Stream the restaurant's menu from a dedicated session, ordered by id."""
+
+    def generate():
+        db = SessionLocal()
+        try:
+            items = (
+                db.query(models.MenuItem)
+                .filter(models.MenuItem.restaurant_id == restaurant_id)
+                .order_by(models.MenuItem.id)
+                .yield_per(STREAM_BATCH_SIZE)
+            )
+            if fmt == "csv":
+                yield _csv_line(EXPORT_FIELDS)
+            elif fmt == "json":
+                yield "["
+            for number, item in enumerate(items):
+                row = _export_row(item)
+                if fmt == "csv":
+                    yield _csv_line([_csv_cell(name, row[name]) for name in EXPORT_FIELDS])
+                elif fmt == "json":
+                    yield ("," if number else "") + json.dumps(row)
+                else:
+                    yield json.dumps(row) + "\n"
+            if fmt == "json":
+                yield "]"
+        finally:
+            db.close()
+
+    headers = {"Content-Disposition": f'attachment; filename="menu-{restaurant_id}.{fmt}"'}
+    return StreamingResponse(generate(), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,294 @@
+"""Process metrics in the Prometheus text exposition format.
+
+MetricsMiddleware records, per route template, request counts, latency and
+response size histograms, plus the number of requests in flight. Cursor
+events on every engine count the SQL statements a request runs and the
+time spent in them, and feed a per-statement latency histogram. Pool
+gauges (size, checked out, overflow, saturation) are read from each
+registered engine when /metrics is scraped; checkout wait times come from
+the timed pool classes in app.database.
+
+Values are kept per process. With several workers, scrape each one (or
+aggregate in the collector).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Routes without a template (404s) share one label to keep cardinality bounded
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+        suffix = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+        lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(
+    Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+)
+REQUEST_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "Time to produce the full response.", ("method", "route"))
+)
+RESPONSE_SIZE = registry.register(
+    Histogram("http_response_size_bytes", "Response body bytes sent.", ("method", "route"), SIZE_BUCKETS)
+)
+IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "Requests currently being served."))
+REQUEST_QUERIES = registry.register(
+    Histogram("db_queries_per_request", "SQL statements executed per request.", ("route",), COUNT_BUCKETS)
+)
+REQUEST_QUERY_TIME = registry.register(
+    Histogram("db_query_seconds_per_request", "Time spent in SQL per request.", ("route",))
+)
+QUERY_LATENCY = registry.register(
+    Histogram("db_query_duration_seconds", "SQL statement latency.", ("engine", "operation"), QUERY_LATENCY_BUCKETS)
+)
+POOL_SIZE = registry.register(Gauge("db_pool_size", "Connections kept open by the pool.", ("engine",)))
+POOL_CHECKED_OUT = registry.register(Gauge("db_pool_checked_out", "Connections currently in use.", ("engine",)))
+POOL_OVERFLOW = registry.register(Gauge("db_pool_overflow", "Connections open beyond pool_size.", ("engine",)))
+POOL_SATURATION = registry.register(
+    Gauge("db_pool_saturation", "Checked out connections / (pool_size + max_overflow).", ("engine",))
+)
+POOL_WAIT = registry.register(
+    Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",), QUERY_LATENCY_BUCKETS)
+)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+    # (statement, seconds) per execution; only recorded when a consumer sets a list
+    statements: Optional[list[tuple[str, float]]] = None
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being served, set by MetricsMiddleware (query_audit reads its counts)."""
+    return _request_stats.get()
+
+
+# Engine instrumentation
+# Called as observer(conn, statement, parameters, executemany, elapsed) after every statement
+statement_observers: list = []
+_engines: dict[str, tuple[object, int]] = {}
+
+
+def register_engine(name: str, sync_engine, capacity: int):
+    """Report pool gauges for ``sync_engine``; capacity is pool_size + max_overflow."""
+    _engines[name] = (sync_engine, capacity)
+
+
+def _collect_pools():
+    for name, (sync_engine, capacity) in list(_engines.items()):
+        pool = sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        checked_out = pool.checkedout()
+        POOL_SIZE.set(pool.size(), name)
+        POOL_CHECKED_OUT.set(checked_out, name)
+        POOL_OVERFLOW.set(max(pool.overflow(), 0), name)
+        POOL_SATURATION.set(round(checked_out / capacity, 4) if capacity else 0.0, name)
+
+
+registry.collectors.append(_collect_pools)
+
+
+def observe_pool_wait(name: str, seconds: float):
+    POOL_WAIT.observe(seconds, name)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    QUERY_LATENCY.observe(elapsed, conn.engine.pool.logging_name or "default", operation)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((statement, elapsed))
+    for observer in statement_observers:
+        observer(conn, statement, parameters, executemany, elapsed)
+
+
+def route_label(scope: Scope, root_path: str) -> str:
+    # Routers included by reference keep their own routes; the effective
+    # context carries the template with the include prefix applied
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    if context is not None and getattr(context, "path", None):
+        return context.path
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    mount = scope.get("root_path", "")
+    if mount != root_path:
+        return mount[len(root_path):] or UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root_path = scope.get("root_path", "")
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        size = 0
+        start = time.perf_counter()
+
+        async def send_counted(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            method = scope["method"]
+            route = route_label(scope, root_path)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route)
+            RESPONSE_SIZE.observe(size, method, route)
+            REQUEST_QUERIES.observe(stats.queries, route)
+            REQUEST_QUERY_TIME.observe(stats.query_seconds, route)
@@ -1,6 +1,13 @@
+import time
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Request
+from app.compression import CompressionMiddleware, ConditionalGetMiddleware
+from app.logger import bind_log_context, get_logger, reset_log_context
+from app.metrics import MetricsMiddleware, route_label
+from app.query_audit import QueryAuditMiddleware
+
+access_logger = get_logger("access")
 
 def add_middlewares(app):
     # CORS
@@ -12,11 +19,33 @@ def add_middlewares(app):
         allow_headers=["*"],
     )
 
+    # Added later wraps earlier: ETags are computed on the uncompressed body
+    app.add_middleware(ConditionalGetMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(QueryAuditMiddleware)
+    # Outside the compressor, so response sizes are the bytes actually sent
+    app.add_middleware(MetricsMiddleware)
+
     @app.middleware("http")
     async def add_request_id(request: Request, call_next):
         request_id = str(uuid.uuid4())
         request.state.request_id = request_id
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
+        scope, root_path = request.scope, request.scope.get("root_path", "")
+        # The route is only matched further in, so it is read when a record is logged
+        token = bind_log_context(request_id=request_id, method=request.method, route=lambda: route_label(scope, root_path))
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-ID"] = request_id
+            return response
+        finally:
+            # Time to response start; streamed bodies continue after this
+            latency_ms = round((time.perf_counter() - start) * 1000, 2)
+            access_logger.info(
+                f"{request.method} {route_label(scope, root_path)} {status} {latency_ms} ms",
+                extra={"status": status, "latency_ms": latency_ms},
+            )
+            reset_log_context(token)
 
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Enum, JSON, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Enum, JSON, Date, UniqueConstraint, Index, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
 from app.database import Base
+from app import geo
 
 class UserRole(str, enum.Enum):
     ADMIN = "admin"
@@ -72,6 +73,10 @@ class UserAddress(Base):
     # Relationships
     user = relationship("User", back_populates="addresses")
 
+    __table_args__ = (
+        Index("ix_user_addresses_user_id", "user_id", "id"),
+    )
+
 class Restaurant(Base):
     __tablename__ = "restaurants"
     
@@ -83,6 +88,7 @@ class Restaurant(Base):
     phone_number = Column(String(20))
     email = Column(String(255))
     image_url = Column(String(500))
+    image_variants = Column(JSON)  # variant name -> URL, see app.uploads
     unique_code = Column(String(32), unique=True, index=True)
     store_size = Column(Enum(StoreSize), default=StoreSize.SMALL, nullable=False)
     address_line1 = Column(String(255), nullable=False)
@@ -92,6 +98,7 @@ class Restaurant(Base):
     postal_code = Column(String(20), nullable=False)
     latitude = Column(Float)
     longitude = Column(Float)
+    geohash = Column(String(12))  # derived from latitude/longitude, see _sync_restaurant_geohash
     opening_time = Column(String(10))  # HH:MM format
     closing_time = Column(String(10))   # HH:MM format
     is_open = Column(Boolean, default=True)
@@ -104,6 +111,7 @@ class Restaurant(Base):
     is_active = Column(Boolean, default=True)
     rating = Column(Float, default=0.0)
     total_reviews = Column(Integer, default=0)
+    rating_total = Column(Integer, default=0)  # running sum of review stars, see app.reviews
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -111,6 +119,53 @@ class Restaurant(Base):
     owner = relationship("User", back_populates="restaurant")
     menu_items = relationship("MenuItem", back_populates="restaurant", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="restaurant", cascade="all, delete-orphan")
+    coverage_cells = relationship("RestaurantCoverageCell", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_restaurants_active_geohash", "is_active", "geohash"),
+        Index("ix_restaurants_owner_id", "owner_id"),
+        # /restaurants/ keyset order; city / cuisine get trigram indexes on PostgreSQL (migration 0002)
+        Index("ix_restaurants_active_rating", "is_active", "rating", "id"),
+        Index("ix_restaurants_active_id", "is_active", "id"),
+    )
+
+@event.listens_for(Restaurant, "before_insert")
+@event.listens_for(Restaurant, "before_update")
+def _sync_restaurant_geohash(mapper, connection, target):
+    """Keep the geohash cell column in step with the coordinates."""
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = geo.encode(target.latitude, target.longitude)
+
+@event.listens_for(Restaurant.image_url, "set")
+def _reset_restaurant_variants(target, value, oldvalue, initiator):
+    """Variants belong to the previous image once image_url is replaced."""
+    if value != oldvalue:
+        target.image_variants = None
+
+# Geohash cells intersecting a restaurant's delivery circle, maintained by app.coverage
+class RestaurantCoverageCell(Base):
+    __tablename__ = "restaurant_coverage_cells"
+
+    cell = Column(String(12), primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+# Bayesian-weighted ranking of active restaurants, maintained by app.popularity
+class RestaurantPopularity(Base):
+    __tablename__ = "restaurant_popularity"
+
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    city = Column(String(100), nullable=False)  # lowercased Restaurant.city
+    review_count = Column(Integer, nullable=False, default=0)
+    average_rating = Column(Float)
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_restaurant_popularity_score", "score", "restaurant_id"),
+        Index("ix_restaurant_popularity_city_score", "city", "score", "restaurant_id"),
+    )
 
 class Category(Base):
     __tablename__ = "categories"
@@ -135,6 +190,7 @@ class MenuItem(Base):
     description = Column(Text)
     price = Column(Float, nullable=False)
     image_url = Column(String(500))
+    image_variants = Column(JSON)  # variant name -> URL, see app.uploads
     is_vegetarian = Column(Boolean, default=False)
     is_available = Column(Boolean, default=True)
     preparation_time = Column(Integer)  # in minutes
@@ -143,6 +199,7 @@ class MenuItem(Base):
     allergens = Column(JSON)    # List of allergens
     rating = Column(Float, default=0.0)
     total_reviews = Column(Integer, default=0)
+    rating_total = Column(Integer, default=0)  # running sum of review stars, see app.reviews
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -151,6 +208,16 @@ class MenuItem(Base):
     category = relationship("Category", back_populates="menu_items")
     order_items = relationship("OrderItem", back_populates="menu_item")
 
+    __table_args__ = (
+        Index("ix_menu_items_restaurant_id", "restaurant_id", "id"),
+    )
+
+@event.listens_for(MenuItem.image_url, "set")
+def _reset_menu_item_variants(target, value, oldvalue, initiator):
+    """Variants belong to the previous image once image_url is replaced."""
+    if value != oldvalue:
+        target.image_variants = None
+
 class Order(Base):
     __tablename__ = "orders"
     
@@ -158,6 +225,8 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     order_number = Column(String(50), unique=True, index=True, nullable=False)
+    idempotency_key = Column(String(64))  # client supplied, unique per user
+    idempotency_hash = Column(String(64))  # SHA-256 of the request first sent with idempotency_key
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
     subtotal = Column(Float, nullable=False)
     delivery_fee = Column(Float, default=0.0)
@@ -176,11 +245,18 @@ class Order(Base):
     restaurant = relationship("Restaurant", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("uq_orders_user_idempotency_key", "user_id", "idempotency_key", unique=True),
+        Index("ix_orders_user_id", "user_id", "id"),
+        Index("ix_orders_restaurant_id", "restaurant_id", "id"),
+        Index("ix_orders_restaurant_status", "restaurant_id", "status", "id"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     menu_item_id = Column(Integer, ForeignKey("menu_items.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
@@ -210,11 +286,16 @@ class Review(Base):
     restaurant = relationship("Restaurant")
     order = relationship("Order")
 
+    __table_args__ = (
+        Index("uq_reviews_order_id", "order_id", unique=True),
+        Index("ix_reviews_restaurant_id", "restaurant_id", "id"),
+    )
+
 class Cart(Base):
     __tablename__ = "carts"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -228,7 +309,7 @@ class CartItem(Base):
     __tablename__ = "cart_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    cart_id = Column(Integer, ForeignKey("carts.id"), nullable=False)
+    cart_id = Column(Integer, ForeignKey("carts.id"), nullable=False, index=True)
     menu_item_id = Column(Integer, ForeignKey("menu_items.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     special_instructions = Column(Text)
@@ -243,7 +324,7 @@ class OTPCode(Base):
     __tablename__ = "otp_codes"
 
     id = Column(Integer, primary_key=True)
-    phone_number = Column(String(20), index=True, nullable=False)
+    phone_number = Column(String(20), nullable=False)  # lookups use uq_phone_code
     code = Column(String(6), nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
     consumed = Column(Boolean, default=False)
@@ -0,0 +1,215 @@
+"""Order pricing and placement.
+
+price_order loads the restaurant and every ordered menu item (one IN query)
+and computes the totals; place_order writes the order and all its items in
+one transaction, the items as a single multi-row INSERT ... RETURNING.
+Clients may send an idempotency key: a retried request with the same key
+returns the order created by the first attempt instead of a duplicate. The
+key is stored with a hash of the request it came with, and reusing it for a
+different request is rejected with 422.
+
+Restaurants move orders through ORDER_TRANSITIONS with change_status; every
+creation and status change is pushed to realtime subscribers.
+"""
+import hashlib
+import json
+import secrets
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app import models, schemas
+from app.config import ORDER_TAX_RATE
+from app.logger import get_logger
+from app.realtime import publish_order
+
+logger = get_logger(__name__)
+
+ORDER_TRANSITIONS = {
+    models.OrderStatus.PENDING: {models.OrderStatus.CONFIRMED, models.OrderStatus.CANCELLED},
+    models.OrderStatus.CONFIRMED: {models.OrderStatus.PREPARING, models.OrderStatus.CANCELLED},
+    models.OrderStatus.PREPARING: {models.OrderStatus.READY},
+    models.OrderStatus.READY: {models.OrderStatus.OUT_FOR_DELIVERY},
+    models.OrderStatus.OUT_FOR_DELIVERY: {models.OrderStatus.DELIVERED},
+}
+
+
+@dataclass
+class PricedLine:
+    menu_item: models.MenuItem
+    quantity: int
+    unit_price: float
+    total_price: float
+    special_instructions: Optional[str] = None
+
+
+@dataclass
+class Quote:
+    restaurant: models.Restaurant
+    lines: list[PricedLine] = field(default_factory=list)
+    subtotal: float = 0.0
+    delivery_fee: float = 0.0
+    tax_amount: float = 0.0
+    total_amount: float = 0.0
+
+
+def _money(value: float) -> float:
+    return round(value + 1e-9, 2)
+
+
+def price_order(db: Session, restaurant_id: int, items: list[schemas.OrderItemCreate]) -> Quote:
+    """Validate the requested items against the menu and compute the order totals."""
+    restaurant = db.get(models.Restaurant, restaurant_id)
+    if not restaurant or not restaurant.is_active:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    if restaurant.is_open is False:
+        raise HTTPException(status_code=400, detail="Restaurant is closed")
+
+    ids = {item.menu_item_id for item in items}
+    menu = {
+        m.id: m
+        for m in db.query(models.MenuItem)
+        .filter(models.MenuItem.id.in_(ids), models.MenuItem.restaurant_id == restaurant_id)
+        .all()
+    }
+    missing = sorted(ids - menu.keys())
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Menu items not found: {missing}")
+    unavailable = sorted(i for i in ids if menu[i].is_available is False)
+    if unavailable:
+        raise HTTPException(status_code=400, detail=f"Menu items unavailable: {unavailable}")
+
+    quote = Quote(restaurant=restaurant)
+    for item in items:
+        menu_item = menu[item.menu_item_id]
+        quote.lines.append(
+            PricedLine(
+                menu_item=menu_item,
+                quantity=item.quantity,
+                unit_price=menu_item.price,
+                total_price=_money(menu_item.price * item.quantity),
+                special_instructions=item.special_instructions,
+            )
+        )
+    quote.subtotal = _money(sum(line.total_price for line in quote.lines))
+    minimum = restaurant.minimum_order_amount or 0.0
+    if quote.subtotal < minimum:
+        raise HTTPException(status_code=400, detail=f"Minimum order amount is {minimum:.2f}")
+    quote.delivery_fee = _money(restaurant.delivery_fee or 0.0)
+    quote.tax_amount = _money(quote.subtotal * ORDER_TAX_RATE)
+    quote.total_amount = _money(quote.subtotal + quote.delivery_fee + quote.tax_amount)
+    return quote
+
+
+def _order_number() -> str:
+    return f"ORD-{datetime.utcnow():%Y%m%d}-{secrets.token_hex(5).upper()}"
+
+
+def request_hash(payload) -> str:
+    """SHA-256 of a request body model, independent of key order."""
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def find_by_idempotency_key(db: Session, user_id: int, key: str) -> Optional[models.Order]:
+    return (
+        db.query(models.Order)
+        .options(selectinload(models.Order.order_items))
+        .filter(models.Order.user_id == user_id, models.Order.idempotency_key == key)
+        .first()
+    )
+
+
+def replay(db: Session, user_id: int, key: Optional[str], fingerprint: str) -> Optional[models.Order]:
+    """The order an earlier request with this idempotency key created, if any.
+
+    Raises 422 when the key was first used with a different request.
+    Orders stored before request hashes were recorded replay unchecked.
+    """
+    if not key:
+        return None
+    existing = find_by_idempotency_key(db, user_id, key)
+    if existing and existing.idempotency_hash and existing.idempotency_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return existing
+
+
+def place_order(
+    db: Session,
+    user: models.User,
+    payload: schemas.OrderCreate,
+    idempotency_key: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+) -> tuple[models.Order, bool]:
+    """Price and persist an order; returns (order, created).
+
+    ``fingerprint`` identifies the client request for idempotency checks and
+    defaults to request_hash(payload).
+    """
+    fingerprint = fingerprint or request_hash(payload)
+    existing = replay(db, user.id, idempotency_key, fingerprint)
+    if existing:
+        return existing, False
+
+    quote = price_order(db, payload.restaurant_id, payload.order_items)
+    order = models.Order(
+        user_id=user.id,
+        restaurant_id=quote.restaurant.id,
+        order_number=_order_number(),
+        idempotency_key=idempotency_key,
+        idempotency_hash=fingerprint if idempotency_key else None,
+        subtotal=quote.subtotal,
+        delivery_fee=quote.delivery_fee,
+        tax_amount=quote.tax_amount,
+        total_amount=quote.total_amount,
+        delivery_address=payload.delivery_address,
+        special_instructions=payload.special_instructions,
+    )
+    try:
+        db.add(order)
+        db.flush()
+        items = db.scalars(
+            insert(models.OrderItem).returning(models.OrderItem),
+            [
+                {
+                    "order_id": order.id,
+                    "menu_item_id": line.menu_item.id,
+                    "quantity": line.quantity,
+                    "unit_price": line.unit_price,
+                    "total_price": line.total_price,
+                    "special_instructions": line.special_instructions,
+                }
+                for line in quote.lines
+            ],
+        ).all()
+        set_committed_value(order, "order_items", items)
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same idempotency key won the race
+        db.rollback()
+        existing = replay(db, user.id, idempotency_key, fingerprint)
+        if existing:
+            return existing, False
+        raise
+    logger.info(f"Order {order.order_number} placed by user {user.id} ({quote.total_amount:.2f})")
+    publish_order("order.created", order)
+    return order, True
+
+
+def change_status(db: Session, order: models.Order, status: models.OrderStatus) -> models.Order:
+    """Move an order to ``status`` if the lifecycle allows it, then notify subscribers."""
+    status = models.OrderStatus(status)
+    current = order.status or models.OrderStatus.PENDING
+    if status not in ORDER_TRANSITIONS.get(current, ()):
+        raise HTTPException(status_code=400, detail=f"Cannot change order from {current.value} to {status.value}")
+    order.status = status
+    if status == models.OrderStatus.DELIVERED:
+        order.actual_delivery_time = datetime.utcnow()
+    db.commit()
+    db.refresh(order)
+    publish_order("order.status", order)
+    return order
@@ -0,0 +1,170 @@
+"""Keyset pagination, field projection and NDJSON streaming for list endpoints.
+
+List routes describe their query with a ``build(db)`` callable over the
+entities returned by select_fields, plus a keyset ``order``: a list of
+``(column, descending)`` pairs with JSON-serializable values, ending in a
+unique column. list_response then either returns one page plus
+``next_cursor`` or streams every remaining row as NDJSON from its own
+session.
+"""
+import base64
+import binascii
+import json
+import math
+from typing import Callable, Optional
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import schemas
+from app.database import ReadSessionLocal, SessionLocal
+from app.responses import dumps, success
+
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor produced by encode_cursor, rejecting tampered values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def pagination_params(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    fields: Optional[str] = Query(default=None, description="Comma separated fields to return"),
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+) -> schemas.PaginationParams:
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return schemas.PaginationParams(cursor=cursor, limit=limit, fields=field_list, format=format)
+
+
+def select_fields(model, schema, fields: Optional[list[str]]):
+    """Resolve ``fields=`` into (entities to select, row serializer).
+
+    Without a projection the full ORM object is loaded and dumped through
+    the response schema; with one only the requested columns (plus ``id``)
+    are selected and returned as a plain dict.
+    """
+    if not fields:
+        return [model], lambda row: schema.model_validate(row[0]).model_dump()
+    allowed = set(schema.model_fields) & set(model.__table__.columns.keys())
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    names = list(dict.fromkeys(["id", *fields]))
+    return [getattr(model, name) for name in names], lambda row: {name: row._mapping[name] for name in names}
+
+
+def _cursor_value(column, value):
+    """Check one cursor value against the Python type of its order column."""
+    if value is None or isinstance(value, (bool, list, dict)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = object
+    if python_type is float and isinstance(value, (int, float)) and math.isfinite(value):
+        return float(value)
+    if python_type is object or isinstance(value, python_type):
+        return value
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _cursor_values(order, cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    values = decode_cursor(cursor)
+    if len(values) != len(order):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [_cursor_value(column, value) for (column, _), value in zip(order, values)]
+
+
+def _keyed(query, order, after: Optional[list]):
+    """Add the keyset columns, the "after cursor" predicate and ORDER BY to a query."""
+    query = query.add_columns(*[column.label(f"_key{i}") for i, (column, _) in enumerate(order)])
+    if after is not None:
+        clauses = []
+        for i, (column, descending) in enumerate(order):
+            equal_prefix = [order[j][0] == after[j] for j in range(i)]
+            step = column < after[i] if descending else column > after[i]
+            clauses.append(and_(*equal_prefix, step))
+        query = query.filter(or_(*clauses))
+    return query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+
+
+def _row_cursor(row, order) -> str:
+    return encode_cursor([row._mapping[f"_key{i}"] for i in range(len(order))])
+
+
+def paginate(query, order, params: schemas.PaginationParams):
+    """Fetch one page; returns (rows, next_cursor)."""
+    after = _cursor_values(order, params.cursor)
+    rows = _keyed(query, order, after).limit(params.limit + 1).all()
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        next_cursor = _row_cursor(rows[-1], order)
+    return rows, next_cursor
+
+
+def stream_ndjson(
+    build: Callable[[Session], object], order, serialize, cursor: Optional[str] = None, session_factory=SessionLocal
+) -> StreamingResponse:
+    """Stream every row after ``cursor`` as one JSON object per line.
+
+    Rows are fetched STREAM_BATCH_SIZE at a time from a dedicated session
+    that lives as long as the response body, so the result set is never
+    held in memory as a whole.
+    """
+    after = _cursor_values(order, cursor)
+
+    def generate():
+        db = session_factory()
+        try:
+            query = _keyed(build(db), order, after)
+            for row in query.yield_per(STREAM_BATCH_SIZE):
+                yield dumps(serialize(row)) + b"\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def list_response(db: Session, build: Callable[[Session], object], order, serialize, params: schemas.PaginationParams):
+    if params.format == "ndjson":
+        return stream_ndjson(build, order, serialize, params.cursor)
+    rows, next_cursor = paginate(build(db), order, params)
+    return success([serialize(row) for row in rows], next_cursor=next_cursor)
+
+
+async def list_response_async(
+    db: AsyncSession,
+    build: Callable[[Session], object],
+    order,
+    serialize,
+    params: schemas.PaginationParams,
+    session_factory=ReadSessionLocal,
+):
+    """list_response for async routes; the page query runs on the session's sync facade.
+
+    Streams are served from ``session_factory``: replica-routed by default,
+    like the async read routes themselves; SessionLocal for a user's own data.
+    """
+    if params.format == "ndjson":
+        return stream_ndjson(build, order, serialize, params.cursor, session_factory=session_factory)
+    rows, next_cursor = await db.run_sync(lambda session: paginate(build(session), order, params))
+    return success([serialize(row) for row in rows], next_cursor=next_cursor)
@@ -0,0 +1,199 @@
+"""Precomputed "popular" ranking of active restaurants.
+
+Each active restaurant has a row in ``restaurant_popularity`` holding a
+Bayesian average of its review ratings:
+
+    score = (C * m + sum of ratings) / (C + review count)
+
+where C is POPULARITY_PRIOR_REVIEWS and m the mean rating over all
+reviews, so a handful of five-star reviews does not outrank a long record
+of good ones. /search/popular reads the table through its (score) and
+(city, score) indexes, fetching only one page instead of sorting every
+restaurant.
+
+Scores are computed from the rating_total / total_reviews aggregates that
+app.reviews maintains, so no refresh reads the reviews table. Committed
+writes to reviews and restaurants mark the restaurant dirty; a background
+job upserts the dirty rows every POPULARITY_REFRESH_SECONDS. Every
+POPULARITY_FULL_REFRESH_SECONDS each worker refreshes m and one of them
+(holding a PostgreSQL advisory lock) rebuilds the whole table. Workers only
+build the table at startup when it is empty.
+"""
+import threading
+from typing import Iterable, Optional
+from sqlalchemy import event, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from app import models
+from app.config import POPULARITY_DEFAULT_MEAN, POPULARITY_PRIOR_REVIEWS
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.response_cache import POPULARITY_TAG, response_cache
+
+logger = get_logger(__name__)
+
+_BATCH_SIZE = 500
+_PENDING_KEY = "popularity_dirty"
+# pg_advisory_xact_lock key held by the worker doing the full rebuild
+_REBUILD_LOCK_KEY = 0x706F70756C6172
+_UPSERT_COLUMNS = ("city", "review_count", "average_rating", "score")
+
+_dirty: set[int] = set()
+_lock = threading.Lock()
+_mean: Optional[float] = None
+
+
+def bayesian_score(review_count: int, rating_total: float, mean: float) -> float:
+    return (POPULARITY_PRIOR_REVIEWS * mean + rating_total) / (POPULARITY_PRIOR_REVIEWS + review_count)
+
+
+def mark_dirty(restaurant_ids: Iterable[int]):
+    with _lock:
+        _dirty.update(restaurant_ids)
+
+
+def _global_mean(db: Session) -> float:
+    # From the aggregates app.reviews maintains, so the reviews table is never scanned
+    total, count = db.query(
+        func.sum(models.Restaurant.rating_total), func.sum(models.Restaurant.total_reviews)
+    ).one()
+    return float(total) / count if count else POPULARITY_DEFAULT_MEAN
+
+
+def _upsert(db: Session, rows: list[dict]):
+    """Insert or overwrite ranking rows, so concurrent writers never collide on the primary key."""
+    table = models.RestaurantPopularity.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        for row in rows:
+            db.merge(models.RestaurantPopularity(**row))
+        return
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert(table).values(rows)
+    set_ = {column: statement.excluded[column] for column in _UPSERT_COLUMNS}
+    set_["updated_at"] = func.now()
+    db.execute(statement.on_conflict_do_update(index_elements=[table.c.restaurant_id], set_=set_))
+
+
+def _write_rows(db: Session, restaurant_ids: Optional[list[int]], mean: float) -> int:
+    """Upsert rows for the given active restaurants (all when None) and drop rows of inactive ones."""
+    restaurant = models.Restaurant
+    query = db.query(restaurant.id, restaurant.city, restaurant.total_reviews, restaurant.rating_total).filter(
+        restaurant.is_active == True
+    )
+    active = select(restaurant.id).where(restaurant.is_active == True)
+    stale = db.query(models.RestaurantPopularity).filter(models.RestaurantPopularity.restaurant_id.notin_(active))
+    if restaurant_ids is not None:
+        query = query.filter(restaurant.id.in_(restaurant_ids))
+        stale = stale.filter(models.RestaurantPopularity.restaurant_id.in_(restaurant_ids))
+    stale.delete(synchronize_session=False)
+
+    count, rows = 0, []
+    for restaurant_id, city, review_count, rating_total in query.yield_per(_BATCH_SIZE):
+        review_count = review_count or 0
+        rating_total = float(rating_total or 0)
+        rows.append(
+            {
+                "restaurant_id": restaurant_id,
+                "city": (city or "").strip().lower(),
+                "review_count": review_count,
+                "average_rating": rating_total / review_count if review_count else None,
+                "score": bayesian_score(review_count, rating_total, mean),
+            }
+        )
+        if len(rows) >= _BATCH_SIZE:
+            _upsert(db, rows)
+            count, rows = count + len(rows), []
+    if rows:
+        _upsert(db, rows)
+    return count + len(rows)
+
+
+def _acquire_rebuild_lock(db: Session) -> bool:
+    """Elect one rebuilding worker on PostgreSQL; elsewhere the upserts keep overlapping rebuilds safe."""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REBUILD_LOCK_KEY}).scalar())
+
+
+def refresh_all(only_if_empty: bool = False) -> int:
+    """Refresh the global mean and, in the worker that wins the rebuild lock, every ranking row.
+
+    With ``only_if_empty`` (startup) the rows are only built when the table
+    has none yet; otherwise the scheduled rebuild keeps them fresh.
+    """
+    global _mean
+    db = SessionLocal()
+    try:
+        _mean = _global_mean(db)
+        if only_if_empty and db.query(models.RestaurantPopularity.restaurant_id).first() is not None:
+            return 0
+        if not _acquire_rebuild_lock(db):
+            return 0
+        with _lock:
+            _dirty.clear()
+        count = _write_rows(db, None, _mean)
+        db.commit()
+    finally:
+        db.close()
+    response_cache.invalidate(POPULARITY_TAG)
+    logger.info(f"Rebuilt popularity ranking for {count} restaurants (mean rating {_mean:.2f})")
+    return count
+
+
+def refresh_dirty() -> int:
+    """Recompute rows for restaurants whose reviews or details changed since the last run."""
+    global _mean
+    with _lock:
+        ids = sorted(_dirty)
+        _dirty.clear()
+    if not ids:
+        return 0
+    db = SessionLocal()
+    try:
+        if _mean is None:
+            _mean = _global_mean(db)
+        for start in range(0, len(ids), _BATCH_SIZE):
+            _write_rows(db, ids[start : start + _BATCH_SIZE], _mean)
+        db.commit()
+    except Exception:
+        mark_dirty(ids)
+        raise
+    finally:
+        db.close()
+    response_cache.invalidate(POPULARITY_TAG)
+    return len(ids)
+
+
+# Changes are collected per session and only handed to the refresh job once
+# committed, so the job never recomputes from a transaction still in flight.
+def _pend(target, restaurant_id):
+    session = object_session(target)
+    if session is not None and restaurant_id is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(restaurant_id)
+
+
+@event.listens_for(models.Review, "after_insert")
+@event.listens_for(models.Review, "after_update")
+@event.listens_for(models.Review, "after_delete")
+def _review_changed(mapper, connection, target):
+    _pend(target, target.restaurant_id)
+
+
+@event.listens_for(models.Restaurant, "after_insert")
+@event.listens_for(models.Restaurant, "after_update")
+@event.listens_for(models.Restaurant, "after_delete")
+def _restaurant_changed(mapper, connection, target):
+    _pend(target, target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        mark_dirty(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,222 @@
+"""Per-request SQL auditing: N+1 detection, slow query plans and query budgets.
+
+QueryAuditMiddleware reads the per-request statement count kept by
+app.metrics (so MetricsMiddleware must wrap it). With QUERY_AUDIT enabled
+it also has each statement recorded, and when the request
+finishes it reports any SELECT whose shape (the statement with literals and
+IN lists collapsed) ran QUERY_N_PLUS_ONE_THRESHOLD times or more: the
+signature of a lazy relationship loaded row by row. Log lines carry the
+request id set by the request-id middleware.
+
+Statements slower than SLOW_QUERY_MS are logged whether or not auditing is
+enabled, with the database's EXPLAIN plan for SELECTs (at most once per
+statement shape every SLOW_QUERY_EXPLAIN_SECONDS).
+
+Routes declare how many statements they may run with ``@query_budget(n)``.
+Overruns are logged; with QUERY_BUDGET_STRICT set (in tests and CI) they
+raise QueryBudgetExceeded, which TestClient re-raises in the test.
+``capture_queries()`` records the statements run inside a block for
+assertions that are not tied to one route.
+"""
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app import metrics
+from app.cache import TTLCache
+from app.config import QUERY_AUDIT, QUERY_BUDGET_STRICT, QUERY_N_PLUS_ONE_THRESHOLD, SLOW_QUERY_MS
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERY_EXPLAIN_SECONDS = 600
+MAX_LOGGED_STATEMENT = 500
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+N_PLUS_ONE = metrics.registry.register(
+    metrics.Counter("db_n_plus_one_total", "Requests that repeated a SELECT shape (N+1).", ("route",))
+)
+SLOW_QUERIES = metrics.registry.register(
+    metrics.Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("engine",))
+)
+BUDGET_EXCEEDED = metrics.registry.register(
+    metrics.Counter("db_query_budget_exceeded_total", "Requests that ran more statements than allowed.", ("route",))
+)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with literals and placeholder lists collapsed, for grouping."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(?)", shape)
+
+
+def _truncate(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    if len(statement) > MAX_LOGGED_STATEMENT:
+        return statement[:MAX_LOGGED_STATEMENT] + "..."
+    return statement
+
+
+def _is_select(statement: str) -> bool:
+    return statement.lstrip()[:6].upper() in ("SELECT", "WITH ")
+
+
+_captures: list[list[str]] = []
+_captures_lock = threading.Lock()
+_explained = TTLCache(maxsize=1000, ttl=SLOW_QUERY_EXPLAIN_SECONDS)
+
+
+def query_budget(max_queries: int):
+    """Declare the most SQL statements a route may run per request."""
+
+    def decorator(endpoint):
+        endpoint._query_budget = max_queries
+        return endpoint
+
+    return decorator
+
+
+@contextmanager
+def capture_queries() -> Iterator[list[str]]:
+    """Collect every statement run in this process while the block executes."""
+    captured: list[str] = []
+    with _captures_lock:
+        _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        with _captures_lock:
+            _captures.remove(captured)
+
+
+def explain(conn, statement: str, parameters) -> Optional[str]:
+    """The query plan for ``statement``, run on the raw DBAPI connection so no events fire."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect in ("postgresql", "mysql", "mariadb"):
+        prefix = "EXPLAIN "
+    else:
+        return None
+    cursor = conn.connection.cursor()
+    # A failed statement would abort the request's transaction on PostgreSQL
+    savepoint = dialect == "postgresql"
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT query_audit_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_audit_explain")
+            raise
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT query_audit_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def _report_slow(conn, statement: str, parameters, executemany: bool, elapsed: float):
+    engine_name = conn.engine.pool.logging_name or "default"
+    SLOW_QUERIES.inc(engine_name)
+    # The request id comes from the log context bound by the request-id middleware
+    message = f"Slow query ({elapsed * 1000:.1f} ms, engine {engine_name}): {_truncate(statement)}"
+    shape = statement_shape(statement)
+    if executemany or not _is_select(statement) or _explained.get(shape) is not None:
+        logger.warning(message)
+        return
+    _explained.set(shape, True)
+    try:
+        plan = explain(conn, statement, parameters)
+    except Exception as e:
+        logger.warning(f"{message}\nEXPLAIN failed: {e}")
+        return
+    logger.warning(f"{message}\nPlan:\n{plan}" if plan else message)
+
+
+def _observe(conn, statement: str, parameters, executemany: bool, elapsed: float):
+    if _captures:
+        with _captures_lock:
+            for captured in _captures:
+                captured.append(statement)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        _report_slow(conn, statement, parameters, executemany, elapsed)
+
+
+metrics.statement_observers.append(_observe)
+
+
+@dataclass
+class _Repeat:
+    count: int = 0
+    seconds: float = 0.0
+    example: str = ""
+
+
+def find_n_plus_one(statements: list[tuple[str, float]], threshold: int) -> list[tuple[str, _Repeat]]:
+    """SELECT shapes executed at least ``threshold`` times, most frequent first."""
+    repeats: dict[str, _Repeat] = defaultdict(_Repeat)
+    for statement, seconds in statements:
+        if not _is_select(statement):
+            continue
+        repeat = repeats[statement_shape(statement)]
+        repeat.count += 1
+        repeat.seconds += seconds
+        repeat.example = repeat.example or statement
+    found = [(shape, repeat) for shape, repeat in repeats.items() if repeat.count >= threshold]
+    return sorted(found, key=lambda item: item[1].count, reverse=True)
+
+
+def _finish(scope: Scope, root_path: str, stats: metrics.RequestStats):
+    route = metrics.route_label(scope, root_path)
+    request_id = scope.get("state", {}).get("request_id")
+    request = f"{scope['method']} {route} (request {request_id})"
+    if stats.statements is not None:
+        logger.info(f"{request}: {stats.queries} queries in {stats.query_seconds * 1000:.1f} ms")
+        for shape, repeat in find_n_plus_one(stats.statements, QUERY_N_PLUS_ONE_THRESHOLD):
+            N_PLUS_ONE.inc(route)
+            logger.warning(
+                f"Possible N+1 in {request}: {repeat.count} x {_truncate(repeat.example)} "
+                f"({repeat.seconds * 1000:.1f} ms total)"
+            )
+    budget = getattr(getattr(scope.get("route"), "endpoint", None), "_query_budget", None)
+    if budget is not None and stats.queries > budget:
+        BUDGET_EXCEEDED.inc(route)
+        message = f"{request} ran {stats.queries} queries, over its budget of {budget}"
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class QueryAuditMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = metrics.current_request_stats()
+        if stats is None:
+            await self.app(scope, receive, send)
+            return
+        root_path = scope.get("root_path", "")
+        if QUERY_AUDIT:
+            stats.statements = []
+        await self.app(scope, receive, send)
+        _finish(scope, root_path, stats)
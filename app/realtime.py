@@ -0,0 +1,294 @@
+"""In-process pub/sub hub pushing order events to WebSocket and SSE clients.
+
+Writers publish to a channel (``order:<id>`` for one order,
+``restaurant:<id>`` for everything an owner's restaurant receives) from
+any thread. The hub hands the event to its broker, and every event the
+broker delivers is fanned out on the event loop to the bounded queue of
+each local subscriber of that channel.
+
+LocalBroker delivers straight back to this process. With several workers
+set REDIS_URL: RedisBroker publishes through Redis pub/sub and each worker
+delivers what it receives to its own subscribers.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app import models
+from app.auth import authenticate_token
+from app.config import REDIS_URL
+from app.database import SessionLocal
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+SSE_HEARTBEAT_SECONDS = 15
+# Close code sent to WebSocket clients whose token or access check fails
+WS_UNAUTHORIZED = 4401
+
+
+def order_channel(order_id: int) -> str:
+    return f"order:{order_id}"
+
+
+def restaurant_channel(restaurant_id: int) -> str:
+    return f"restaurant:{restaurant_id}"
+
+
+class LocalBroker:
+    def __init__(self):
+        self.deliver = None
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, channel: str, message: str):
+        if self.deliver is not None:
+            self.deliver(channel, message)
+
+    def stop(self):
+        self.deliver = None
+
+
+class RedisBroker:
+    def __init__(self, client, prefix: str = "realtime:"):
+        self.client = client
+        self.prefix = prefix
+        self._pubsub = None
+        self._thread = None
+
+    def start(self, deliver):
+        def on_message(message):
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = message["data"]
+            deliver(channel[len(self.prefix):], data.decode() if isinstance(data, bytes) else data)
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{f"{self.prefix}*": on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, channel: str, message: str):
+        self.client.publish(f"{self.prefix}{channel}", message)
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+def _make_broker():
+    if REDIS_URL:
+        try:
+            import redis
+
+            return RedisBroker(redis.Redis.from_url(REDIS_URL))
+        except ImportError:
+            logger.warning("REDIS_URL is set but redis is not installed; realtime events stay in-process")
+    return LocalBroker()
+
+
+class Hub:
+    def __init__(self, broker):
+        self.broker = broker
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self.broker.start(self._deliver)
+
+    def stop(self):
+        self.broker.stop()
+        self._loop = None
+
+    def publish(self, channels: list[str], event: dict):
+        """Publish an event to channels; safe to call from worker threads."""
+        message = json.dumps(event, default=str)
+        for channel in channels:
+            try:
+                self.broker.publish(channel, message)
+            except Exception as e:
+                logger.warning(f"Realtime publish to {channel} failed: {e}")
+
+    def _deliver(self, channel: str, message: str):
+        loop = self._loop
+        if loop is None or not self._subscribers.get(channel):
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, channel, message)
+        except RuntimeError:
+            pass  # loop already closed during shutdown
+
+    def _fan_out(self, channel: str, message: str):
+        with self._lock:
+            queues = list(self._subscribers.get(channel, ()))
+        for queue in queues:
+            if queue.full():
+                # A slow client only ever needs the latest status, so drop the oldest event
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+hub = Hub(_make_broker())
+
+
+def order_event(event_type: str, order) -> dict:
+    return {
+        "type": event_type,
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "restaurant_id": order.restaurant_id,
+        "status": order.status.value if hasattr(order.status, "value") else order.status,
+        "updated_at": order.updated_at or order.created_at,
+    }
+
+
+def publish_order(event_type: str, order):
+    hub.publish([order_channel(order.id), restaurant_channel(order.restaurant_id)], order_event(event_type, order))
+
+
+@dataclass
+class Subscription:
+    channel: str
+    queue: asyncio.Queue
+    snapshot: dict
+
+
+# Lifecycle position of each order status; an event at or before the snapshot's status is stale
+_STATUS_RANK = {status.value: rank for rank, status in enumerate(models.OrderStatus)}
+
+
+def _is_stale(message: str, snapshot: dict) -> bool:
+    if snapshot.get("order_id") is None:
+        return False
+    event = json.loads(message)
+    if event.get("order_id") != snapshot["order_id"]:
+        return False
+    return _STATUS_RANK.get(event.get("status"), -1) <= _STATUS_RANK.get(snapshot.get("status"), -1)
+
+
+def _drop_stale(queue: asyncio.Queue, snapshot: dict):
+    """Discard queued events the snapshot already reflects."""
+    pending = []
+    while not queue.empty():
+        pending.append(queue.get_nowait())
+    for message in pending:
+        if not _is_stale(message, snapshot):
+            queue.put_nowait(message)
+
+
+async def authorize_stream(
+    token: Optional[str], access: Callable[[Session, models.User], tuple[str, Callable[[Session], dict]]]
+) -> Subscription:
+    """Authenticate a stream's token, subscribe to its channel, then load the snapshot.
+
+    ``access`` checks access and returns (channel, snapshot loader). The
+    channel is subscribed before the snapshot is read, so an event published
+    in between is queued rather than lost; queued events the snapshot already
+    reflects are dropped. Streams outlive requests, so each step uses a
+    short-lived session and no pooled connection is held while they are open.
+    """
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    def authorize():
+        db = SessionLocal()
+        try:
+            return access(db, authenticate_token(token, db))
+        finally:
+            db.close()
+
+    def snapshot():
+        db = SessionLocal()
+        try:
+            return load(db)
+        finally:
+            db.close()
+
+    channel, load = await run_in_threadpool(authorize)
+    queue = hub.subscribe(channel)
+    try:
+        current = await run_in_threadpool(snapshot)
+    except BaseException:
+        hub.unsubscribe(channel, queue)
+        raise
+    _drop_stale(queue, current)
+    return Subscription(channel, queue, current)
+
+
+def stream_sse(request: Request, subscription: Subscription) -> StreamingResponse:
+    """Server-Sent Events: the current state first, then every event on the channel."""
+    channel, queue = subscription.channel, subscription.queue
+
+    async def events():
+        try:
+            yield f"data: {json.dumps(subscription.snapshot, default=str)}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            hub.unsubscribe(channel, queue)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+async def stream_websocket(websocket: WebSocket, subscription: Subscription):
+    """Accept, send the current state, then every event on the channel until the client goes away."""
+    channel, queue = subscription.channel, subscription.queue
+    receiver = getter = None
+    try:
+        await websocket.accept()
+        await websocket.send_text(json.dumps(subscription.snapshot, default=str))
+        receiver = asyncio.ensure_future(websocket.receive())
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                await websocket.send_text(getter.result())
+            else:
+                getter.cancel()
+            if receiver in done:
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.ensure_future(websocket.receive())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in (receiver, getter):
+            if task is not None and not task.done():
+                task.cancel()
+        hub.unsubscribe(channel, queue)
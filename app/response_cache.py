@@ -0,0 +1,188 @@
+"""Response cache for public, rarely changing read routes.
+
+Routes wrap their handler body in ``response_cache.respond(request, tags,
+produce)``. The rendered JSON body is stored under the route path plus its
+sorted query params, together with the current version of each tag the
+response depends on (``restaurants`` for listings, ``restaurant:<id>`` for
+a single restaurant and its menu, ``categories`` for anything showing
+category details). Owner and admin writes call invalidate_restaurant,
+which bumps those versions so later lookups miss without having to find
+and delete every stored key; orphaned entries age out through the TTL.
+
+Every cached response carries a strong ETag, and a matching
+``If-None-Match`` is answered with an empty 304.
+
+The in-process backend only invalidates the worker that handled the write;
+with several workers set REDIS_URL so tag versions are shared.
+"""
+import hashlib
+from typing import Awaitable, Callable, Iterable, Optional
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from app.cache import TTLCache
+from app.config import REDIS_URL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from app.logger import get_logger
+from app.responses import FastJSONResponse, dumps
+
+logger = get_logger(__name__)
+
+RESTAURANTS_TAG = "restaurants"
+POPULARITY_TAG = "popularity"
+CATEGORIES_TAG = "categories"
+
+
+def restaurant_tag(restaurant_id: int) -> str:
+    return f"restaurant:{restaurant_id}"
+
+
+class MemoryBackend:
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl)
+        self._versions: dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: bytes):
+        self._entries.set(key, value)
+
+    def versions(self, tags: list[str]) -> list[int]:
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: list[str]):
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+
+
+class RedisBackend:
+    """Backend over any redis-py compatible client (get/set/mget/incr/delete/pipeline)."""
+
+    blocking = True
+
+    def __init__(self, client, ttl: float, prefix: str = "rc:"):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def versions(self, tags: list[str]) -> list[int]:
+        if not tags:
+            return []
+        return [int(v or 0) for v in self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])]
+
+    def bump(self, tags: list[str]):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self.prefix}tag:{tag}")
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def _make_backend():
+    if REDIS_URL:
+        try:
+            import redis
+
+            return RedisBackend(redis.Redis.from_url(REDIS_URL), RESPONSE_CACHE_TTL_SECONDS)
+        except ImportError:
+            logger.warning("REDIS_URL is set but redis is not installed; using in-process response cache")
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+
+def cache_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    def _render(self, request: Request, body: bytes, etag: str, status: str) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": status}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, tags: Iterable[str], produce: Callable[[], Awaitable]) -> Response:
+        """Serve the request from the cache, or run ``produce`` and store its JSON result.
+
+        ``produce`` returns the JSON content or a FastJSONResponse; any other
+        Response (e.g. an NDJSON stream) is passed through uncached.
+        """
+        tags = sorted(tags)
+        try:
+            versions = await self._call(self.backend.versions, tags)
+            key = cache_key(request) + "|" + ",".join(f"{t}={v}" for t, v in zip(tags, versions))
+            entry = await self._call(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"Response cache unavailable: {e}")
+            key = entry = None
+        if entry is not None:
+            etag, body = bytes(entry).split(b"\n", 1)
+            return self._render(request, body, etag.decode(), "HIT")
+
+        result = await produce()
+        if isinstance(result, FastJSONResponse):
+            body = bytes(result.body)
+        elif isinstance(result, Response):
+            return result
+        else:
+            body = dumps(result)
+        etag = _etag(body)
+        if key is not None:
+            try:
+                await self._call(self.backend.set, key, etag.encode() + b"\n" + body)
+            except Exception as e:
+                logger.warning(f"Response cache write failed: {e}")
+        return self._render(request, body, etag, "MISS")
+
+    def invalidate(self, *tags: str):
+        try:
+            self.backend.bump(list(tags))
+        except Exception as e:
+            logger.warning(f"Response cache invalidation failed for {tags}: {e}")
+
+
+response_cache = ResponseCache(_make_backend())
+
+
+def invalidate_restaurant(restaurant_id: Optional[int]):
+    """Drop cached listings and the cached detail of one restaurant after a write."""
+    tags = [RESTAURANTS_TAG]
+    if restaurant_id is not None:
+        tags.append(restaurant_tag(restaurant_id))
+    response_cache.invalidate(*tags)
@@ -0,0 +1,40 @@
+"""JSON responses serialized straight to bytes.
+
+FastAPI's default path runs every returned value through jsonable_encoder,
+a recursive pure-Python walk, before json.dumps. FastJSONResponse (the
+app's default response class) renders with orjson when it is installed,
+or pydantic-core's Rust serializer otherwise, and both accept Pydantic
+models as-is. Routes return ``success(data)`` to skip jsonable_encoder
+altogether; ``data`` may be a schema instance or a list of them.
+"""
+from typing import Any
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pydantic-core fallback is slower but has no extra dependency
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return pydantic_core.to_jsonable_python(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return pydantic_core.to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def success(data: Any, status_code: int = 200, headers: dict | None = None, **extra) -> FastJSONResponse:
+    """The ``{"success": true, "data": ...}`` envelope; ``extra`` adds keys such as next_cursor."""
+    return FastJSONResponse({"success": True, "data": data, **extra}, status_code=status_code, headers=headers)
@@ -0,0 +1,149 @@
+"""Review writes and the denormalized rating aggregates they maintain.
+
+Restaurants keep ``rating_total`` (sum of stars), ``total_reviews`` and
+``rating`` (their ratio). Every review write adjusts them with a single
+atomic UPDATE, e.g. ``SET rating_total = rating_total + 4, total_reviews =
+total_reviews + 1``, so concurrent reviews never lose increments and no
+AVG() over the reviews table is needed. A review's optional food_rating
+feeds the same aggregates on every menu item of the reviewed order.
+
+reconcile() recomputes the aggregates from the reviews table and corrects
+rows that drifted (e.g. manual edits or writes that bypassed this module).
+"""
+from sqlalchemy import Float, case, cast, func, or_, select, update
+from sqlalchemy.orm import Session
+from app import models
+from app.database import SessionLocal
+from app.logger import get_logger
+from app.response_cache import invalidate_restaurant
+
+logger = get_logger(__name__)
+
+
+def _adjust(db: Session, model, where, stars: int, count: int):
+    """Add ``stars`` to the running sum and ``count`` to the review count of matching rows."""
+    if not stars and not count:
+        return
+    total = func.coalesce(model.rating_total, 0) + stars
+    reviews = func.coalesce(model.total_reviews, 0) + count
+    db.query(model).filter(where).update(
+        {
+            model.rating_total: total,
+            model.total_reviews: reviews,
+            model.rating: case((reviews > 0, cast(total, Float) / reviews), else_=0.0),
+        },
+        synchronize_session=False,
+    )
+
+
+def _order_menu_items(order_id: int):
+    return select(models.OrderItem.menu_item_id).where(models.OrderItem.order_id == order_id).distinct()
+
+
+def _apply(db: Session, review: models.Review, sign: int):
+    _adjust(db, models.Restaurant, models.Restaurant.id == review.restaurant_id, sign * review.rating, sign)
+    if review.food_rating is not None:
+        where = models.MenuItem.id.in_(_order_menu_items(review.order_id))
+        _adjust(db, models.MenuItem, where, sign * review.food_rating, sign)
+
+
+def add_review(db: Session, review: models.Review):
+    db.add(review)
+    db.flush()
+    _apply(db, review, 1)
+
+
+def update_review(db: Session, review: models.Review, changes: dict):
+    old_rating, old_food = review.rating, review.food_rating
+    for key, value in changes.items():
+        setattr(review, key, value)
+    db.flush()
+    _adjust(db, models.Restaurant, models.Restaurant.id == review.restaurant_id, review.rating - old_rating, 0)
+    if old_food != review.food_rating:
+        where = models.MenuItem.id.in_(_order_menu_items(review.order_id))
+        _adjust(
+            db,
+            models.MenuItem,
+            where,
+            (review.food_rating or 0) - (old_food or 0),
+            (review.food_rating is not None) - (old_food is not None),
+        )
+
+
+def delete_review(db: Session, review: models.Review):
+    _apply(db, review, -1)
+    db.delete(review)
+
+
+def _fix_drift(db: Session, model, actual) -> list[int]:
+    """Overwrite aggregates that differ from ``actual`` (row_id, review_count, rating_total) in one UPDATE ... FROM.
+
+    Reading the stored values and writing the fixes in one statement means a
+    review committed between the two cannot be mistaken for drift.
+    """
+    table = model.__table__
+    stored = table.alias("stored")
+    count = func.coalesce(actual.c.review_count, 0)
+    total = func.coalesce(actual.c.rating_total, 0)
+    drifted = (
+        select(stored.c.id.label("row_id"), count.label("review_count"), total.label("rating_total"))
+        .select_from(stored.outerjoin(actual, actual.c.row_id == stored.c.id))
+        .where(or_(func.coalesce(stored.c.rating_total, 0) != total, func.coalesce(stored.c.total_reviews, 0) != count))
+        .subquery("drifted")
+    )
+    fix = (
+        update(table)
+        .where(table.c.id == drifted.c.row_id)
+        .values(
+            rating_total=drifted.c.rating_total,
+            total_reviews=drifted.c.review_count,
+            rating=case(
+                (drifted.c.review_count > 0, cast(drifted.c.rating_total, Float) / drifted.c.review_count), else_=0.0
+            ),
+        )
+        .returning(table.c.id)
+    )
+    return list(db.execute(fix).scalars())
+
+
+def reconcile() -> int:
+    """Rebuild drifted aggregates from the reviews table; returns the number of rows corrected."""
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # Both statements see one snapshot; a concurrent review write to a
+            # row being fixed fails this run (retried next time) instead of
+            # being overwritten with totals that predate it
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        restaurant_stats = (
+            select(
+                models.Review.restaurant_id.label("row_id"),
+                func.count(models.Review.id).label("review_count"),
+                func.sum(models.Review.rating).label("rating_total"),
+            )
+            .group_by(models.Review.restaurant_id)
+            .subquery("actual")
+        )
+        ordered = select(models.OrderItem.order_id, models.OrderItem.menu_item_id).distinct().subquery()
+        menu_stats = (
+            select(
+                ordered.c.menu_item_id.label("row_id"),
+                func.count(models.Review.id).label("review_count"),
+                func.sum(models.Review.food_rating).label("rating_total"),
+            )
+            .join(ordered, ordered.c.order_id == models.Review.order_id)
+            .where(models.Review.food_rating.isnot(None))
+            .group_by(ordered.c.menu_item_id)
+            .subquery("actual")
+        )
+        restaurant_ids = _fix_drift(db, models.Restaurant, restaurant_stats)
+        menu_item_ids = _fix_drift(db, models.MenuItem, menu_stats)
+        db.commit()
+    finally:
+        db.close()
+    for restaurant_id in restaurant_ids:
+        invalidate_restaurant(restaurant_id)
+    fixed = len(restaurant_ids) + len(menu_item_ids)
+    if fixed:
+        logger.warning(f"Rating reconciliation corrected {fixed} drifted aggregates")
+    return fixed
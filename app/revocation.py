@@ -0,0 +1,97 @@
+"""In-memory index of revoked (blacklisted) token ids.
+
+Authentication checks every token's ``jti`` here instead of querying
+``blacklist_tokens``. A bloom filter answers the common "not revoked" case
+without touching the set, and the set confirms the rare positives. The
+index is loaded at startup, updated immediately by auth.blacklist_token,
+and incrementally re-synced from the table every REVOCATION_REFRESH_SECONDS
+so revocations made by other workers are picked up.
+"""
+import hashlib
+import math
+import threading
+import time
+from sqlalchemy.orm import Session
+from app import models
+from app.config import REVOCATION_REFRESH_SECONDS
+from app.database import SessionLocal
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationIndex:
+    def __init__(self, refresh_seconds: float, capacity: int = 100_000):
+        self.refresh_seconds = refresh_seconds
+        self._bloom = BloomFilter(capacity)
+        self._jtis: set[str] = set()
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._bloom and jti in self._jtis
+
+    def __len__(self):
+        return len(self._jtis)
+
+    def add(self, jti: str):
+        with self._lock:
+            self._jtis.add(jti)
+            if len(self._jtis) > self._bloom.capacity:
+                # Keep the false-positive rate bounded as the blacklist grows
+                self._bloom = BloomFilter(self._bloom.capacity * 2)
+                for existing in self._jtis:
+                    self._bloom.add(existing)
+            else:
+                self._bloom.add(jti)
+
+    def sync(self, db: Session):
+        """Pull blacklist rows added since the last sync."""
+        rows = (
+            db.query(models.BlacklistToken.id, models.BlacklistToken.jti)
+            .filter(models.BlacklistToken.id > self._last_id)
+            .order_by(models.BlacklistToken.id)
+            .all()
+        )
+        for row in rows:
+            self.add(row.jti)
+        if rows:
+            self._last_id = rows[-1].id
+        self._refreshed_at = time.monotonic()
+
+    def sync_if_stale(self, db: Session):
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.sync(db)
+
+    def load(self):
+        db = SessionLocal()
+        try:
+            self.sync(db)
+            logger.info(f"Loaded {len(self)} revoked tokens")
+        finally:
+            db.close()
+
+
+revocations = RevocationIndex(REVOCATION_REFRESH_SECONDS)
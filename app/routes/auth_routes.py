@@ -4,9 +4,9 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import (
     create_or_get_user_by_phone,
-    create_access_token,
-    create_refresh_token,
+    issue_token_pair,
     blacklist_token,
+    invalidate_principal,
     security,
 )
 from app.models import UserRole
@@ -38,21 +38,16 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
     if not getattr(user, "roles", None) or len(user.roles) == 0:
         user.roles = [payload.user_type.value]
         updated = True
-    if updated:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
     # ensure requested role exists for this user
     if payload.user_type.value not in (user.roles or []):
         roles = (user.roles or []) + [payload.user_type.value]
         user.roles = list(dict.fromkeys(roles))
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    subject = user.username
-    token_claims = {"sub": subject, "role": payload.user_type.value}
-    access_token = create_access_token(token_claims, db)
-    refresh_token = create_refresh_token(token_claims, db)
+        updated = True
+    token_claims = {"sub": user.username, "role": payload.user_type.value}
+    # Profile backfill, a newly created user and both outstanding tokens are committed together
+    access_token, refresh_token = issue_token_pair(user, token_claims, db)
+    if updated:
+        invalidate_principal(user.id)
     # Mark profile as incomplete if placeholder values are being used
     profile_incomplete = False
     if (
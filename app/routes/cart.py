@@ -0,0 +1,118 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import get_async_db
+from app import models, schemas
+from app.auth import get_current_user
+from app.carts import cart_store
+from app.orders import place_order, replay, request_hash
+
+router = APIRouter()
+
+MAX_LINE_QUANTITY = 10
+
+
+def _cart_data(cart: dict) -> dict:
+    return schemas.CartState.model_validate(cart).model_dump()
+
+
+def _find_line(cart: dict, menu_item_id: int) -> Optional[dict]:
+    return next((line for line in cart["items"] if line["menu_item_id"] == menu_item_id), None)
+
+
+@router.get("/", response_model=dict, summary="Get my cart")
+async def get_cart(current_user: models.User = Depends(get_current_user)):
+    return {"success": True, "data": _cart_data(await run_in_threadpool(cart_store.get, current_user.id))}
+
+
+@router.post("/items", response_model=dict, summary="Add a menu item to my cart")
+async def add_cart_item(
+    payload: schemas.CartItemCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    menu_item = await db.get(models.MenuItem, payload.menu_item_id)
+    if not menu_item:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    if menu_item.is_available is False:
+        raise HTTPException(status_code=400, detail="Menu item unavailable")
+
+    def change(cart: dict):
+        if cart["restaurant_id"] not in (None, menu_item.restaurant_id):
+            raise HTTPException(status_code=409, detail="Cart contains items from another restaurant")
+        cart["restaurant_id"] = menu_item.restaurant_id
+        line = _find_line(cart, payload.menu_item_id)
+        if line is None:
+            line = {"menu_item_id": payload.menu_item_id, "quantity": 0, "special_instructions": None}
+            cart["items"].append(line)
+        line["quantity"] += payload.quantity
+        if line["quantity"] > MAX_LINE_QUANTITY:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_LINE_QUANTITY} of one item per order")
+        if payload.special_instructions is not None:
+            line["special_instructions"] = payload.special_instructions
+
+    return {"success": True, "data": _cart_data(await run_in_threadpool(cart_store.update, current_user.id, change))}
+
+
+@router.patch("/items/{menu_item_id}", response_model=dict, summary="Change a cart line")
+async def update_cart_item(
+    menu_item_id: int,
+    payload: schemas.CartItemUpdate,
+    current_user: models.User = Depends(get_current_user),
+):
+    def change(cart: dict):
+        line = _find_line(cart, menu_item_id)
+        if line is None:
+            raise HTTPException(status_code=404, detail="Item not in cart")
+        line.update(payload.model_dump(exclude_unset=True, exclude_none=True))
+
+    return {"success": True, "data": _cart_data(await run_in_threadpool(cart_store.update, current_user.id, change))}
+
+
+@router.delete("/items/{menu_item_id}", response_model=dict, summary="Remove a cart line")
+async def remove_cart_item(
+    menu_item_id: int,
+    current_user: models.User = Depends(get_current_user),
+):
+    def change(cart: dict):
+        cart["items"] = [line for line in cart["items"] if line["menu_item_id"] != menu_item_id]
+
+    return {"success": True, "data": _cart_data(await run_in_threadpool(cart_store.update, current_user.id, change))}
+
+
+@router.delete("/", response_model=dict, summary="Empty my cart")
+async def clear_cart(current_user: models.User = Depends(get_current_user)):
+    cart = await run_in_threadpool(cart_store.update, current_user.id, lambda cart: cart["items"].clear())
+    return {"success": True, "data": _cart_data(cart)}
+
+
+@router.post("/checkout", response_model=dict, summary="Place an order for my cart")
+async def checkout(
+    payload: schemas.CartCheckout,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    # The cart is emptied by the first attempt, so a retry is matched on the checkout body alone
+    fingerprint = request_hash(payload)
+    existing = await db.run_sync(replay, current_user.id, idempotency_key, fingerprint)
+    if existing:
+        response.headers["Idempotent-Replayed"] = "true"
+        return {"success": True, "data": schemas.OrderResponse.model_validate(existing).model_dump()}
+    cart = await run_in_threadpool(cart_store.get, current_user.id)
+    if not cart["items"]:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    order_payload = schemas.OrderCreate(
+        restaurant_id=cart["restaurant_id"],
+        delivery_address=payload.delivery_address,
+        special_instructions=payload.special_instructions,
+        order_items=[schemas.OrderItemCreate(**line) for line in cart["items"]],
+    )
+    order, created = await db.run_sync(place_order, current_user, order_payload, idempotency_key, fingerprint)
+    if created:
+        await run_in_threadpool(cart_store.update, current_user.id, lambda cart: cart["items"].clear())
+    else:
+        response.headers["Idempotent-Replayed"] = "true"
+    return {"success": True, "data": schemas.OrderResponse.model_validate(order).model_dump()}
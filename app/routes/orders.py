@@ -0,0 +1,105 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, WebSocket
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.database import SessionLocal, get_async_db
+from app import models, schemas
+from app.auth import get_current_user
+from app.orders import place_order
+from app.pagination import list_response_async, pagination_params, select_fields
+from app.realtime import (
+    WS_UNAUTHORIZED,
+    authorize_stream,
+    order_channel,
+    order_event,
+    stream_sse,
+    stream_websocket,
+)
+
+router = APIRouter()
+
+
+def _order_stream(order_id: int):
+    """Stream access: the order's customer and its restaurant's owner may follow it."""
+
+    def snapshot(db: Session):
+        return order_event("order.snapshot", db.get(models.Order, order_id))
+
+    def access(db: Session, user: models.User):
+        order = db.get(models.Order, order_id)
+        if order is not None and order.user_id != user.id:
+            owner_id = db.query(models.Restaurant.owner_id).filter(models.Restaurant.id == order.restaurant_id).scalar()
+            if owner_id != user.id:
+                order = None
+        if order is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return order_channel(order.id), snapshot
+
+    return access
+
+
+@router.post("/", response_model=dict, summary="Place an order")
+async def create_order(
+    payload: schemas.OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    order, created = await db.run_sync(place_order, current_user, payload, idempotency_key)
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return {"success": True, "data": schemas.OrderResponse.model_validate(order).model_dump()}
+
+
+@router.get("/", summary="List my orders, newest first")
+async def list_orders(
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    user_id = current_user.id
+    entities, serialize = select_fields(models.Order, schemas.OrderResponse, params.fields)
+    order = [(models.Order.id, True)]
+
+    def build(session: Session):
+        query = session.query(*entities).filter(models.Order.user_id == user_id)
+        if not params.fields:
+            query = query.options(selectinload(models.Order.order_items))
+        return query
+
+    return await list_response_async(db, build, order, serialize, params, session_factory=SessionLocal)
+
+
+@router.get("/{order_id}", response_model=dict, summary="Get one of my orders")
+async def get_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    result = await db.execute(
+        select(models.Order)
+        .options(selectinload(models.Order.order_items))
+        .where(models.Order.id == order_id, models.Order.user_id == current_user.id)
+    )
+    order = result.scalars().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return {"success": True, "data": schemas.OrderResponse.model_validate(order).model_dump()}
+
+
+@router.get("/{order_id}/events", summary="Follow an order's status (Server-Sent Events)")
+async def order_events(order_id: int, request: Request, token: Optional[str] = None):
+    subscription = await authorize_stream(token, _order_stream(order_id))
+    return stream_sse(request, subscription)
+
+
+@router.websocket("/{order_id}/ws")
+async def order_websocket(websocket: WebSocket, order_id: int, token: Optional[str] = None):
+    try:
+        subscription = await authorize_stream(token, _order_stream(order_id))
+    except HTTPException:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+    await stream_websocket(websocket, subscription)
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, WebSocket
 from fastapi.responses import JSONResponse
-import os
-from datetime import datetime
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models, schemas
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.database import get_async_db, get_db
+from app import menu_bulk, models, schemas, uploads
 from app.auth import get_current_user
+from app.coverage import refresh_coverage
+from app.orders import change_status
+from app.response_cache import CATEGORIES_TAG, invalidate_restaurant, response_cache
+from app.pagination import list_response, pagination_params, select_fields
+from app.realtime import WS_UNAUTHORIZED, authorize_stream, restaurant_channel, stream_sse, stream_websocket
+from app.text_search import text_search
 
 router = APIRouter()
 
@@ -29,39 +36,30 @@ def create_or_update_my_restaurant(
     else:
         restaurant = models.Restaurant(owner_id=current_user.id, **payload.model_dump())
         db.add(restaurant)
+    refresh_coverage(db, restaurant)
     db.commit()
     db.refresh(restaurant)
+    text_search.index_restaurant(restaurant)
+    invalidate_restaurant(restaurant.id)
     # Convert SQLAlchemy model to Pydantic schema for proper serialization
     restaurant_data = schemas.RestaurantResponse.model_validate(restaurant).model_dump()
     return {"success": True, "data": restaurant_data}
 @router.post("/restaurant/upload-image", response_model=dict, summary="Upload restaurant image (owner)")
-def upload_restaurant_image(
+async def upload_restaurant_image(
     image: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    restaurant = get_my_restaurant(db, current_user.id)
+    restaurant = await db.run_sync(get_my_restaurant, current_user.id)
     if not restaurant:
         raise HTTPException(status_code=400, detail="Create restaurant first")
 
-    # Validate content type
-    if image.content_type not in {"image/jpeg", "image/png", "image/webp"}:
-        raise HTTPException(status_code=400, detail="Unsupported image type")
-
-    uploads_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
-    os.makedirs(uploads_root, exist_ok=True)
-
-    ext = os.path.splitext(image.filename or "")[1].lower() or ".jpg"
-    filename = f"restaurant_{restaurant.id}_{int(datetime.utcnow().timestamp())}{ext}"
-    filepath = os.path.join(uploads_root, filename)
-
-    with open(filepath, "wb") as f:
-        f.write(image.file.read())
-
-    public_url = f"/uploads/{filename}"
-    restaurant.image_url = public_url
-    db.commit()
-    db.refresh(restaurant)
+    stored = await uploads.store_image(image)
+    restaurant.image_url = stored.url
+    restaurant.image_variants = stored.variants or None
+    await db.commit()
+    await db.refresh(restaurant)
+    invalidate_restaurant(restaurant.id)
 
     data = schemas.RestaurantResponse.model_validate(restaurant).model_dump()
     return {"success": True, "data": data}
@@ -101,11 +99,14 @@ def create_category(
 
 
 @router.get("/restaurant/categories")
-def list_categories(db: Session = Depends(get_db)):
-    items = db.query(models.Category).filter(models.Category.is_active == True).all()
-    # Convert SQLAlchemy models to Pydantic schemas for proper serialization
-    items_data = [schemas.CategoryResponse.model_validate(item).model_dump() for item in items]
-    return {"success": True, "data": items_data}
+def list_categories(params: schemas.PaginationParams = Depends(pagination_params), db: Session = Depends(get_db)):
+    entities, serialize = select_fields(models.Category, schemas.CategoryResponse, params.fields)
+    order = [(models.Category.id, False)]
+
+    def build(session: Session):
+        return session.query(*entities).filter(models.Category.is_active == True)
+
+    return list_response(db, build, order, serialize, params)
 
 
 @router.patch("/restaurant/categories/{category_id}")
@@ -123,6 +124,7 @@ def update_category(
         setattr(category, k, v)
     db.commit()
     db.refresh(category)
+    response_cache.invalidate(CATEGORIES_TAG)
     # Convert SQLAlchemy model to Pydantic schema for proper serialization
     category_data = schemas.CategoryResponse.model_validate(category).model_dump()
     return {"success": True, "data": category_data}
@@ -135,35 +137,27 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Category not found")
     db.delete(category)
     db.commit()
+    response_cache.invalidate(CATEGORIES_TAG)
     return {"success": True, "data": {"detail": "Deleted"}}
 
 
 @router.post("/restaurant/categories/{category_id}/upload-image", response_model=dict, summary="Upload category image")
-def upload_category_image(
+async def upload_category_image(
     category_id: int,
     image: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    category = db.query(models.Category).get(category_id)
+    category = await db.get(models.Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    if image.content_type not in {"image/jpeg", "image/png", "image/webp"}:
-        raise HTTPException(status_code=400, detail="Unsupported image type")
-
-    uploads_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
-    os.makedirs(uploads_root, exist_ok=True)
 
-    ext = os.path.splitext(image.filename or "")[1].lower() or ".jpg"
-    filename = f"category_{category.id}_{int(datetime.utcnow().timestamp())}{ext}"
-    filepath = os.path.join(uploads_root, filename)
-
-    with open(filepath, "wb") as f:
-        f.write(image.file.read())
-
-    category.image_url = f"/uploads/{filename}"
-    db.commit()
-    db.refresh(category)
+    # Categories have no variant column; only the original is kept
+    stored = await uploads.store_image(image, with_variants=False)
+    category.image_url = stored.url
+    await db.commit()
+    await db.refresh(category)
+    response_cache.invalidate(CATEGORIES_TAG)
 
     data = schemas.CategoryResponse.model_validate(category).model_dump()
     return {"success": True, "data": data}
@@ -183,44 +177,65 @@ def create_menu_item(
     db.add(item)
     db.commit()
     db.refresh(item)
+    text_search.index_menu_item(item)
+    invalidate_restaurant(item.restaurant_id)
     # Convert SQLAlchemy model to Pydantic schema for proper serialization
     item_data = schemas.MenuItemResponse.model_validate(item).model_dump()
     return {"success": True, "data": item_data}
 
 
+@router.post("/restaurant/menu/bulk", response_model=dict, summary="Import menu items from CSV, JSON or NDJSON")
+def import_menu_items(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(default=None, pattern="^(csv|json|ndjson)$"),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    restaurant = get_my_restaurant(db, current_user.id)
+    if not restaurant:
+        raise HTTPException(status_code=400, detail="Create restaurant first")
+    fmt = menu_bulk.detect_format(format, file.filename, file.content_type)
+    result = menu_bulk.import_menu(db, restaurant.id, file.file, fmt, dry_run)
+    return {"success": True, "data": result}
+
+
+@router.get("/restaurant/menu/export", summary="Export my menu as CSV, JSON or NDJSON")
+def export_menu_items(
+    format: str = Query(default="csv", pattern="^(csv|json|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    restaurant = get_my_restaurant(db, current_user.id)
+    if not restaurant:
+        raise HTTPException(status_code=400, detail="Create restaurant first")
+    return menu_bulk.export_menu(restaurant.id, format)
+
+
 @router.post("/restaurant/menu/{item_id}/upload-image", response_model=dict, summary="Upload menu item image")
-def upload_menu_item_image(
+async def upload_menu_item_image(
     item_id: int,
     image: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    restaurant = get_my_restaurant(db, current_user.id)
+    restaurant = await db.run_sync(get_my_restaurant, current_user.id)
     if not restaurant:
         raise HTTPException(status_code=400, detail="Create restaurant first")
     item = (
-        db.query(models.MenuItem)
-        .filter(models.MenuItem.id == item_id, models.MenuItem.restaurant_id == restaurant.id)
-        .first()
-    )
+        await db.execute(
+            select(models.MenuItem).where(models.MenuItem.id == item_id, models.MenuItem.restaurant_id == restaurant.id)
+        )
+    ).scalars().first()
     if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    if image.content_type not in {"image/jpeg", "image/png", "image/webp"}:
-        raise HTTPException(status_code=400, detail="Unsupported image type")
-
-    uploads_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "uploads"))
-    os.makedirs(uploads_root, exist_ok=True)
 
-    ext = os.path.splitext(image.filename or "")[1].lower() or ".jpg"
-    filename = f"menuitem_{item.id}_{int(datetime.utcnow().timestamp())}{ext}"
-    filepath = os.path.join(uploads_root, filename)
-
-    with open(filepath, "wb") as f:
-        f.write(image.file.read())
-
-    item.image_url = f"/uploads/{filename}"
-    db.commit()
-    db.refresh(item)
+    stored = await uploads.store_image(image)
+    item.image_url = stored.url
+    item.image_variants = stored.variants or None
+    await db.commit()
+    await db.refresh(item)
+    invalidate_restaurant(item.restaurant_id)
 
     data = schemas.MenuItemResponse.model_validate(item).model_dump()
     return {"success": True, "data": data}
@@ -228,21 +243,22 @@ def upload_menu_item_image(
 
 @router.get("/restaurant/menu")
 def list_menu_items(
+    params: schemas.PaginationParams = Depends(pagination_params),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     restaurant = get_my_restaurant(db, current_user.id)
     if not restaurant:
         # No restaurant yet; return empty list for a graceful UX
-        return {"success": True, "data": []}
-    items = (
-        db.query(models.MenuItem)
-        .filter(models.MenuItem.restaurant_id == restaurant.id)
-        .all()
-    )
-    # Convert SQLAlchemy models to Pydantic schemas for proper serialization
-    items_data = [schemas.MenuItemResponse.model_validate(item).model_dump() for item in items]
-    return {"success": True, "data": items_data}
+        return {"success": True, "data": [], "next_cursor": None}
+    restaurant_id = restaurant.id
+    entities, serialize = select_fields(models.MenuItem, schemas.MenuItemResponse, params.fields)
+    order = [(models.MenuItem.id, False)]
+
+    def build(session: Session):
+        return session.query(*entities).filter(models.MenuItem.restaurant_id == restaurant_id)
+
+    return list_response(db, build, order, serialize, params)
 
 
 @router.patch("/restaurant/menu/{item_id}")
@@ -267,6 +283,8 @@ def update_menu_item(
         setattr(item, k, v)
     db.commit()
     db.refresh(item)
+    text_search.index_menu_item(item)
+    invalidate_restaurant(item.restaurant_id)
     # Convert SQLAlchemy model to Pydantic schema for proper serialization
     item_data = schemas.MenuItemResponse.model_validate(item).model_dump()
     return {"success": True, "data": item_data}
@@ -290,6 +308,8 @@ def delete_menu_item(
         raise HTTPException(status_code=404, detail="Menu item not found")
     db.delete(item)
     db.commit()
+    text_search.remove_menu_item(item_id)
+    invalidate_restaurant(restaurant.id)
     return {"success": True, "data": {"detail": "Deleted"}}
 
 
@@ -318,6 +338,76 @@ def set_specials(
     restaurant.special_items = specials
     db.commit()
     db.refresh(restaurant)
+    invalidate_restaurant(restaurant.id)
     return {"success": True, "data": restaurant.special_items}
 
 
+# Incoming orders
+def _restaurant_stream(db: Session, user: models.User):
+    restaurant = get_my_restaurant(db, user.id)
+    if not restaurant:
+        raise HTTPException(status_code=400, detail="Create restaurant first")
+    snapshot = {"type": "restaurant.snapshot", "restaurant_id": restaurant.id}
+    return restaurant_channel(restaurant.id), lambda db: snapshot
+
+
+@router.get("/orders", summary="List my restaurant's orders, newest first")
+def list_restaurant_orders(
+    status: Optional[models.OrderStatus] = None,
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    restaurant = get_my_restaurant(db, current_user.id)
+    if not restaurant:
+        return {"success": True, "data": [], "next_cursor": None}
+    restaurant_id = restaurant.id
+    entities, serialize = select_fields(models.Order, schemas.OrderResponse, params.fields)
+    order = [(models.Order.id, True)]
+
+    def build(session: Session):
+        query = session.query(*entities).filter(models.Order.restaurant_id == restaurant_id)
+        if status is not None:
+            query = query.filter(models.Order.status == status)
+        if not params.fields:
+            query = query.options(selectinload(models.Order.order_items))
+        return query
+
+    return list_response(db, build, order, serialize, params)
+
+
+@router.patch("/orders/{order_id}/status", response_model=dict, summary="Advance an order's status")
+def update_order_status(
+    order_id: int,
+    payload: schemas.OrderStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    restaurant = get_my_restaurant(db, current_user.id)
+    if not restaurant:
+        raise HTTPException(status_code=400, detail="Create restaurant first")
+    order = (
+        db.query(models.Order)
+        .filter(models.Order.id == order_id, models.Order.restaurant_id == restaurant.id)
+        .first()
+    )
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    change_status(db, order, payload.status)
+    return {"success": True, "data": schemas.OrderResponse.model_validate(order).model_dump()}
+
+
+@router.get("/orders/events", summary="Follow my restaurant's orders (Server-Sent Events)")
+async def restaurant_order_events(request: Request, token: Optional[str] = None):
+    subscription = await authorize_stream(token, _restaurant_stream)
+    return stream_sse(request, subscription)
+
+
+@router.websocket("/orders/ws")
+async def restaurant_order_websocket(websocket: WebSocket, token: Optional[str] = None):
+    try:
+        subscription = await authorize_stream(token, _restaurant_stream)
+    except HTTPException:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+    await stream_websocket(websocket, subscription)
@@ -1,9 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+from app.database import get_async_read_db, get_db
 from app import models, schemas
+from app.coverage import refresh_coverage
 from app.logger import get_logger
+from app.response_cache import (
+    CATEGORIES_TAG,
+    RESTAURANTS_TAG,
+    invalidate_restaurant,
+    response_cache,
+    restaurant_tag,
+)
+from app.text_search import text_search
+from app.pagination import list_response_async, pagination_params, select_fields
+from app.query_audit import query_budget
+from app.responses import success
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -19,30 +33,77 @@ def create_restaurant(payload: schemas.RestaurantCreate, db: Session = Depends(g
         **payload.model_dump()
     )
     db.add(restaurant)
+    refresh_coverage(db, restaurant)
     db.commit()
     db.refresh(restaurant)
-    return {"success": True, "data": restaurant}
+    text_search.index_restaurant(restaurant)
+    invalidate_restaurant(restaurant.id)
+    return success(schemas.RestaurantResponse.model_validate(restaurant))
 
 @router.get("/")
-def list_restaurants(
+@query_budget(1)
+async def list_restaurants(
+    request: Request,
     city: Optional[str] = None,
     cuisine: Optional[str] = Query(None, alias="cuisine_type"),
-    db: Session = Depends(get_db)
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(models.Restaurant).filter(models.Restaurant.is_active == True)
-    if city:
-        query = query.filter(models.Restaurant.city.ilike(f"%{city}%"))
-    if cuisine:
-        query = query.filter(models.Restaurant.cuisine_type.ilike(f"%{cuisine}%"))
-    items = query.order_by(models.Restaurant.rating.desc()).all()
-    return {"success": True, "data": items}
+    entities, serialize = select_fields(models.Restaurant, schemas.RestaurantResponse, params.fields)
+    order = [(models.Restaurant.rating, True), (models.Restaurant.id, True)]
+
+    def build(session: Session):
+        query = session.query(*entities).filter(models.Restaurant.is_active == True)
+        if city:
+            query = query.filter(models.Restaurant.city.ilike(f"%{city}%"))
+        if cuisine:
+            query = query.filter(models.Restaurant.cuisine_type.ilike(f"%{cuisine}%"))
+        return query
+
+    return await response_cache.respond(
+        request, [RESTAURANTS_TAG], lambda: list_response_async(db, build, order, serialize, params)
+    )
 
 @router.get("/{restaurant_id}")
-def get_restaurant(restaurant_id: int, db: Session = Depends(get_db)):
-    restaurant = db.query(models.Restaurant).get(restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    return {"success": True, "data": restaurant}
+@query_budget(1)
+async def get_restaurant(restaurant_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def produce():
+        restaurant = await db.get(models.Restaurant, restaurant_id)
+        if not restaurant:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        return success(schemas.RestaurantResponse.model_validate(restaurant))
+
+    return await response_cache.respond(request, [restaurant_tag(restaurant_id)], produce)
+
+def _group_menu(restaurant: models.Restaurant) -> schemas.RestaurantMenu:
+    categories: dict[int, schemas.MenuCategory] = {}
+    for item in sorted(restaurant.menu_items, key=lambda item: item.id):
+        if not item.category.is_active:
+            continue
+        if item.category_id not in categories:
+            categories[item.category_id] = schemas.MenuCategory.model_validate(item.category)
+        categories[item.category_id].items.append(schemas.MenuItemResponse.model_validate(item))
+    return schemas.RestaurantMenu(
+        restaurant=schemas.RestaurantResponse.model_validate(restaurant),
+        categories=sorted(categories.values(), key=lambda category: category.id),
+    )
+
+@router.get("/{restaurant_id}/menu")
+@query_budget(3)
+async def get_restaurant_menu(restaurant_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """The restaurant with its menu grouped by category, loaded in three queries."""
+    async def produce():
+        result = await db.execute(
+            select(models.Restaurant)
+            .options(selectinload(models.Restaurant.menu_items).selectinload(models.MenuItem.category))
+            .where(models.Restaurant.id == restaurant_id)
+        )
+        restaurant = result.scalars().first()
+        if not restaurant:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        return success(_group_menu(restaurant))
+
+    return await response_cache.respond(request, [restaurant_tag(restaurant_id), CATEGORIES_TAG], produce)
 
 @router.patch("/{restaurant_id}")
 def update_restaurant(restaurant_id: int, payload: schemas.RestaurantUpdate, db: Session = Depends(get_db)):
@@ -52,9 +113,12 @@ def update_restaurant(restaurant_id: int, payload: schemas.RestaurantUpdate, db:
     data = payload.model_dump(exclude_unset=True)
     for k, v in data.items():
         setattr(restaurant, k, v)
+    refresh_coverage(db, restaurant)
     db.commit()
     db.refresh(restaurant)
-    return {"success": True, "data": restaurant}
+    text_search.index_restaurant(restaurant)
+    invalidate_restaurant(restaurant_id)
+    return success(schemas.RestaurantResponse.model_validate(restaurant))
 
 @router.delete("/{restaurant_id}")
 def delete_restaurant(restaurant_id: int, db: Session = Depends(get_db)):
@@ -63,6 +127,8 @@ def delete_restaurant(restaurant_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Restaurant not found")
     db.delete(restaurant)
     db.commit()
-    return {"success": True, "data": {"detail": "Deleted"}}
+    text_search.remove_restaurant(restaurant_id)
+    invalidate_restaurant(restaurant_id)
+    return success({"detail": "Deleted"})
 
 
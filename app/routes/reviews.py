@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import get_async_read_db, get_db
+from app import models, schemas
+from app.auth import get_current_user
+from app.pagination import list_response_async, pagination_params, select_fields
+from app.response_cache import invalidate_restaurant
+from app.reviews import add_review, delete_review, update_review
+
+router = APIRouter()
+
+
+def _get_my_review(db: Session, review_id: int, user_id: int) -> models.Review:
+    review = (
+        db.query(models.Review).filter(models.Review.id == review_id, models.Review.user_id == user_id).first()
+    )
+    if not review:
+        raise HTTPException(status_code=404, detail="Review not found")
+    return review
+
+
+@router.post("/", response_model=dict, summary="Review a delivered order")
+def create_review(
+    payload: schemas.ReviewCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    order = (
+        db.query(models.Order)
+        .filter(models.Order.id == payload.order_id, models.Order.user_id == current_user.id)
+        .first()
+    )
+    if not order or order.restaurant_id != payload.restaurant_id:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.status != models.OrderStatus.DELIVERED:
+        raise HTTPException(status_code=400, detail="Only delivered orders can be reviewed")
+
+    review = models.Review(user_id=current_user.id, **payload.model_dump())
+    try:
+        add_review(db, review)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Order already reviewed")
+    invalidate_restaurant(review.restaurant_id)
+    return {"success": True, "data": schemas.ReviewResponse.model_validate(review).model_dump()}
+
+
+@router.patch("/{review_id}", response_model=dict, summary="Edit my review")
+def edit_review(
+    review_id: int,
+    payload: schemas.ReviewUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    review = _get_my_review(db, review_id, current_user.id)
+    changes = payload.model_dump(exclude_unset=True)
+    if changes.get("rating", review.rating) is None:
+        raise HTTPException(status_code=400, detail="rating cannot be cleared")
+    update_review(db, review, changes)
+    db.commit()
+    invalidate_restaurant(review.restaurant_id)
+    return {"success": True, "data": schemas.ReviewResponse.model_validate(review).model_dump()}
+
+
+@router.delete("/{review_id}", response_model=dict, summary="Delete my review")
+def remove_review(
+    review_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    review = _get_my_review(db, review_id, current_user.id)
+    restaurant_id = review.restaurant_id
+    delete_review(db, review)
+    db.commit()
+    invalidate_restaurant(restaurant_id)
+    return {"success": True, "data": {"detail": "Deleted"}}
+
+
+@router.get("/restaurant/{restaurant_id}", summary="Reviews of a restaurant, newest first")
+async def list_restaurant_reviews(
+    restaurant_id: int,
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    entities, serialize = select_fields(models.Review, schemas.ReviewResponse, params.fields)
+    order = [(models.Review.id, True)]
+
+    def build(session: Session):
+        return session.query(*entities).filter(models.Review.restaurant_id == restaurant_id)
+
+    return await list_response_async(db, build, order, serialize, params)
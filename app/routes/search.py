@@ -1,63 +1,260 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import heapq
+import math
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from app.database import get_db
-from app import models, schemas
+from sqlalchemy import and_, or_, select
+from typing import Optional
+from app.database import get_async_read_db
+from app import coverage, geo, models, schemas
+from app.auth import get_current_user
+from app.text_search import MENU_ITEM, RESTAURANT, hydrate, text_search
+from app.response_cache import POPULARITY_TAG, RESTAURANTS_TAG, response_cache
+from app.pagination import decode_cursor, encode_cursor, list_response_async, pagination_params, select_fields
+from app.query_audit import query_budget
+from app.responses import success
 
 router = APIRouter()
 
+# First search reach past the cursor for /search/nearby; widened from the density seen until a page fills
+_NEARBY_STEP_KM = 1.0
+_NEARBY_GROWTH = 1.5
+
+
+def _distance_cursor(cursor: Optional[str]) -> Optional[tuple[float, int]]:
+    """Decode a (distance_km, id) cursor, rejecting anything else with a 400."""
+    if not cursor:
+        return None
+    after = decode_cursor(cursor)
+    valid = (
+        len(after) == 2
+        and type(after[0]) in (int, float)
+        and math.isfinite(after[0])
+        and type(after[1]) is int
+    )
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    distance, restaurant_id = float(after[0]), after[1]
+    return distance, restaurant_id
+
+
+def _rank(candidates, lat: float, lng: float, limit: int, after: Optional[tuple[float, int]]):
+    """The first limit + 1 (distance_km, id) pairs past the cursor among candidates within their radius."""
+    ranked = []
+    for restaurant_id, r_lat, r_lng, radius in candidates:
+        key = (geo.haversine_km(lat, lng, r_lat, r_lng), restaurant_id)
+        if key[0] <= radius and (after is None or key > after):
+            ranked.append(key)
+    return heapq.nsmallest(limit + 1, ranked)
+
+
+def _load_page(db: Session, ranked, limit: int):
+    """Load full rows for one page of ranked (distance_km, id) pairs.
+
+    The cursor is the (distance_km, id) of the last row returned, so pages
+    are stable even when several restaurants sit at the same distance.
+    """
+    page = ranked[:limit]
+    next_cursor = encode_cursor(list(page[-1])) if len(ranked) > limit else None
+    ids = [restaurant_id for _, restaurant_id in page]
+    by_id = {}
+    if ids:
+        by_id = {r.id: r for r in db.query(models.Restaurant).filter(models.Restaurant.id.in_(ids)).all()}
+    data = []
+    for distance, restaurant_id in page:
+        restaurant = by_id.get(restaurant_id)
+        if restaurant is None:
+            continue
+        item = schemas.RestaurantResponse.model_validate(restaurant).model_dump()
+        item["distance_km"] = round(distance, 3)
+        data.append(item)
+    return data, next_cursor
+
+
+def _inside_distance(lat: float, lng: float, distance_km: float):
+    """SQL predicate for a lat/lng box lying wholly within distance_km of (lat, lng), or None.
+
+    Every row in the box is strictly closer than the cursor distance, so the
+    box can be excluded in SQL without losing rows of later pages.
+    """
+    # Inscribed square, shrunk to absorb the flat-box approximation
+    half_km = 0.95 * distance_km / math.sqrt(2)
+    d_lat = half_km / geo.KM_PER_DEG_LNG
+    if abs(lat) + d_lat >= 89.0:
+        return None
+    d_lng = half_km / (geo.KM_PER_DEG_LNG * math.cos(math.radians(max(0.0, abs(lat) - d_lat))))
+    if abs(lng) + d_lng >= 180.0:
+        return None
+    return and_(
+        models.Restaurant.latitude.between(lat - d_lat, lat + d_lat),
+        models.Restaurant.longitude.between(lng - d_lng, lng + d_lng),
+    )
+
+
+def _nearby_page(db: Session, lat: float, lng: float, radius_km: float, limit: int, cursor: Optional[str]):
+    # Candidate rows come from a handful of geohash range scans on
+    # (is_active, geohash) around a search reach that starts just past the
+    # cursor and is widened, from the density seen so far, until it holds a
+    # full page (or hits radius_km), so a page costs the rows near it rather
+    # than the whole circle. Rows closer than the cursor are cut in SQL; exact
+    # haversine filtering happens on the coordinates only, and full rows are
+    # loaded for the returned page.
+    after = _distance_cursor(cursor)
+    after_km = after[0] if after else 0.0
+    inner = _inside_distance(lat, lng, after_km) if after_km > 0 else None
+    reach = min(radius_km, after_km + _NEARBY_STEP_KM)
+    while True:
+        # is_active sits inside every range so each one is its own (is_active, geohash) index search
+        active = models.Restaurant.is_active == True
+        cell_filters = []
+        for low, high in geo.covering_ranges(lat, lng, reach):
+            if high is None:
+                cell_filters.append(and_(active, models.Restaurant.geohash >= low))
+            else:
+                cell_filters.append(and_(active, models.Restaurant.geohash >= low, models.Restaurant.geohash < high))
+        query = db.query(models.Restaurant.id, models.Restaurant.latitude, models.Restaurant.longitude).filter(
+            or_(*cell_filters)
+        )
+        if inner is not None:
+            query = query.filter(~inner)
+        ranked = _rank(((r.id, r.latitude, r.longitude, reach) for r in query), lat, lng, limit, after)
+        # Every row within reach was a candidate, so a full page here is final
+        if len(ranked) > limit or reach >= radius_km:
+            return _load_page(db, ranked, limit)
+        if not ranked:
+            reach = radius_km
+            continue
+        # Grow the ring past the cursor to hold the missing rows at the same density, with margin
+        ring = (reach**2 - after_km**2) * _NEARBY_GROWTH * (limit + 1) / len(ranked)
+        reach = min(radius_km, max(2 * reach - after_km, math.sqrt(after_km**2 + ring)))
+
 
 @router.get("/nearby")
-def search_nearby(
-    lat: float,
-    lng: float,
+async def search_nearby(
+    lat: float = Query(..., ge=-90.0, le=90.0),
+    lng: float = Query(..., ge=-180.0, le=180.0),
     radius_km: float = Query(default=5.0, ge=0.5, le=50.0),
-    db: Session = Depends(get_db),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    # naive circle filter using simple Pythagorean on lat/lng deltas (not accurate for large distances)
-    lat_delta = radius_km / 111.0
-    lng_delta = radius_km / 111.0
-    q = (
-        db.query(models.Restaurant)
+    data, next_cursor = await db.run_sync(_nearby_page, lat, lng, radius_km, limit, cursor)
+    return success(data, next_cursor=next_cursor)
+
+
+def _deliverable_page(db: Session, lat: float, lng: float, limit: int, cursor: Optional[str]):
+    rows = (
+        db.query(
+            models.Restaurant.id,
+            models.Restaurant.latitude,
+            models.Restaurant.longitude,
+            models.Restaurant.delivery_radius,
+        )
+        .join(models.RestaurantCoverageCell, models.RestaurantCoverageCell.restaurant_id == models.Restaurant.id)
+        .filter(models.RestaurantCoverageCell.cell == coverage.customer_cell(lat, lng))
         .filter(models.Restaurant.is_active == True)
-        .filter(models.Restaurant.latitude.isnot(None), models.Restaurant.longitude.isnot(None))
-        .filter(models.Restaurant.latitude.between(lat - lat_delta, lat + lat_delta))
-        .filter(models.Restaurant.longitude.between(lng - lng_delta, lng + lng_delta))
-        .order_by(models.Restaurant.rating.desc())
+        .all()
     )
-    return {"success": True, "data": q.all()}
+    candidates = [(r.id, r.latitude, r.longitude, r.delivery_radius) for r in rows]
+    return _load_page(db, _rank(candidates, lat, lng, limit, _distance_cursor(cursor)), limit)
+
+
+@router.get("/deliverable", summary="Restaurants that deliver to a point")
+async def search_deliverable(
+    lat: float = Query(..., ge=-90.0, le=90.0),
+    lng: float = Query(..., ge=-180.0, le=180.0),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    data, next_cursor = await db.run_sync(_deliverable_page, lat, lng, limit, cursor)
+    return success(data, next_cursor=next_cursor)
+
+
+@router.get("/deliverable/address/{address_id}", summary="Restaurants that deliver to a saved address")
+async def search_deliverable_to_address(
+    address_id: int,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    address = (
+        await db.execute(
+            select(models.UserAddress).where(
+                models.UserAddress.id == address_id, models.UserAddress.user_id == current_user.id
+            )
+        )
+    ).scalars().first()
+    if not address:
+        raise HTTPException(status_code=404, detail="Address not found")
+    if address.latitude is None or address.longitude is None:
+        raise HTTPException(status_code=400, detail="Address has no coordinates")
+    data, next_cursor = await db.run_sync(_deliverable_page, address.latitude, address.longitude, limit, cursor)
+    return success(data, next_cursor=next_cursor)
+
+
+@router.get("/text", summary="Full-text search over restaurants and dishes")
+async def search_text(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[str] = Query(default=None, pattern=f"^({RESTAURANT}|{MENU_ITEM})$"),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    hits = await text_search.find(db, q, limit, type)
+    return success(await db.run_sync(hydrate, hits))
 
 
 @router.get("/popular")
-def search_popular(limit: int = Query(default=20, ge=1, le=100), db: Session = Depends(get_db)):
-    items = (
-        db.query(models.Restaurant)
-        .filter(models.Restaurant.is_active == True)
-        .order_by(models.Restaurant.rating.desc(), models.Restaurant.total_reviews.desc())
-        .limit(limit)
-        .all()
+@query_budget(1)
+async def search_popular(
+    request: Request,
+    city: Optional[str] = None,
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Served from the precomputed ranking table (see app.popularity)
+    entities, serialize = select_fields(models.Restaurant, schemas.RestaurantResponse, params.fields)
+    order = [(models.RestaurantPopularity.score, True), (models.RestaurantPopularity.restaurant_id, True)]
+
+    def build(session: Session):
+        query = session.query(*entities).join(
+            models.RestaurantPopularity, models.RestaurantPopularity.restaurant_id == models.Restaurant.id
+        )
+        if city:
+            query = query.filter(models.RestaurantPopularity.city == city.strip().lower())
+        return query
+
+    return await response_cache.respond(
+        request, [RESTAURANTS_TAG, POPULARITY_TAG], lambda: list_response_async(db, build, order, serialize, params)
     )
-    return {"success": True, "data": items}
 
 
 @router.get("/new")
-def search_new(limit: int = Query(default=20, ge=1, le=100), db: Session = Depends(get_db)):
-    items = (
-        db.query(models.Restaurant)
-        .filter(models.Restaurant.is_active == True)
-        .order_by(models.Restaurant.created_at.desc())
-        .limit(limit)
-        .all()
+@query_budget(1)
+async def search_new(
+    request: Request,
+    params: schemas.PaginationParams = Depends(pagination_params),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    entities, serialize = select_fields(models.Restaurant, schemas.RestaurantResponse, params.fields)
+    # ids are assigned in creation order, so the primary key doubles as the recency key
+    order = [(models.Restaurant.id, True)]
+
+    def build(session: Session):
+        return session.query(*entities).filter(models.Restaurant.is_active == True)
+
+    return await response_cache.respond(
+        request, [RESTAURANTS_TAG], lambda: list_response_async(db, build, order, serialize, params)
     )
-    return {"success": True, "data": items}
 
 
 @router.get("/code/{unique_code}")
-def get_by_unique_code(unique_code: str, db: Session = Depends(get_db)):
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.unique_code == unique_code).first()
+@query_budget(1)
+async def get_by_unique_code(unique_code: str, db: AsyncSession = Depends(get_async_read_db)):
+    restaurant = (
+        await db.execute(select(models.Restaurant).where(models.Restaurant.unique_code == unique_code))
+    ).scalars().first()
     if not restaurant:
         raise HTTPException(status_code=404, detail="Not found")
-    return {"success": True, "data": restaurant}
-
-
+    return success(schemas.RestaurantResponse.model_validate(restaurant))
@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
-from app.auth import get_current_user
+from app.auth import get_current_user, invalidate_principal
+from app.pagination import list_response, pagination_params, select_fields
 
 router = APIRouter()
 
@@ -25,6 +26,7 @@ def update_me(
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
+    invalidate_principal(current_user.id)
     user_data = schemas.UserResponse.model_validate(current_user).model_dump()
     return {"success": True, "data": user_data}
 
@@ -32,16 +34,18 @@ def update_me(
 # Address management for current user
 @router.get("/me/addresses")
 def list_addresses(
+    params: schemas.PaginationParams = Depends(pagination_params),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    items = (
-        db.query(models.UserAddress)
-        .filter(models.UserAddress.user_id == current_user.id)
-        .all()
-    )
-    data = [schemas.AddressResponse.model_validate(a).model_dump() for a in items]
-    return {"success": True, "data": data}
+    user_id = current_user.id
+    entities, serialize = select_fields(models.UserAddress, schemas.AddressResponse, params.fields)
+    order = [(models.UserAddress.id, False)]
+
+    def build(session: Session):
+        return session.query(*entities).filter(models.UserAddress.user_id == user_id)
+
+    return list_response(db, build, order, serialize, params)
 
 
 @router.post("/me/addresses")
@@ -132,6 +132,7 @@ class RestaurantUpdate(BaseSchema):
 
 class RestaurantResponse(RestaurantBase):
     id: int
+    image_variants: Optional[Dict[str, str]] = None
     owner_id: int
     rating: float
     total_reviews: int
@@ -188,8 +189,13 @@ class MenuItemUpdate(BaseSchema):
     ingredients: Optional[List[str]] = None
     allergens: Optional[List[str]] = None
 
+class MenuItemImport(MenuItemBase):
+    category_id: Optional[int] = None
+    category: Optional[str] = None  # category name, alternative to category_id
+
 class MenuItemResponse(MenuItemBase):
     id: int
+    image_variants: Optional[Dict[str, str]] = None
     restaurant_id: int
     category_id: int
     rating: float
@@ -197,6 +203,13 @@ class MenuItemResponse(MenuItemBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+class MenuCategory(CategoryResponse):
+    items: List[MenuItemResponse] = []
+
+class RestaurantMenu(BaseSchema):
+    restaurant: RestaurantResponse
+    categories: List[MenuCategory]
+
 # Order schemas
 class OrderItemCreate(BaseSchema):
     menu_item_id: int
@@ -216,6 +229,9 @@ class OrderUpdate(BaseSchema):
     estimated_delivery_time: Optional[datetime] = None
     actual_delivery_time: Optional[datetime] = None
 
+class OrderStatusUpdate(BaseSchema):
+    status: OrderStatus
+
 class OrderItemResponse(BaseSchema):
     id: int
     order_id: int
@@ -298,6 +314,20 @@ class CartResponse(BaseSchema):
     updated_at: Optional[datetime] = None
     cart_items: List[CartItemResponse] = []
 
+# Live cart served from app.carts
+class CartLine(BaseSchema):
+    menu_item_id: int
+    quantity: int
+    special_instructions: Optional[str] = None
+
+class CartState(BaseSchema):
+    restaurant_id: Optional[int] = None
+    items: List[CartLine] = []
+
+class CartCheckout(BaseSchema):
+    delivery_address: Dict[str, Any]
+    special_instructions: Optional[str] = None
+
 # Token schemas
 class Token(BaseSchema):
     access_token: str
@@ -308,15 +338,15 @@ class TokenData(BaseSchema):
 
 # Pagination schemas
 class PaginationParams(BaseSchema):
-    page: int = Field(default=1, ge=1)
-    size: int = Field(default=10, ge=1, le=100)
+    cursor: Optional[str] = None
+    limit: int = Field(default=20, ge=1, le=100)
+    fields: Optional[List[str]] = None
+    format: str = Field(default="json", pattern="^(json|ndjson)$")
 
 class PaginatedResponse(BaseSchema):
-    items: List[Any]
-    total: int
-    page: int
-    size: int
-    pages: int
+    success: bool = True
+    data: List[Any]
+    next_cursor: Optional[str] = None
 
 # Error schemas
 class ErrorResponse(BaseSchema):
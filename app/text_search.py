@@ -0,0 +1,388 @@
+"""Full-text search over restaurants and menu items.
+
+PostgreSQL deployments query weighted ``search_vector`` tsvector columns
+backed by GIN indexes (created by the baseline migration), with a pg_trgm
+fallback for misspelt queries. Other databases (SQLite in development and
+tests) use an in-process inverted index with BM25 ranking, prefix
+completion and single-edit typo matching, built at startup and updated by
+the owner/admin routes as documents change. Inactive restaurants and their
+menu items are kept out of the index, so a page of hits is not cut short
+after ranking.
+
+Both backends return ``(kind, id, restaurant_id, score)`` hits from
+find(); hydrate() turns them into response dicts.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import models, schemas
+from app.database import SessionLocal, engine
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+RESTAURANT = "restaurant"
+MENU_ITEM = "menu_item"
+
+# Field boosts, mirrored by the setweight() classes of the PostgreSQL vectors
+RESTAURANT_FIELDS = {"name": 3.0, "cuisine_type": 2.0, "description": 1.0}
+MENU_ITEM_FIELDS = {"name": 3.0, "ingredients": 1.5, "description": 1.0}
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_STOPWORDS = frozenset({"a", "an", "and", "the", "of", "with", "in", "on", "for", "to", "or"})
+
+
+def tokenize(value) -> list[str]:
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(v) for v in value)
+    return [t for t in _TOKEN_RE.findall(str(value).lower()) if t not in _STOPWORDS]
+
+
+def _deletions(term: str) -> set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insert, delete, substitution or adjacent swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if len(a) > len(b):
+        a, b = b, a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+
+class InvertedIndex:
+    """Thread-safe in-memory inverted index with BM25 scoring."""
+
+    K1 = 1.2
+    B = 0.75
+    PREFIX_WEIGHT = 0.7
+    FUZZY_WEIGHT = 0.5
+    MAX_EXPANSIONS = 20
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[tuple, float]] = {}
+        self._doc_terms: dict[tuple, dict[str, float]] = {}
+        self._doc_len: dict[tuple, float] = {}
+        self._doc_restaurant: dict[tuple, int] = {}
+        self._total_len = 0.0
+        self._vocab: list[str] = []
+        self._deletes: dict[str, set[str]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def __contains__(self, key: tuple):
+        return key in self._doc_len
+
+    def clear(self):
+        with self._lock:
+            self.__init__()
+
+    def add(self, key: tuple, restaurant_id: int, fields: dict, weights: dict):
+        terms: dict[str, float] = defaultdict(float)
+        for name, weight in weights.items():
+            for token in tokenize(fields.get(name)):
+                terms[token] += weight
+        with self._lock:
+            self._remove(key)
+            if not terms:
+                return
+            for term, tf in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocab, term)
+                    self._deletes[term].add(term)
+                    for variant in _deletions(term):
+                        self._deletes[variant].add(term)
+                postings[key] = tf
+            self._doc_terms[key] = dict(terms)
+            self._doc_len[key] = sum(terms.values())
+            self._doc_restaurant[key] = restaurant_id
+            self._total_len += self._doc_len[key]
+
+    def remove(self, key: tuple):
+        with self._lock:
+            self._remove(key)
+
+    def remove_restaurant(self, restaurant_id: int):
+        with self._lock:
+            for key in [k for k, rid in self._doc_restaurant.items() if rid == restaurant_id]:
+                self._remove(key)
+
+    def _remove(self, key: tuple):
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocab[bisect.bisect_left(self._vocab, term)]
+                for variant in _deletions(term) | {term}:
+                    bucket = self._deletes.get(variant)
+                    if bucket is not None:
+                        bucket.discard(term)
+                        if not bucket:
+                            del self._deletes[variant]
+        self._total_len -= self._doc_len.pop(key)
+        self._doc_restaurant.pop(key, None)
+
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        """Vocabulary terms matching a query token: exact, then prefix completions, then one-edit typos."""
+        expansions = []
+        if token in self._postings:
+            expansions.append((token, 1.0))
+        if len(token) >= 2:
+            start = bisect.bisect_left(self._vocab, token)
+            completions = []
+            for term in self._vocab[start:start + 10 * self.MAX_EXPANSIONS]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    completions.append(term)
+            completions = heapq.nlargest(self.MAX_EXPANSIONS, completions, key=lambda t: len(self._postings[t]))
+            expansions.extend((term, self.PREFIX_WEIGHT) for term in completions)
+        if not expansions and len(token) >= 4:
+            candidates = set()
+            for variant in _deletions(token) | {token}:
+                candidates |= self._deletes.get(variant, set())
+            expansions.extend(
+                (term, self.FUZZY_WEIGHT) for term in sorted(candidates) if _within_one_edit(token, term)
+            )
+        return expansions
+
+    def search(self, query: str, limit: int, kind: Optional[str] = None) -> list[tuple]:
+        """Top documents matching every query token, as (key, restaurant_id, score)."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs
+            scores: Optional[dict] = None
+            for token in tokens:
+                token_scores: dict[tuple, float] = {}
+                for term, weight in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, tf in postings.items():
+                        if kind and key[0] != kind:
+                            continue
+                        if scores is not None and key not in scores:
+                            continue
+                        norm = self.K1 * (1 - self.B + self.B * self._doc_len[key] / avg_len)
+                        score = weight * idf * tf * (self.K1 + 1) / (tf + norm)
+                        if score > token_scores.get(key, 0.0):
+                            token_scores[key] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {key: scores[key] + score for key, score in token_scores.items()}
+                if not scores:
+                    return []
+            top = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+            return [(key, self._doc_restaurant[key], score) for key, score in top]
+
+
+class MemoryTextSearch:
+    def __init__(self):
+        self.index = InvertedIndex()
+
+    def rebuild(self, batch_size: int = 1000):
+        db = SessionLocal()
+        try:
+            self.index.clear()
+            restaurants = db.query(
+                models.Restaurant.id,
+                models.Restaurant.name,
+                models.Restaurant.description,
+                models.Restaurant.cuisine_type,
+            ).filter(models.Restaurant.is_active == True)
+            for row in restaurants.yield_per(batch_size):
+                self.index.add((RESTAURANT, row.id), row.id, row._asdict(), RESTAURANT_FIELDS)
+            active = db.query(models.Restaurant.id).filter(models.Restaurant.is_active == True)
+            self._add_menu_items(db, models.MenuItem.restaurant_id.in_(active.scalar_subquery()), batch_size)
+            logger.info(f"Text search index built with {len(self.index)} documents")
+        finally:
+            db.close()
+
+    def _add_menu_items(self, db: Session, condition, batch_size: int = 1000):
+        items = db.query(
+            models.MenuItem.id,
+            models.MenuItem.restaurant_id,
+            models.MenuItem.name,
+            models.MenuItem.description,
+            models.MenuItem.ingredients,
+        ).filter(condition)
+        for row in items.yield_per(batch_size):
+            self.index.add((MENU_ITEM, row.id), row.restaurant_id, row._asdict(), MENU_ITEM_FIELDS)
+
+    def index_restaurant(self, restaurant: models.Restaurant):
+        if not restaurant.is_active:
+            self.index.remove_restaurant(restaurant.id)
+            return
+        reactivated = (RESTAURANT, restaurant.id) not in self.index
+        fields = {name: getattr(restaurant, name) for name in RESTAURANT_FIELDS}
+        self.index.add((RESTAURANT, restaurant.id), restaurant.id, fields, RESTAURANT_FIELDS)
+        if reactivated:
+            db = SessionLocal()
+            try:
+                self._add_menu_items(db, models.MenuItem.restaurant_id == restaurant.id)
+            finally:
+                db.close()
+
+    def index_menu_item(self, item: models.MenuItem):
+        if (RESTAURANT, item.restaurant_id) not in self.index:
+            return
+        fields = {name: getattr(item, name) for name in MENU_ITEM_FIELDS}
+        self.index.add((MENU_ITEM, item.id), item.restaurant_id, fields, MENU_ITEM_FIELDS)
+
+    def remove_menu_item(self, item_id: int):
+        self.index.remove((MENU_ITEM, item_id))
+
+    def remove_restaurant(self, restaurant_id: int):
+        self.index.remove_restaurant(restaurant_id)
+
+    def search(self, db: Session, query: str, limit: int, kind: Optional[str] = None) -> list[tuple]:
+        return [(key[0], key[1], restaurant_id, score) for key, restaurant_id, score in self.index.search(query, limit, kind)]
+
+    async def find(self, db: AsyncSession, query: str, limit: int, kind: Optional[str] = None) -> list[tuple]:
+        # BM25 scoring is CPU-bound and needs no database, so keep it off the event loop
+        return await run_in_threadpool(self.search, None, query, limit, kind)
+
+
+class PostgresTextSearch:
+    """Queries the generated tsvector columns; the database keeps them current on every write."""
+
+    def __init__(self):
+        self._has_trigram: Optional[bool] = None
+
+    def rebuild(self):
+        pass
+
+    def index_restaurant(self, restaurant: models.Restaurant):
+        pass
+
+    def index_menu_item(self, item: models.MenuItem):
+        pass
+
+    def remove_menu_item(self, item_id: int):
+        pass
+
+    def remove_restaurant(self, restaurant_id: int):
+        pass
+
+    async def find(self, db: AsyncSession, query: str, limit: int, kind: Optional[str] = None) -> list[tuple]:
+        return await db.run_sync(self.search, query, limit, kind)
+
+    def _trigram_available(self, db: Session) -> bool:
+        if self._has_trigram is None:
+            self._has_trigram = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+        return self._has_trigram
+
+    def search(self, db: Session, query: str, limit: int, kind: Optional[str] = None) -> list[tuple]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        parts = []
+        if kind in (None, RESTAURANT):
+            parts.append(
+                "SELECT 'restaurant' AS kind, r.id AS id, r.id AS restaurant_id, "
+                "ts_rank_cd(r.search_vector, q.query, 32) AS score "
+                "FROM restaurants r, q WHERE r.is_active = true AND r.search_vector @@ q.query"
+            )
+        if kind in (None, MENU_ITEM):
+            parts.append(
+                "SELECT 'menu_item' AS kind, m.id AS id, m.restaurant_id AS restaurant_id, "
+                "ts_rank_cd(m.search_vector, q.query, 32) AS score "
+                "FROM menu_items m JOIN restaurants r ON r.id = m.restaurant_id, q "
+                "WHERE r.is_active = true AND m.search_vector @@ q.query"
+            )
+        sql = (
+            "WITH q AS (SELECT to_tsquery('simple', :tsquery) AS query) "
+            + " UNION ALL ".join(parts)
+            + " ORDER BY score DESC LIMIT :limit"
+        )
+        # Tokens are plain letters/digits, so ":*" prefix syntax cannot be broken by user input
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        rows = db.execute(text(sql), {"tsquery": tsquery, "limit": limit}).all()
+        if not rows and self._trigram_available(db):
+            rows = self._fuzzy(db, " ".join(tokens), limit, kind)
+        return [(row.kind, row.id, row.restaurant_id, float(row.score)) for row in rows]
+
+    def _fuzzy(self, db: Session, query: str, limit: int, kind: Optional[str]):
+        parts = []
+        if kind in (None, RESTAURANT):
+            parts.append(
+                "SELECT 'restaurant' AS kind, r.id AS id, r.id AS restaurant_id, word_similarity(:q, r.name) AS score "
+                "FROM restaurants r WHERE r.is_active = true AND :q <% r.name"
+            )
+        if kind in (None, MENU_ITEM):
+            parts.append(
+                "SELECT 'menu_item' AS kind, m.id AS id, m.restaurant_id AS restaurant_id, word_similarity(:q, m.name) AS score "
+                "FROM menu_items m JOIN restaurants r ON r.id = m.restaurant_id WHERE r.is_active = true AND :q <% m.name"
+            )
+        sql = " UNION ALL ".join(parts) + " ORDER BY score DESC LIMIT :limit"
+        return db.execute(text(sql), {"q": query, "limit": limit}).all()
+
+
+def hydrate(db: Session, hits: list[tuple]) -> list[dict]:
+    """Load the documents behind search hits, keeping hit order.
+
+    Inactive restaurants are filtered again in case one was deactivated after it was ranked.
+    """
+    restaurant_ids = [doc_id for kind, doc_id, _, _ in hits if kind == RESTAURANT]
+    item_ids = [doc_id for kind, doc_id, _, _ in hits if kind == MENU_ITEM]
+    restaurants = {}
+    if restaurant_ids:
+        restaurants = {
+            r.id: r
+            for r in db.query(models.Restaurant)
+            .filter(models.Restaurant.id.in_(restaurant_ids), models.Restaurant.is_active == True)
+            .all()
+        }
+    items = {}
+    if item_ids:
+        items = {
+            item.id: item
+            for item in db.query(models.MenuItem)
+            .join(models.Restaurant, models.Restaurant.id == models.MenuItem.restaurant_id)
+            .filter(models.MenuItem.id.in_(item_ids), models.Restaurant.is_active == True)
+            .all()
+        }
+    results = []
+    for kind, doc_id, restaurant_id, score in hits:
+        if kind == RESTAURANT and doc_id in restaurants:
+            data = schemas.RestaurantResponse.model_validate(restaurants[doc_id]).model_dump()
+        elif kind == MENU_ITEM and doc_id in items:
+            data = schemas.MenuItemResponse.model_validate(items[doc_id]).model_dump()
+        else:
+            continue
+        results.append({"type": kind, "id": doc_id, "restaurant_id": restaurant_id, "score": round(score, 4), "data": data})
+    return results
+
+
+text_search = PostgresTextSearch() if engine.dialect.name == "postgresql" else MemoryTextSearch()
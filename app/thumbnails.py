@@ -0,0 +1,38 @@
+"""WebP variant rendering for uploaded images, run in the upload process pool.
+
+Spawned workers import this module on their own, so it must not import
+the app's config, database or logger modules: importing app.logger in a
+worker would start another queue listener and rotating file handler on
+the same log file.
+"""
+import os
+import uuid
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are skipped without Pillow
+    Image = None
+
+
+def variant_name(digest: str, name: str) -> str:
+    return f"{digest}_{name}.webp"
+
+
+def render_variants(source: str, digest: str, sizes: dict) -> dict:
+    """Write a WebP variant per size next to ``source``; runs in a worker process."""
+    variants = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for name, edge in sizes.items():
+            filename = variant_name(digest, name)
+            path = os.path.join(os.path.dirname(source), filename)
+            if not os.path.exists(path):
+                variant = image.copy()
+                variant.thumbnail((edge, edge))
+                tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+                variant.save(tmp, "WEBP", quality=80, method=4)
+                os.replace(tmp, path)
+            variants[name] = filename
+    return variants
@@ -0,0 +1,111 @@
+"""Image upload storage shared by the owner upload routes.
+
+Uploads are copied to disk in UPLOAD_CHUNK_BYTES chunks, off the event
+loop, while their SHA-256 is computed; anything over MAX_UPLOAD_BYTES is
+rejected with 413. Files are stored under their content hash, so uploading
+the same image again reuses the existing file. Resized WebP variants are
+rendered in a process pool (when Pillow is installed) by app.thumbnails,
+which the workers import without the rest of the app, and named after the
+same hash, so they are only ever generated once per image. The pool is
+started with the app (``start()``) and uses the spawn start method: forking
+a process that runs the event loop, database pools and logging threads
+would copy their locks and sockets into the workers.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.config import MAX_UPLOAD_BYTES, THUMBNAIL_WORKERS, UPLOAD_CHUNK_BYTES
+from app.logger import get_logger
+from app.thumbnails import Image, render_variants
+
+logger = get_logger(__name__)
+
+UPLOADS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads"))
+UPLOADS_URL = "/uploads"
+
+IMAGE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+# Variant name -> longest edge in pixels
+THUMBNAIL_SIZES = {"thumb": 160, "small": 480, "medium": 960}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class StoredImage:
+    url: str
+    digest: str
+    variants: dict = field(default_factory=dict)
+
+
+def start():
+    """Create the thumbnail pool; workers are spawned by the first uploads that need them."""
+    if Image is not None:
+        _get_executor()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _copy_to_disk(upload: UploadFile, tmp_path: str) -> str:
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, "wb") as out:
+        while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+    return digest.hexdigest()
+
+
+async def store_image(upload: UploadFile, with_variants: bool = True) -> StoredImage:
+    """Validate and store an uploaded image, returning its public URL and variant URLs."""
+    ext = IMAGE_EXTENSIONS.get(upload.content_type)
+    if ext is None:
+        raise HTTPException(status_code=400, detail="Unsupported image type")
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+    os.makedirs(UPLOADS_ROOT, exist_ok=True)
+    tmp_path = os.path.join(UPLOADS_ROOT, f".upload-{uuid.uuid4().hex}.tmp")
+    try:
+        digest = await _copy_to_disk(upload, tmp_path)
+        filename = f"{digest}{ext}"
+        path = os.path.join(UPLOADS_ROOT, filename)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    stored = StoredImage(url=f"{UPLOADS_URL}/{filename}", digest=digest)
+    if with_variants and Image is not None:
+        try:
+            future = _get_executor().submit(render_variants, path, digest, THUMBNAIL_SIZES)
+            variants = await asyncio.wrap_future(future)
+            stored.variants = {name: f"{UPLOADS_URL}/{variant}" for name, variant in variants.items()}
+        except Exception as e:
+            # The original is stored either way; clients fall back to image_url
+            logger.warning(f"Could not render variants for {filename}: {e}")
+    return stored
@@ -0,0 +1,59 @@
+"""Shape of the benchmark dataset, shared by seed.py and load.py.
+
+Both scripts derive ids, phone numbers and coordinates from the same
+functions and --scale, so the load generator only asks for rows the seeder
+wrote without reading the database.
+"""
+from dataclasses import dataclass
+
+# Full-scale volumes; --scale multiplies all of them
+RESTAURANTS = 100_000
+MENU_ITEMS = 5_000_000
+USERS = 1_000_000
+
+# (city, state, latitude, longitude)
+CITIES = [
+    ("Mumbai", "MH", 19.0760, 72.8777),
+    ("Delhi", "DL", 28.6139, 77.2090),
+    ("Bengaluru", "KA", 12.9716, 77.5946),
+    ("Hyderabad", "TS", 17.3850, 78.4867),
+    ("Chennai", "TN", 13.0827, 80.2707),
+    ("Kolkata", "WB", 22.5726, 88.3639),
+    ("Pune", "MH", 18.5204, 73.8567),
+    ("Ahmedabad", "GJ", 23.0225, 72.5714),
+    ("Jaipur", "RJ", 26.9124, 75.7873),
+    ("Lucknow", "UP", 26.8467, 80.9462),
+]
+# Restaurants are spread up to this far (degrees) from their city centre
+CITY_SPREAD_DEG = 0.15
+
+CATEGORIES = [
+    "Starters", "Soups", "Salads", "Main Course", "Breads", "Rice", "Biryani", "Pizza",
+    "Burgers", "Sandwiches", "Noodles", "Desserts", "Beverages", "Combos", "Sides", "Breakfast",
+]
+CUISINES = ["North Indian", "South Indian", "Chinese", "Italian", "Mughlai", "Street Food", "Cafe", "Continental"]
+
+
+@dataclass(frozen=True)
+class Sizes:
+    restaurants: int
+    menu_items: int
+    users: int
+
+    @classmethod
+    def scaled(cls, scale: float) -> "Sizes":
+        restaurants = max(1, round(RESTAURANTS * scale))
+        # Every restaurant has an owner, so there are at least as many users
+        return cls(restaurants, max(restaurants, round(MENU_ITEMS * scale)), max(restaurants, round(USERS * scale)))
+
+
+def phone_number(user_id: int) -> str:
+    """Users 1..restaurants own restaurant of the same id; the rest are customers."""
+    return f"7{user_id:09d}"
+
+
+def add_scale_argument(parser):
+    parser.add_argument(
+        "--scale", type=float, default=1.0,
+        help=f"fraction of the full dataset ({RESTAURANTS} restaurants, {MENU_ITEMS} menu items, {USERS} users)",
+    )
@@ -0,0 +1,324 @@
+"""Closed-loop HTTP load test with stored baselines.
+
+Each scenario runs on its own: --concurrency workers issue requests back to
+back for --duration seconds (after --warmup seconds that are not recorded)
+and the script reports throughput, error rate and p50/p95/p99 latency per
+operation. Target a server started on a database filled by seed.py with the
+same --scale, or pass --spawn to have the script start uvicorn on
+--database-url itself.
+
+    python benchmarks/load.py --spawn --database-url sqlite:///./bench.db --scale 0.01
+    python benchmarks/load.py --base-url http://127.0.0.1:8000 --scenarios nearby popular
+
+--save-baseline stores the results under benchmarks/baselines/<name>.json.
+Later runs with the same --baseline name are compared against it, and the
+script exits with status 1 when an operation's p95 latency rises or its
+throughput drops by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from dataset import CITIES, CITY_SPREAD_DEG, Sizes, add_scale_argument, phone_number
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Samples:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def add(self, seconds: float, ok: bool):
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: Samples, elapsed: float) -> dict:
+    ordered = sorted(samples.latencies)
+    count = len(ordered)
+    result = {
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round(samples.errors / count, 4) if count else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(ordered, pct) * 1000, 2)
+    return result
+
+
+class Run:
+    """State shared by a scenario's workers: the clock and per-operation samples."""
+
+    def __init__(self, warmup: float, duration: float):
+        self.start = time.perf_counter()
+        self.record_from = self.start + warmup
+        self.stop_at = self.record_from + duration
+        self.samples: dict[str, Samples] = {}
+
+    @property
+    def running(self) -> bool:
+        return time.perf_counter() < self.stop_at
+
+    async def call(self, operation: str, request: Awaitable[httpx.Response]) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.is_success
+        except httpx.HTTPError:
+            response, ok = None, False
+        if started >= self.record_from:
+            self.samples.setdefault(operation, Samples()).add(time.perf_counter() - started, ok)
+        return response
+
+
+def random_point(rng: random.Random) -> tuple[str, float, float]:
+    city, _, lat, lng = rng.choice(CITIES)
+    return city, lat + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG), lng + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG)
+
+
+async def login(client: httpx.AsyncClient, phone: str, user_type: str = "customer") -> dict:
+    response = await client.post("/auth/login", json={"phone_number": phone, "user_type": user_type})
+    response.raise_for_status()
+    return {"Authorization": "Bearer " + response.json()["data"]["access_token"]}
+
+
+# Scenarios: async (client, run, rng, sizes, worker) -> None, looping until the run ends
+
+async def scenario_login(client, run: Run, rng: random.Random, sizes: Sizes, worker: int):
+    # Customers when the dataset has any, else owners
+    first = sizes.restaurants + 1 if sizes.users > sizes.restaurants else 1
+    while run.running:
+        phone = phone_number(rng.randint(first, sizes.users))
+        await run.call("POST /auth/login", client.post("/auth/login", json={"phone_number": phone, "user_type": "customer"}))
+
+
+async def scenario_nearby(client, run: Run, rng: random.Random, sizes: Sizes, worker: int):
+    while run.running:
+        _, lat, lng = random_point(rng)
+        params = {"lat": lat, "lng": lng, "radius_km": 5, "limit": 20}
+        await run.call("GET /search/nearby", client.get("/search/nearby", params=params))
+
+
+async def scenario_popular(client, run: Run, rng: random.Random, sizes: Sizes, worker: int):
+    while run.running:
+        city, _, _ = random_point(rng)
+        await run.call("GET /search/popular", client.get("/search/popular", params={"city": city, "limit": 20}))
+
+
+async def scenario_restaurants(client, run: Run, rng: random.Random, sizes: Sizes, worker: int):
+    while run.running:
+        city, _, _ = random_point(rng)
+        await run.call("GET /restaurants/", client.get("/restaurants/", params={"city": city, "limit": 20}))
+
+
+async def scenario_owner_menu(client, run: Run, rng: random.Random, sizes: Sizes, worker: int):
+    # Each worker is a different owner, so workers never edit the same menu
+    owner_id = worker % sizes.restaurants + 1
+    headers = await login(client, phone_number(owner_id), "restaurant_owner")
+    categories = (await client.get("/owner/restaurant/categories", params={"limit": 100}, headers=headers)).json()
+    category_ids = [category["id"] for category in categories["data"]]
+    while run.running:
+        payload = {
+            "restaurant_id": owner_id,
+            "category_id": rng.choice(category_ids),
+            "name": f"Load test dish {worker}-{rng.randrange(10**9)}",
+            "price": float(rng.randrange(80, 800, 10)),
+            "preparation_time": 20,
+        }
+        created = await run.call("POST /owner/restaurant/menu", client.post("/owner/restaurant/menu", json=payload, headers=headers))
+        if created is None or not created.is_success:
+            continue
+        item_id = created.json()["data"]["id"]
+        await run.call(
+            "GET /owner/restaurant/menu",
+            client.get("/owner/restaurant/menu", params={"limit": 20}, headers=headers),
+        )
+        await run.call(
+            "PATCH /owner/restaurant/menu/{item_id}",
+            client.patch(f"/owner/restaurant/menu/{item_id}", json={"price": payload["price"] + 10}, headers=headers),
+        )
+        await run.call(
+            "DELETE /owner/restaurant/menu/{item_id}",
+            client.delete(f"/owner/restaurant/menu/{item_id}", headers=headers),
+        )
+
+
+SCENARIOS: dict[str, Callable] = {
+    "login": scenario_login,
+    "nearby": scenario_nearby,
+    "popular": scenario_popular,
+    "restaurants": scenario_restaurants,
+    "owner_menu": scenario_owner_menu,
+}
+
+
+async def run_scenario(name: str, args, sizes: Sizes) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        run = Run(args.warmup, args.duration)
+        workers = [
+            SCENARIOS[name](client, run, random.Random(f"{args.seed}-{name}-{worker}"), sizes, worker)
+            for worker in range(args.concurrency)
+        ]
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - run.record_from
+    return {operation: summarize(samples, elapsed) for operation, samples in sorted(run.samples.items())}
+
+
+def print_results(results: dict, baseline: Optional[dict]):
+    header = f"{'operation':40} {'req/s':>9} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    if baseline:
+        header += f" {'Δ req/s':>9} {'Δ p95':>8}"
+    print(header)
+    for scenario, operations in results.items():
+        for operation, stats in operations.items():
+            line = (
+                f"{operation:40} {stats['throughput_rps']:9.1f} {stats['error_rate'] * 100:6.2f} "
+                f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}"
+            )
+            before = (baseline or {}).get(scenario, {}).get(operation)
+            if before:
+                line += (
+                    f" {_change(stats['throughput_rps'], before['throughput_rps']):>9}"
+                    f" {_change(stats['p95_ms'], before['p95_ms']):>8}"
+                )
+            print(line)
+
+
+def _change(now: float, before: float) -> str:
+    return f"{(now - before) / before * 100:+.0f}%" if before else "n/a"
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for scenario, operations in results.items():
+        for operation, stats in operations.items():
+            before = baseline.get(scenario, {}).get(operation)
+            if not before:
+                continue
+            if stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                found.append(f"{operation}: p95 {before['p95_ms']} -> {stats['p95_ms']} ms")
+            if stats["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                found.append(f"{operation}: throughput {before['throughput_rps']} -> {stats['throughput_rps']} req/s")
+            if stats["error_rate"] > before["error_rate"] + 0.01:
+                found.append(f"{operation}: error rate {before['error_rate']} -> {stats['error_rate']}")
+    return found
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_server(args) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": args.database_url, "LOG_LEVEL": "WARNING"}
+    env.setdefault("SECRET_KEY", "benchmark-only-secret")
+    port = httpx.URL(args.base_url).port or 8000
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+        env=env,
+    )
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"Server exited with status {server.returncode}")
+        try:
+            if httpx.get(args.base_url + "/", timeout=1).is_success:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit("Server did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="recorded seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unrecorded seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    add_scale_argument(parser)
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn against --database-url")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--baseline", default="local", help="baseline name under benchmarks/baselines/")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    sizes = Sizes.scaled(args.scale)
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.baseline}.json")
+    baseline = None
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    server = spawn_server(args) if args.spawn else None
+    try:
+        results = {}
+        for name in args.scenarios:
+            print(f"Running {name} ({args.concurrency} workers, {args.duration:g}s)...", flush=True)
+            results[name] = asyncio.run(run_scenario(name, args, sizes))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results, baseline["results"] if baseline else None)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        document = {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "settings": {
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "scale": args.scale,
+                "database": args.database_url.split(":", 1)[0],
+            },
+            "results": results,
+        }
+        with open(baseline_path, "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline {baseline_path}")
+    elif baseline:
+        found = regressions(results, baseline["results"], args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Seed a database with a deterministic, realistically sized dataset.
+
+Writes categories, users (one owner per restaurant, the rest customers),
+restaurants spread around ten cities with their delivery coverage cells,
+menu items, and delivered orders with one review each, in batched
+multi-row INSERTs that bypass the ORM. Restaurant rating aggregates are
+computed from exactly those reviews, so review reconciliation finds no
+drift. The same
+--seed and --scale always produce the same rows, so runs against
+different commits compare like for like.
+
+    python benchmarks/seed.py --database-url sqlite:///./bench.db --scale 0.01
+    python benchmarks/seed.py --database-url postgresql://... --drop
+
+The full scale (100k restaurants, 5M menu items, 1M users, ~2M reviewed orders) takes a few
+minutes on SQLite; the app rebuilds the popularity ranking and in-memory
+search index on startup.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, Iterator, Optional
+from sqlalchemy import func, insert, select
+
+from dataset import CATEGORIES, CITIES, CITY_SPREAD_DEG, CUISINES, Sizes, add_scale_argument, phone_number
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+DISHES = [
+    "Paneer Tikka", "Butter Chicken", "Masala Dosa", "Veg Biryani", "Chicken Biryani", "Margherita Pizza",
+    "Hakka Noodles", "Dal Makhani", "Garlic Naan", "Gulab Jamun", "Cold Coffee", "Veg Burger",
+    "Fish Curry", "Chole Bhature", "Idli Sambar", "Pav Bhaji", "Caesar Salad", "Tomato Soup",
+]
+INGREDIENTS = ["onion", "tomato", "garlic", "ginger", "paneer", "chicken", "rice", "flour", "butter", "chilli", "cream"]
+ALLERGENS = ["dairy", "gluten", "nuts", "soy", "egg"]
+NAME_WORDS = ["Spice", "Tandoor", "Curry", "Masala", "Royal", "Urban", "Green", "Golden", "Coastal", "Street"]
+NAME_PLACES = ["Kitchen", "House", "Garden", "Express", "Cafe", "Dhaba", "Bistro", "Corner"]
+# Reviews per restaurant are uniform in [0, MAX_REVIEWS]; each needs an order and an order item
+MAX_REVIEWS = 40
+STARS = [1, 2, 3, 4, 5]
+STAR_WEIGHTS = [5, 8, 17, 35, 35]
+
+
+def batches(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load(engine, table, rows: Iterator[dict], batch_size: int, on_batch: Optional[Callable] = None) -> int:
+    """Insert ``rows`` in batches, one transaction each; ``on_batch(connection, batch)`` adds dependent rows."""
+    total, start = 0, time.perf_counter()
+    for batch in batches(rows, batch_size):
+        with engine.begin() as connection:
+            connection.execute(insert(table), batch)
+            if on_batch is not None:
+                on_batch(connection, batch)
+        total += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f"{table.name:28} {total:>10} rows  {elapsed:7.1f} s  {total / max(elapsed, 1e-9):>9.0f} rows/s")
+    return total
+
+
+def menu_item_ids(sizes: Sizes, restaurant_id: int) -> range:
+    """Ids of one restaurant's menu items; menu_items() writes them contiguously in restaurant order."""
+    per_restaurant, extra = divmod(sizes.menu_items, sizes.restaurants)
+    first = (restaurant_id - 1) * per_restaurant + min(restaurant_id - 1, extra) + 1
+    return range(first, first + per_restaurant + (1 if restaurant_id <= extra else 0))
+
+
+def restaurant_reviews(sizes: Sizes, seed: int, restaurant_id: int) -> list[dict]:
+    """The reviewed orders of one restaurant, derived only from (seed, restaurant_id).
+
+    restaurants() sums these for the rating aggregates and review_plan()
+    writes them, so both always agree.
+    """
+    rng = random.Random(seed * 1_000_003 + restaurant_id)
+    items = menu_item_ids(sizes, restaurant_id)
+    reviews = []
+    for _ in range(rng.randint(0, MAX_REVIEWS)):
+        quantity = rng.randint(1, 3)
+        unit_price = float(rng.randrange(80, 800, 10))
+        reviews.append({
+            "user_id": rng.randint(1, sizes.users),
+            "menu_item_id": rng.choice(items),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total_price": unit_price * quantity,
+            "rating": rng.choices(STARS, STAR_WEIGHTS)[0],
+            "delivery_rating": rng.choices(STARS, STAR_WEIGHTS)[0],
+        })
+    return reviews
+
+
+def review_plan(sizes: Sizes, seed: int) -> Iterator[tuple[int, int, dict]]:
+    """(order_id, restaurant_id, review) for every seeded review; order ids start at 1."""
+    order_id = 0
+    for restaurant_id in range(1, sizes.restaurants + 1):
+        for review in restaurant_reviews(sizes, seed, restaurant_id):
+            order_id += 1
+            yield order_id, restaurant_id, review
+
+
+def orders(sizes: Sizes, seed: int) -> Iterator[dict]:
+    from app.models import OrderStatus, PaymentStatus
+
+    for order_id, restaurant_id, review in review_plan(sizes, seed):
+        yield {
+            "id": order_id,
+            "user_id": review["user_id"],
+            "restaurant_id": restaurant_id,
+            "order_number": f"BENCH{order_id:010d}",
+            "status": OrderStatus.DELIVERED,
+            "subtotal": review["total_price"],
+            "delivery_fee": 0.0,
+            "tax_amount": 0.0,
+            "total_amount": review["total_price"],
+            "payment_status": PaymentStatus.COMPLETED,
+            "delivery_address": {"address_line1": "1 Bench Street"},
+        }
+
+
+def order_items(sizes: Sizes, seed: int) -> Iterator[dict]:
+    for order_id, _, review in review_plan(sizes, seed):
+        yield {
+            "id": order_id,
+            "order_id": order_id,
+            "menu_item_id": review["menu_item_id"],
+            "quantity": review["quantity"],
+            "unit_price": review["unit_price"],
+            "total_price": review["total_price"],
+        }
+
+
+def reviews(sizes: Sizes, seed: int) -> Iterator[dict]:
+    for order_id, restaurant_id, review in review_plan(sizes, seed):
+        yield {
+            "id": order_id,
+            "user_id": review["user_id"],
+            "restaurant_id": restaurant_id,
+            "order_id": order_id,
+            "rating": review["rating"],
+            "delivery_rating": review["delivery_rating"],
+        }
+
+
+def users(sizes: Sizes, password_hash: str) -> Iterator[dict]:
+    from app.models import UserRole
+
+    for user_id in range(1, sizes.users + 1):
+        owner = user_id <= sizes.restaurants
+        yield {
+            "id": user_id,
+            "email": f"user{user_id}@bench.example.com",
+            "username": f"bench_{user_id}",
+            "hashed_password": password_hash,
+            "full_name": f"Bench User {user_id}",
+            "phone_number": phone_number(user_id),
+            "role": UserRole.RESTAURANT_OWNER if owner else UserRole.CUSTOMER,
+            "roles": [UserRole.CUSTOMER.value, UserRole.RESTAURANT_OWNER.value] if owner else [UserRole.CUSTOMER.value],
+            "is_active": True,
+            "is_verified": True,
+        }
+
+
+def restaurants(sizes: Sizes, rng: random.Random, seed: int) -> Iterator[dict]:
+    from app import geo
+    from app.models import StoreSize
+
+    for restaurant_id in range(1, sizes.restaurants + 1):
+        city, state, lat, lng = CITIES[restaurant_id % len(CITIES)]
+        lat += rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG)
+        lng += rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG)
+        stars = [review["rating"] for review in restaurant_reviews(sizes, seed, restaurant_id)]
+        rating_total = sum(stars)
+        yield {
+            "id": restaurant_id,
+            "owner_id": restaurant_id,
+            "name": f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_PLACES)} {restaurant_id}",
+            "description": f"{rng.choice(CUISINES)} favourites made fresh every day.",
+            "cuisine_type": rng.choice(CUISINES),
+            "phone_number": phone_number(restaurant_id),
+            "email": f"restaurant{restaurant_id}@bench.example.com",
+            "unique_code": f"BENCH{restaurant_id:07d}",
+            "store_size": rng.choice(list(StoreSize)),
+            "address_line1": f"{rng.randint(1, 999)} Main Road",
+            "city": city,
+            "state": state,
+            "postal_code": f"{rng.randint(110000, 899999)}",
+            "latitude": lat,
+            "longitude": lng,
+            "geohash": geo.encode(lat, lng),
+            "opening_time": "09:00",
+            "closing_time": "23:00",
+            "is_open": True,
+            "delivery_radius": float(rng.choice([3, 5, 7, 10])),
+            "delivery_fee": float(rng.choice([0, 20, 30, 40])),
+            "minimum_order_amount": float(rng.choice([0, 100, 150, 200])),
+            "is_active": rng.random() < 0.95,
+            "rating": rating_total / len(stars) if stars else 0.0,
+            "total_reviews": len(stars),
+            "rating_total": rating_total,
+        }
+
+
+def menu_items(sizes: Sizes, category_ids: list[int], rng: random.Random) -> Iterator[dict]:
+    for restaurant_id in range(1, sizes.restaurants + 1):
+        for number, menu_item_id in enumerate(menu_item_ids(sizes, restaurant_id), start=1):
+            yield {
+                "id": menu_item_id,
+                "restaurant_id": restaurant_id,
+                "category_id": rng.choice(category_ids),
+                "name": f"{rng.choice(DISHES)} {number}",
+                "description": "House special.",
+                "price": float(rng.randrange(80, 800, 10)),
+                "is_vegetarian": rng.random() < 0.5,
+                "is_available": rng.random() < 0.9,
+                "preparation_time": rng.randint(10, 45),
+                "calories": rng.randint(150, 1200),
+                "ingredients": rng.sample(INGREDIENTS, 3),
+                "allergens": rng.sample(ALLERGENS, rng.randint(0, 2)),
+                "rating": 0.0,
+                "total_reviews": 0,
+                "rating_total": 0,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    add_scale_argument(parser)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from app import auth, geo, models
+    from app.coverage import COVERAGE_PRECISION
+    from app.database import drop_tables, engine, upgrade_schema
+
+    if args.drop:
+        drop_tables()
+    upgrade_schema()
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(models.Restaurant.__table__)).scalar():
+            sys.exit("Database already has restaurants; pass --drop to reseed it")
+
+    sizes = Sizes.scaled(args.scale)
+    rng = random.Random(args.seed)
+    print(f"Seeding {args.database_url}: {sizes}")
+
+    load(engine, models.Category.__table__, ({"name": name, "is_active": True} for name in CATEGORIES), args.batch_size)
+    with engine.connect() as connection:
+        category_ids = list(connection.execute(select(models.Category.id).order_by(models.Category.id)).scalars())
+    # One bcrypt hash for everyone: hashing a million passwords would dominate the run
+    load(engine, models.User.__table__, users(sizes, auth.hash_password("bench")), args.batch_size)
+
+    def write_coverage(connection, batch):
+        cells = [
+            {"cell": cell, "restaurant_id": row["id"]}
+            for row in batch
+            for cell in geo.cells_within(row["latitude"], row["longitude"], row["delivery_radius"], COVERAGE_PRECISION)
+        ]
+        connection.execute(insert(models.RestaurantCoverageCell.__table__), cells)
+
+    load(engine, models.Restaurant.__table__, restaurants(sizes, rng, args.seed), args.batch_size, write_coverage)
+    load(engine, models.MenuItem.__table__, menu_items(sizes, category_ids, rng), args.batch_size)
+    load(engine, models.Order.__table__, orders(sizes, args.seed), args.batch_size)
+    load(engine, models.OrderItem.__table__, order_items(sizes, args.seed), args.batch_size)
+    load(engine, models.Review.__table__, reviews(sizes, args.seed), args.batch_size)
+    if engine.dialect.name == "postgresql":
+        # Explicit ids were inserted; move the sequences past them
+        with engine.begin() as connection:
+            for table in ("users", "restaurants", "menu_items", "orders", "order_items", "reviews"):
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                )
+    print("Done. Start the API against this database before running load.py.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Serialization throughput for a 100-restaurant list response.
+
+Compares FastAPI's default path (model_dump, jsonable_encoder, json.dumps)
+with app.responses.dumps, the renderer behind FastJSONResponse and
+success(). Only serialization is timed; loading and validating the rows is
+the same for every path.
+
+    python benchmarks/serialization.py [--rows 100] [--seconds 2]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.schemas imports the models, which need an engine URL; nothing connects
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "food_finder_bench.db"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app import responses, schemas  # noqa: E402
+
+
+def make_restaurants(count: int) -> list[schemas.RestaurantResponse]:
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        schemas.RestaurantResponse(
+            id=i,
+            owner_id=i,
+            name=f"Restaurant {i}",
+            description="Wood-fired pizza, fresh pasta and seasonal salads. " * 2,
+            cuisine_type="Italian",
+            phone_number="+911234567890",
+            email=f"owner{i}@example.com",
+            image_url=f"/uploads/{i:064x}.jpg",
+            image_variants={name: f"/uploads/{i:064x}_{name}.webp" for name in ("thumb", "small", "medium")},
+            address_line1=f"{i} Main Street",
+            city="Pune",
+            state="MH",
+            postal_code="411001",
+            latitude=18.52 + i / 1000,
+            longitude=73.85 + i / 1000,
+            opening_time="09:00",
+            closing_time="23:00",
+            rating=4.2,
+            total_reviews=120 + i,
+            is_active=True,
+            created_at=created + timedelta(days=i),
+            updated_at=created + timedelta(days=i, hours=1),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def fastapi_default(models):
+    content = {"success": True, "data": [m.model_dump() for m in models], "next_cursor": "abc"}
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_dicts(models):
+    # What list_response does: rows are dumped by select_fields' serializer
+    return responses.dumps({"success": True, "data": [m.model_dump() for m in models], "next_cursor": "abc"})
+
+
+def dumps_models(models):
+    return responses.dumps({"success": True, "data": models, "next_cursor": "abc"})
+
+
+def measure(fn, models, seconds: float) -> float:
+    fn(models)  # warm up
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn(models)
+        runs += 1
+    return runs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    models = make_restaurants(args.rows)
+    assert json.loads(fastapi_default(models)) == json.loads(dumps_dicts(models)) == json.loads(dumps_models(models))
+
+    renderer = "orjson" if responses.orjson is not None else "pydantic-core"
+    print(f"{args.rows} restaurants, {len(fastapi_default(models))} bytes, renderer: {renderer}")
+    baseline = None
+    for name, fn in [
+        ("jsonable_encoder + json.dumps", fastapi_default),
+        ("dumps(model_dump rows)", dumps_dicts),
+        ("dumps(models)", dumps_models),
+    ]:
+        rate = measure(fn, models, args.seconds)
+        baseline = baseline or rate
+        print(f"{name:32} {rate:10.0f} responses/s  {rate / baseline:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
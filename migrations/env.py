@@ -0,0 +1,54 @@
+"""Alembic environment: migrates DATABASE_URL, or the connection handed over by app.database.upgrade_schema."""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+from app.config import DATABASE_URL
+from app.database import Base
+
+config = context.config
+target_metadata = Base.metadata
+# Set when the app migrates at startup; the app's logging is already configured then
+connection = config.attributes.get("connection")
+
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite cannot ALTER most things in place; batch mode rebuilds the table
+        render_as_batch=True,
+        # Some revisions build indexes CONCURRENTLY outside a transaction
+        transaction_per_migration=True,
+        compare_type=True,
+        **kwargs,
+    )
+
+
+def run_migrations_offline():
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+    engine = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with engine.connect() as own_connection:
+        _configure(connection=own_connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,408 @@
+"""Baseline schema
+
+The schema as create_tables() and migrate_schema() left it before Alembic.
+The tables are a snapshot, not app.models, so later model changes cannot
+alter what this revision does. A fresh database gets every table; a
+database created before Alembic gets the tables it lacks plus the columns,
+indexes and backfills migrate_schema used to apply on each startup.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 07:39:02.700193
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import geo
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+metadata = sa.MetaData()
+
+sa.Table(
+    'blacklist_tokens',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_blacklist_tokens_jti', 'jti', unique=True),
+)
+
+sa.Table(
+    'categories',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('image_url', sa.String(length=500), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name'),
+    sa.Index('ix_categories_id', 'id'),
+)
+
+sa.Table(
+    'otp_codes',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('code', sa.String(length=6), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('consumed', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('phone_number', 'code', name='uq_phone_code'),
+    sa.Index('ix_otp_codes_phone_number', 'phone_number'),
+)
+
+sa.Table(
+    'users',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('username', sa.String(length=100), nullable=False),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=True),
+    sa.Column('role', sa.Enum('ADMIN', 'CUSTOMER', 'RESTAURANT_OWNER', 'DELIVERY_PERSON', name='userrole'), nullable=True),
+    sa.Column('roles', sa.JSON(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_verified', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_users_email', 'email', unique=True),
+    sa.Index('ix_users_id', 'id'),
+    sa.Index('ix_users_phone_number', 'phone_number', unique=True),
+    sa.Index('ix_users_username', 'username', unique=True),
+)
+
+sa.Table(
+    'outstanding_tokens',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_type', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_outstanding_tokens_jti', 'jti', unique=True),
+)
+
+sa.Table(
+    'restaurants',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('cuisine_type', sa.String(length=100), nullable=True),
+    sa.Column('phone_number', sa.String(length=20), nullable=True),
+    sa.Column('email', sa.String(length=255), nullable=True),
+    sa.Column('image_url', sa.String(length=500), nullable=True),
+    sa.Column('image_variants', sa.JSON(), nullable=True),
+    sa.Column('unique_code', sa.String(length=32), nullable=True),
+    sa.Column('store_size', sa.Enum('SMALL', 'MEDIUM', 'LARGE', name='storesize'), nullable=False),
+    sa.Column('address_line1', sa.String(length=255), nullable=False),
+    sa.Column('address_line2', sa.String(length=255), nullable=True),
+    sa.Column('city', sa.String(length=100), nullable=False),
+    sa.Column('state', sa.String(length=100), nullable=False),
+    sa.Column('postal_code', sa.String(length=20), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('geohash', sa.String(length=12), nullable=True),
+    sa.Column('opening_time', sa.String(length=10), nullable=True),
+    sa.Column('closing_time', sa.String(length=10), nullable=True),
+    sa.Column('is_open', sa.Boolean(), nullable=True),
+    sa.Column('opened_on', sa.Date(), nullable=True),
+    sa.Column('upcoming_holidays', sa.JSON(), nullable=True),
+    sa.Column('special_items', sa.JSON(), nullable=True),
+    sa.Column('delivery_radius', sa.Float(), nullable=True),
+    sa.Column('delivery_fee', sa.Float(), nullable=True),
+    sa.Column('minimum_order_amount', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('rating', sa.Float(), nullable=True),
+    sa.Column('total_reviews', sa.Integer(), nullable=True),
+    sa.Column('rating_total', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_restaurants_active_geohash', 'is_active', 'geohash'),
+    sa.Index('ix_restaurants_id', 'id'),
+    sa.Index('ix_restaurants_unique_code', 'unique_code', unique=True),
+)
+
+sa.Table(
+    'user_addresses',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('address_line1', sa.String(length=255), nullable=False),
+    sa.Column('address_line2', sa.String(length=255), nullable=True),
+    sa.Column('city', sa.String(length=100), nullable=False),
+    sa.Column('state', sa.String(length=100), nullable=False),
+    sa.Column('postal_code', sa.String(length=20), nullable=False),
+    sa.Column('country', sa.String(length=100), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('is_default', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_user_addresses_id', 'id'),
+)
+
+sa.Table(
+    'carts',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id']),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_carts_id', 'id'),
+    sa.Index('ix_carts_user_id', 'user_id'),
+)
+
+sa.Table(
+    'menu_items',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('image_url', sa.String(length=500), nullable=True),
+    sa.Column('image_variants', sa.JSON(), nullable=True),
+    sa.Column('is_vegetarian', sa.Boolean(), nullable=True),
+    sa.Column('is_available', sa.Boolean(), nullable=True),
+    sa.Column('preparation_time', sa.Integer(), nullable=True),
+    sa.Column('calories', sa.Integer(), nullable=True),
+    sa.Column('ingredients', sa.JSON(), nullable=True),
+    sa.Column('allergens', sa.JSON(), nullable=True),
+    sa.Column('rating', sa.Float(), nullable=True),
+    sa.Column('total_reviews', sa.Integer(), nullable=True),
+    sa.Column('rating_total', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_menu_items_id', 'id'),
+)
+
+sa.Table(
+    'orders',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('order_number', sa.String(length=50), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'CONFIRMED', 'PREPARING', 'READY', 'OUT_FOR_DELIVERY', 'DELIVERED', 'CANCELLED', name='orderstatus'), nullable=True),
+    sa.Column('subtotal', sa.Float(), nullable=False),
+    sa.Column('delivery_fee', sa.Float(), nullable=True),
+    sa.Column('tax_amount', sa.Float(), nullable=True),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('payment_status', sa.Enum('PENDING', 'COMPLETED', 'FAILED', 'REFUNDED', name='paymentstatus'), nullable=True),
+    sa.Column('delivery_address', sa.JSON(), nullable=False),
+    sa.Column('special_instructions', sa.Text(), nullable=True),
+    sa.Column('estimated_delivery_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('actual_delivery_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id']),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_orders_id', 'id'),
+    sa.Index('ix_orders_order_number', 'order_number', unique=True),
+    sa.Index('uq_orders_user_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+)
+
+sa.Table(
+    'restaurant_coverage_cells',
+    metadata,
+    sa.Column('cell', sa.String(length=12), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('cell', 'restaurant_id'),
+    sa.Index('ix_restaurant_coverage_cells_restaurant_id', 'restaurant_id'),
+)
+
+sa.Table(
+    'restaurant_popularity',
+    metadata,
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=100), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('average_rating', sa.Float(), nullable=True),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('restaurant_id'),
+    sa.Index('ix_restaurant_popularity_city_score', 'city', 'score', 'restaurant_id'),
+    sa.Index('ix_restaurant_popularity_score', 'score', 'restaurant_id'),
+)
+
+sa.Table(
+    'cart_items',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cart_id', sa.Integer(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('special_instructions', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['cart_id'], ['carts.id']),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_cart_items_cart_id', 'cart_id'),
+    sa.Index('ix_cart_items_id', 'id'),
+)
+
+sa.Table(
+    'order_items',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('total_price', sa.Float(), nullable=False),
+    sa.Column('special_instructions', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id']),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_order_items_id', 'id'),
+)
+
+sa.Table(
+    'reviews',
+    metadata,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=False),
+    sa.Column('comment', sa.Text(), nullable=True),
+    sa.Column('food_rating', sa.Integer(), nullable=True),
+    sa.Column('delivery_rating', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id']),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id']),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    sa.PrimaryKeyConstraint('id'),
+    sa.Index('ix_reviews_id', 'id'),
+    sa.Index('ix_reviews_restaurant_id', 'restaurant_id', 'id'),
+    sa.Index('uq_reviews_order_id', 'order_id', unique=True),
+)
+
+# Columns added to existing tables after their first release
+LATE_COLUMNS = [
+    ('restaurants', 'image_url', sa.String(length=500)),
+    ('restaurants', 'geohash', sa.String(length=12)),
+    ('restaurants', 'image_variants', sa.JSON()),
+    ('menu_items', 'image_variants', sa.JSON()),
+    ('orders', 'idempotency_key', sa.String(length=64)),
+    ('restaurants', 'rating_total', sa.Integer()),
+    ('menu_items', 'rating_total', sa.Integer()),
+]
+
+# Weighted full-text vectors maintained by PostgreSQL itself (see app.text_search)
+SEARCH_VECTORS = {
+    'restaurants': (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(cuisine_type, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ),
+    'menu_items': (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(ingredients::text, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ),
+}
+
+
+def _adopt_existing_schema(bind):
+    """Bring a database created before Alembic up to this revision."""
+    inspector = sa.inspect(bind)
+    for table, column, type_ in LATE_COLUMNS:
+        if column in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        op.add_column(table, sa.Column(column, type_))
+        if column == 'rating_total':
+            op.execute(
+                f"UPDATE {table} SET rating_total = "
+                "CAST(ROUND(COALESCE(rating, 0) * COALESCE(total_reviews, 0)) AS INTEGER)"
+            )
+    for table in metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind)
+
+    restaurants = metadata.tables['restaurants']
+    rows = bind.execute(
+        sa.select(restaurants.c.id, restaurants.c.latitude, restaurants.c.longitude).where(
+            restaurants.c.geohash.is_(None),
+            restaurants.c.latitude.isnot(None),
+            restaurants.c.longitude.isnot(None),
+        )
+    ).all()
+    if rows:
+        bind.execute(
+            restaurants.update().where(restaurants.c.id == sa.bindparam('row_id')),
+            [{'row_id': row.id, 'geohash': geo.encode(row.latitude, row.longitude)} for row in rows],
+        )
+
+
+def _add_search_vectors(bind):
+    """Generated tsvector columns with GIN indexes, plus trigram indexes when pg_trgm is available."""
+    inspector = sa.inspect(bind)
+    for table, expression in SEARCH_VECTORS.items():
+        if 'search_vector' not in {c['name'] for c in inspector.get_columns(table)}:
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({expression}) STORED"
+            )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+    try:
+        # A failure would abort the migration's transaction without the savepoint
+        with bind.begin_nested():
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for table in SEARCH_VECTORS:
+                op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING GIN (name gin_trgm_ops)")
+    except sa.exc.DBAPIError as e:
+        logger.warning(f"pg_trgm unavailable, typo-tolerant search disabled: {e}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    pre_alembic = sa.inspect(bind).has_table('users')
+    metadata.create_all(bind)
+    if pre_alembic:
+        _adopt_existing_schema(bind)
+    if bind.dialect.name == 'postgresql':
+        _add_search_vectors(bind)
+
+
+def downgrade() -> None:
+    metadata.drop_all(op.get_bind())
@@ -0,0 +1,88 @@
+"""Indexes for the hot query shapes
+
+One index per filter + keyset order the routes actually run:
+
+- restaurants (owner_id): the owner routes' restaurant lookup
+- restaurants (is_active, rating, id): /restaurants/ ordered by rating;
+  on PostgreSQL the city / cuisine ILIKE '%...%' filters get trigram indexes
+- restaurants (is_active, id): /search/new, newest first
+- menu_items (restaurant_id, id): owner menu pages, item lookups and menus
+- user_addresses (user_id, id): address pages and lookups
+- orders (user_id, id), (restaurant_id, id) and (restaurant_id, status, id):
+  customer and restaurant order pages, newest first, optionally by status
+- order_items (order_id): order details and review checks
+
+ix_otp_codes_phone_number is dropped: OTP lookups filter on phone_number
+and code, which uq_phone_code already indexes. No route filters or sorts
+on created_at (ids serve as the recency key), so it stays unindexed.
+
+PostgreSQL builds the indexes CONCURRENTLY, so large tables stay writable.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 08:05:41.318452
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# (name, table, columns)
+INDEXES = [
+    ('ix_restaurants_owner_id', 'restaurants', ['owner_id']),
+    ('ix_restaurants_active_rating', 'restaurants', ['is_active', 'rating', 'id']),
+    ('ix_restaurants_active_id', 'restaurants', ['is_active', 'id']),
+    ('ix_menu_items_restaurant_id', 'menu_items', ['restaurant_id', 'id']),
+    ('ix_user_addresses_user_id', 'user_addresses', ['user_id', 'id']),
+    ('ix_orders_user_id', 'orders', ['user_id', 'id']),
+    ('ix_orders_restaurant_id', 'orders', ['restaurant_id', 'id']),
+    ('ix_orders_restaurant_status', 'orders', ['restaurant_id', 'status', 'id']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+]
+TRIGRAM_COLUMNS = [('restaurants', 'city'), ('restaurants', 'cuisine_type')]
+
+
+def _has_pg_trgm(bind) -> bool:
+    return bind.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+        op.drop_index('ix_otp_codes_phone_number', table_name='otp_codes')
+        return
+
+    trigram = _has_pg_trgm(bind)
+    if not trigram:
+        logger.warning('pg_trgm unavailable, restaurant city / cuisine filters will scan')
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        if trigram:
+            for table, column in TRIGRAM_COLUMNS:
+                op.create_index(
+                    f'ix_{table}_{column}_trgm', table, [column],
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'},
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+        op.drop_index('ix_otp_codes_phone_number', table_name='otp_codes', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_otp_codes_phone_number', 'otp_codes', ['phone_number'])
+    for table, column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_{table}_{column}_trgm', table_name=table, if_exists=True)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,31 @@
+"""Order idempotency request hash
+
+orders.idempotency_hash stores the SHA-256 of the request an idempotency
+key was first used with, so a retry carrying the same key but a different
+body is rejected instead of replaying an unrelated order. Existing orders
+keep NULL and replay as before.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 08:19:44.500690
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('idempotency_hash')
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so they must be in place before app is imported
+_db_dir = tempfile.mkdtemp(prefix="food-finder-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+os.environ["QUERY_AUDIT"] = "true"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,168 @@
+"""In-memory stand-in for the parts of redis-py the Redis backends use.
+
+Covers strings (get/set/mget/incr/delete/scan_iter with ``ex`` expiry),
+sets (sadd/spop), pipelines and WATCH/MULTI transactions. Values come back
+as bytes, as they do from a real client without decode_responses.
+"""
+import fnmatch
+import time
+from typing import Optional
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class WatchError(Exception):
+    pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data: dict[str, object] = {}
+        self._expires: dict[str, float] = {}
+        # Bumped on every write, so a watching pipeline can tell a key changed
+        self._versions: dict[str, int] = {}
+        self.commands = 0
+
+    def _touch(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _live(self, key: str):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        self.commands += 1
+        return self._live(key)
+
+    def mget(self, keys) -> list[Optional[bytes]]:
+        self.commands += 1
+        return [self._live(key) for key in keys]
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> bool:
+        self.commands += 1
+        self._touch(key)
+        self._data[key] = _encode(value)
+        if ex is not None:
+            self._expires[key] = time.monotonic() + ex
+        else:
+            self._expires.pop(key, None)
+        return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        self.commands += 1
+        value = int(self._live(key) or 0) + amount
+        self._touch(key)
+        self._data[key] = _encode(value)
+        return value
+
+    def delete(self, *keys: str) -> int:
+        self.commands += 1
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._touch(key)
+        return removed
+
+    def scan_iter(self, match: str = "*"):
+        self.commands += 1
+        return iter([key for key in list(self._data) if self._live(key) is not None and fnmatch.fnmatchcase(key, match)])
+
+    def sadd(self, key: str, *members) -> int:
+        self.commands += 1
+        members = {_encode(m) for m in members}
+        current = self._live(key)
+        if current is None:
+            current = self._data[key] = set()
+        added = len(members - current)
+        self._touch(key)
+        current |= members
+        return added
+
+    def spop(self, key: str, count: Optional[int] = None):
+        self.commands += 1
+        current = self._live(key) or set()
+        popped = [current.pop() for _ in range(min(count or 1, len(current)))]
+        if popped:
+            self._touch(key)
+        if count is None:
+            return popped[0] if popped else None
+        return popped
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches: str, value_from_callable: bool = False):
+        """Run ``func(pipe)`` with ``watches`` watched, retrying on WatchError like redis-py."""
+        with self.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*watches)
+                    value = func(pipe)
+                    results = pipe.execute()
+                    return value if value_from_callable else results
+                except WatchError:
+                    continue
+
+
+class FakePipeline:
+    """Queues commands and runs them, counted as one round trip, on execute().
+
+    After watch() commands run immediately until multi(); execute() then
+    raises WatchError if a watched key was written in between.
+    """
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._queued = []
+        self._watched: Optional[dict[str, int]] = None
+        self._immediate = False
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+        if self._immediate:
+            return command
+
+        def queue(*args, **kwargs):
+            self._queued.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def watch(self, *keys: str):
+        self._client.commands += 1
+        self._watched = {key: self._client._versions.get(key, 0) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def execute(self) -> list:
+        watched, queued = self._watched, self._queued
+        self.reset()
+        if watched and any(self._client._versions.get(key, 0) != version for key, version in watched.items()):
+            raise WatchError()
+        commands = self._client.commands
+        results = [command(*args, **kwargs) for command, args, kwargs in queued]
+        self._client.commands = commands + 1
+        return results
+
+    def reset(self):
+        self._queued = []
+        self._watched = None
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
@@ -0,0 +1,48 @@
+"""Redis cart store shared by several workers: concurrent edits to one cart are not lost."""
+from app.carts import CartStore, RedisCartBackend, empty_cart
+from tests.fake_redis import FakeRedis
+
+
+def _add(menu_item_id: int, during=None):
+    def change(cart: dict):
+        if during is not None:
+            during()
+        cart["restaurant_id"] = 1
+        cart["items"].append({"menu_item_id": menu_item_id, "quantity": 1, "special_instructions": None})
+
+    return change
+
+
+def test_edit_from_another_worker_between_read_and_write_is_kept():
+    redis = FakeRedis()
+    worker_a = CartStore(RedisCartBackend(redis, ttl=60))
+    worker_b = CartStore(RedisCartBackend(redis, ttl=60))
+    worker_a.backend.cache(7, empty_cart())
+    interleaved = []
+
+    def other_worker_edits():
+        # Only on the first attempt: worker B writes after worker A has read the cart
+        if not interleaved:
+            interleaved.append(worker_b.update(7, _add(20)))
+
+    cart = worker_a.update(7, _add(10, during=other_worker_edits))
+
+    assert [line["menu_item_id"] for line in cart["items"]] == [20, 10]
+    assert worker_b.get(7) == cart
+    assert worker_a.backend.pop_dirty(10) == [(7, cart)]
+
+
+def test_missing_cart_is_loaded_once_and_marked_dirty():
+    redis = FakeRedis()
+    backend = RedisCartBackend(redis, ttl=60)
+    loads = []
+
+    def missing():
+        loads.append(1)
+        return empty_cart()
+
+    cart = backend.update(7, lambda cart: {**cart, "restaurant_id": 1}, missing)
+
+    assert cart["restaurant_id"] == 1 and loads == [1]
+    assert backend.load(7) == cart
+    assert backend.pop_dirty(10) == [(7, cart)]
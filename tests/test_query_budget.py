@@ -0,0 +1,134 @@
+"""The @query_budget routes stay within their budgets, and N+1 patterns are caught.
+
+QUERY_BUDGET_STRICT is set in conftest, so a route that runs more statements
+than it declares raises QueryBudgetExceeded out of the TestClient call.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import models, popularity
+from app.database import SessionLocal
+from app.main import app
+from app.metrics import MetricsMiddleware
+from app.query_audit import QueryAuditMiddleware, QueryBudgetExceeded, capture_queries, find_n_plus_one, query_budget
+
+RESTAURANTS = 8
+ITEMS_PER_RESTAURANT = 6
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        _seed()
+        popularity.refresh_all()
+        yield client
+
+
+def _seed():
+    db = SessionLocal()
+    try:
+        categories = [models.Category(name=f"Category {i}") for i in range(3)]
+        db.add_all(categories)
+        for i in range(RESTAURANTS):
+            owner = models.User(
+                email=f"owner{i}@example.com",
+                username=f"owner{i}",
+                hashed_password="x",
+                full_name=f"Owner {i}",
+                phone_number=f"90000000{i:02d}",
+                role=models.UserRole.RESTAURANT_OWNER,
+            )
+            restaurant = models.Restaurant(
+                owner=owner,
+                name=f"Restaurant {i}",
+                unique_code=f"CODE{i}",
+                address_line1="1 Main Road",
+                city="Pune",
+                state="MH",
+                postal_code="411001",
+                latitude=18.52 + i * 0.001,
+                longitude=73.85 + i * 0.001,
+                rating=float(i % 5),
+            )
+            restaurant.menu_items = [
+                models.MenuItem(name=f"Dish {j}", price=100.0 + j, category=categories[j % len(categories)])
+                for j in range(ITEMS_PER_RESTAURANT)
+            ]
+            db.add(restaurant)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _first_restaurant_id() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(models.Restaurant.id).order_by(models.Restaurant.id).first()[0]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/restaurants/",
+        "/restaurants/?city=Pune&fields=name,rating",
+        "/search/popular",
+        "/search/popular?city=pune",
+        "/search/new",
+        "/search/code/CODE3",
+    ],
+)
+def test_list_routes_within_budget(client, path):
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]
+
+
+def test_paginated_pages_within_budget(client):
+    for path in ("/restaurants/?limit=3", "/search/new?limit=3", "/search/popular?limit=3"):
+        first = client.get(path).json()
+        assert first["next_cursor"]
+        response = client.get(f"{path}&cursor={first['next_cursor']}")
+        assert response.status_code == 200, response.text
+
+
+def test_restaurant_and_menu_within_budget(client):
+    restaurant_id = _first_restaurant_id()
+    assert client.get(f"/restaurants/{restaurant_id}").status_code == 200
+    response = client.get(f"/restaurants/{restaurant_id}/menu")
+    assert response.status_code == 200, response.text
+
+
+def test_over_budget_route_raises():
+    probe = FastAPI()
+    probe.add_middleware(QueryAuditMiddleware)
+    probe.add_middleware(MetricsMiddleware)
+
+    @probe.get("/owners")
+    @query_budget(1)
+    def list_owners():
+        db = SessionLocal()
+        try:
+            # One query for the restaurants, then one lazy load per owner
+            return [restaurant.owner.username for restaurant in db.query(models.Restaurant).all()]
+        finally:
+            db.close()
+
+    with pytest.raises(QueryBudgetExceeded):
+        TestClient(probe).get("/owners")
+
+
+def test_lazy_loads_detected_as_n_plus_one(client):
+    db = SessionLocal()
+    try:
+        with capture_queries() as statements:
+            owners = [restaurant.owner.username for restaurant in db.query(models.Restaurant).all()]
+    finally:
+        db.close()
+    assert len(owners) == RESTAURANTS
+    repeats = find_n_plus_one([(statement, 0.0) for statement in statements], threshold=5)
+    assert len(repeats) == 1
+    shape, repeat = repeats[0]
+    assert repeat.count == RESTAURANTS
+    assert "FROM users" in shape
@@ -0,0 +1,63 @@
+"""Stream setup: events published while a stream is being opened reach the client after its snapshot."""
+import asyncio
+import json
+import pytest
+from app import realtime
+from app.realtime import Hub, LocalBroker, authorize_stream, order_channel, stream_sse
+
+
+class _Request:
+    async def is_disconnected(self):
+        return False
+
+
+def _event(status: str) -> dict:
+    return {"type": "order.status_changed", "order_id": 1, "status": status}
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = Hub(LocalBroker())
+    monkeypatch.setattr(realtime, "hub", hub)
+    monkeypatch.setattr(realtime, "authenticate_token", lambda token, db: None)
+    return hub
+
+
+def _open(hub: Hub, during_load=(), after_authorize=()):
+    """Open an SSE stream on order 1 (snapshot status "confirmed") and return its first two frames."""
+
+    def snapshot(db):
+        for status in during_load:
+            hub.publish([order_channel(1)], _event(status))
+        return {"type": "order.snapshot", "order_id": 1, "status": "confirmed"}
+
+    async def run():
+        hub.start(asyncio.get_running_loop())
+        try:
+            subscription = await authorize_stream("token", lambda db, user: (order_channel(1), snapshot))
+            for status in after_authorize:
+                hub.publish([order_channel(1)], _event(status))
+            frames = stream_sse(_Request(), subscription).body_iterator
+            return [json.loads((await frames.__anext__())[len("data: "):]) for _ in range(2)]
+        finally:
+            hub.stop()
+
+    return asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_event_published_before_first_frame_follows_snapshot(hub):
+    snapshot, event = _open(hub, after_authorize=["preparing"])
+    assert snapshot["type"] == "order.snapshot"
+    assert event["status"] == "preparing"
+
+
+def test_event_published_while_loading_snapshot_is_not_lost(hub):
+    snapshot, event = _open(hub, during_load=["preparing"])
+    assert snapshot["status"] == "confirmed"
+    assert event["status"] == "preparing"
+
+
+def test_events_the_snapshot_reflects_are_dropped(hub):
+    snapshot, event = _open(hub, during_load=["pending", "confirmed"], after_authorize=["ready"])
+    assert snapshot["status"] == "confirmed"
+    assert event["status"] == "ready"
@@ -0,0 +1,112 @@
+"""Response cache over the Redis backend: tag-version invalidation and ETag / 304."""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.response_cache import RESTAURANTS_TAG, RedisBackend, ResponseCache, restaurant_tag
+from tests.fake_redis import FakeRedis
+
+
+def _app(cache: ResponseCache, calls: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/restaurants/{restaurant_id}")
+    async def get_restaurant(restaurant_id: int, request: Request):
+        async def produce():
+            calls.append(restaurant_id)
+            return {"id": restaurant_id, "version": len(calls)}
+
+        return await cache.respond(request, [RESTAURANTS_TAG, restaurant_tag(restaurant_id)], produce)
+
+    return app
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def cache(redis):
+    return ResponseCache(RedisBackend(redis, ttl=60))
+
+
+@pytest.fixture
+def client(cache, calls):
+    return TestClient(_app(cache, calls))
+
+
+def test_hit_after_miss(client, calls):
+    first = client.get("/restaurants/1")
+    second = client.get("/restaurants/1")
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert first.json() == second.json()
+    assert calls == [1]
+
+
+def test_bumping_a_tag_misses_only_dependent_entries(client, cache, calls):
+    client.get("/restaurants/1")
+    client.get("/restaurants/2")
+    cache.invalidate(restaurant_tag(1))
+    assert client.get("/restaurants/1").headers["X-Cache"] == "MISS"
+    assert client.get("/restaurants/2").headers["X-Cache"] == "HIT"
+    assert calls == [1, 2, 1]
+
+    cache.invalidate(RESTAURANTS_TAG)
+    assert client.get("/restaurants/2").headers["X-Cache"] == "MISS"
+    assert client.get("/restaurants/2").json()["version"] == 4
+
+
+def test_invalidation_is_shared_between_workers(redis, calls):
+    worker_a = ResponseCache(RedisBackend(redis, ttl=60))
+    worker_b = ResponseCache(RedisBackend(redis, ttl=60))
+    client_a = TestClient(_app(worker_a, calls))
+    client_b = TestClient(_app(worker_b, calls))
+    client_a.get("/restaurants/1")
+    assert client_b.get("/restaurants/1").headers["X-Cache"] == "HIT"
+
+    worker_a.invalidate(restaurant_tag(1))
+    assert client_b.get("/restaurants/1").headers["X-Cache"] == "MISS"
+
+
+def test_bump_is_one_round_trip(cache, redis):
+    before = redis.commands
+    cache.invalidate(RESTAURANTS_TAG, restaurant_tag(1), restaurant_tag(2))
+    assert redis.commands == before + 1
+    assert cache.backend.versions([RESTAURANTS_TAG, restaurant_tag(1), restaurant_tag(3)]) == [1, 1, 0]
+
+
+def test_matching_etag_gets_empty_304(client):
+    first = client.get("/restaurants/1")
+    etag = first.headers["ETag"]
+    assert etag.startswith('"')
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/restaurants/1", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+
+def test_stale_etag_gets_full_body(client, cache):
+    etag = client.get("/restaurants/1").headers["ETag"]
+    cache.invalidate(restaurant_tag(1))
+    response = client.get("/restaurants/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["version"] == 2
+
+
+def test_redis_errors_fall_back_to_uncached(calls):
+    class Down(FakeRedis):
+        def mget(self, keys):
+            raise ConnectionError("redis down")
+
+    client = TestClient(_app(ResponseCache(RedisBackend(Down(), ttl=60)), calls))
+    assert client.get("/restaurants/1").status_code == 200
+    assert client.get("/restaurants/1").headers["X-Cache"] == "MISS"
+    assert calls == [1, 1]
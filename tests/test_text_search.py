@@ -0,0 +1,36 @@
+"""In-process text search: inactive restaurants and their dishes never take up a page of hits."""
+import asyncio
+from app import models
+from app.text_search import MENU_ITEM, RESTAURANT, MemoryTextSearch
+
+
+def _restaurant(restaurant_id: int, is_active: bool = True) -> models.Restaurant:
+    return models.Restaurant(id=restaurant_id, name=f"Curry House {restaurant_id}", cuisine_type="Indian", is_active=is_active)
+
+
+def _index() -> MemoryTextSearch:
+    search = MemoryTextSearch()
+    for restaurant_id in (1, 2):
+        search.index.add((RESTAURANT, restaurant_id), restaurant_id, {"name": f"Curry House {restaurant_id}"}, {"name": 1.0})
+        for n in range(3):
+            item = models.MenuItem(id=restaurant_id * 10 + n, restaurant_id=restaurant_id, name=f"Chicken Curry {n}")
+            search.index_menu_item(item)
+    return search
+
+
+def test_deactivated_restaurant_drops_its_dishes():
+    search = _index()
+    search.index_restaurant(_restaurant(1, is_active=False))
+
+    hits = asyncio.run(search.find(None, "curry", 4))
+
+    assert len(hits) == 4
+    assert {restaurant_id for _, _, restaurant_id, _ in hits} == {2}
+
+
+def test_dish_of_unindexed_restaurant_is_skipped():
+    search = _index()
+    search.index_restaurant(_restaurant(1, is_active=False))
+    search.index_menu_item(models.MenuItem(id=99, restaurant_id=1, name="Curry Special"))
+
+    assert (MENU_ITEM, 99) not in search.index
@@ -0,0 +1,12 @@
+"""Thumbnail workers import app.thumbnails on its own; it must not pull in logging or the database."""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_worker_module_does_not_import_app_setup():
+    code = "import sys, app.thumbnails; print(sorted(m for m in sys.modules if m.startswith('app.')))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "['app.thumbnails']"